@@ -0,0 +1,319 @@
+##############################################################################
+# Problem
+# Description       : This program measures the performance of each stage of
+#                     the POS-tagger in pos_tagging.py, so that a change can
+#                     be checked for making the tagger faster or slower. The
+#                     stages are:
+#                     1) count - reading and counting the training file
+#                     2) train - forming the HMM and the tables of decoders
+#                        from the counts
+#                     3) trigram-table - building the table of trigram
+#                        decoder, if it is benchmarked
+#                     4) decode-<engine> - tagging the test file into
+#                        "tagging-output" by each decoder
+#                     5) evaluate-<engine> - evaluating "tagging-output" of
+#                        each decoder against the gold std. file
+#
+#                     For each stage it reports wall time, tokens/sec,
+#                     sentences/sec, peak RSS of the process after the stage
+#                     and the growth in the number of objects tracked by the
+#                     garbage collector, i.e. the objects made by the stage
+#                     which are still alive after it.
+#
+# Usage             : This program takes the same inputs as pos_tagging.py
+#                     e.g.
+#
+# python benchmark.py -tr pos-train.txt -ts pos-test.txt -tk pos-test-key.txt
+#
+#                     Following optional inputs can be given after above
+#                     inputs, along with the optional inputs of
+#                     pos_tagging.py for the tagger like -smoothing:
+#                     -engines <e1,e2..> = comma separated decoders to be
+#                                  benchmarked. Default is all decoders.
+#                     -repeat <n> = run each stage n times and report the
+#                                  fastest run. Default is 1.
+#                     -o <file>  = name of the JSON file having the results.
+#                                  Default is "benchmark.json".
+#
+#                     Larger training and test files, e.g. scaled up copies
+#                     of the bundled ones, can be given the same way.
+#
+# Prog. Language    : Programming Language used for this program is Python
+#                     (Version 2.7.3).
+##############################################################################
+
+'''
+import statements to include Python's in-built module functionalities in the
+program
+'''
+# sys module is used to access command line arguments
+import sys
+
+# gc module is used for counting the objects allocated by each stage
+import gc
+
+# time module is used for measuring wall time of each stage
+import time
+
+# json module is used for writing the results
+import json
+
+# resource module is used for getting peak RSS of the process
+import resource
+
+# os module is used for removing output files of previous decoders
+import os
+
+# pos_tagging module is the tagger being benchmarked
+import pos_tagging
+
+###############################################################################
+# Function      : run_stage(stage_name, stage_function, token_count,
+#                           sentence_count, repeat)
+# Description   : This function runs a stage of the tagger and measures its
+#                 performance.
+# Arguments     : stage_name - Name of the stage
+#                 stage_function - A function taking no arguments, which
+#                                  runs the stage
+#                 token_count - Number of tokens processed by the stage
+#                 sentence_count - Number of sentences processed by the stage
+#                 repeat - Number of times the stage is run
+# Returns       : The value returned by the last run of stage_function.
+#                 A dict object having the performance of fastest run.
+###############################################################################
+def run_stage(stage_name, stage_function, token_count, sentence_count,\
+              repeat):
+
+    wall_times = []
+
+    for i in range(repeat):
+
+        '''
+        Collect the garbage of previous stages first, so that the objects
+        counted after the stage are the ones retained by it. Python 2 does
+        not have tracemalloc, so the count of objects tracked by garbage
+        collector is used instead of the count of allocations. It counts
+        only containers, e.g. lists and dicts, not strings or numbers.
+        '''
+        gc.collect()
+        object_count = len(gc.get_objects())
+
+        start_time = time.time()
+        value = stage_function()
+        wall_times.append(time.time() - start_time)
+
+        retained_gc_objects = len(gc.get_objects()) - object_count
+
+    wall_time = min(wall_times)
+
+    stage_result = {'stage': stage_name,\
+                    'wall_seconds': wall_time,\
+                    'tokens': token_count,\
+                    'sentences': sentence_count,\
+                    'tokens_per_sec': token_count / max(wall_time, 1e-9),\
+                    'sentences_per_sec': sentence_count /\
+                                         max(wall_time, 1e-9),\
+                    'peak_rss_kb': resource.getrusage(\
+                                   resource.RUSAGE_SELF).ru_maxrss,\
+                    'retained_gc_objects': retained_gc_objects}
+
+    print "%-18s %8.3f sec %10.0f tokens/sec %8.0f sentences/sec"\
+          " %8d KB peak RSS %8d retained gc objects" % (stage_name,\
+          wall_time, stage_result['tokens_per_sec'],\
+          stage_result['sentences_per_sec'], stage_result['peak_rss_kb'],\
+          retained_gc_objects)
+
+    return value, stage_result
+
+###############################################################################
+# End of run_stage function
+###############################################################################
+
+###############################################################################
+# Function      : count_training_file(train_file_name)
+# Description   : This function reads and counts the training file, the same
+#                 way as pos_tagging.py does.
+# Arguments     : train_file_name - Name of training file
+# Returns       : Counts of training file, as returned by get_hmm_counts.
+###############################################################################
+def count_training_file(train_file_name):
+
+    train_file_handle = pos_tagging.open_file(train_file_name)
+    hmm_counts = pos_tagging.get_hmm_counts(\
+                 pos_tagging.clean_lines(train_file_handle))
+    train_file_handle.close()
+
+    return hmm_counts
+
+###############################################################################
+# End of count_training_file function
+###############################################################################
+
+###############################################################################
+# Function      : decode_test_file(test_file_name, tagger)
+# Description   : This function tags the test file into "tagging-output", 
+#                 starting with an empty cache of tags of unknown words, so
+#                 that each run of each decoder finds them again and their
+#                 timings can be compared.
+# Arguments     : test_file_name - Name of test file
+#                 tagger - The Tagger object
+# Returns       : Number of tokens tagged, as returned by viterbi_decode.
+###############################################################################
+def decode_test_file(test_file_name, tagger):
+
+    tagger.clear_cache()
+
+    return pos_tagging.viterbi_decode(test_file_name, tagger)
+
+###############################################################################
+# End of decode_test_file function
+###############################################################################
+
+###############################################################################
+# Function      : remove_decoder_outputs()
+# Description   : This function removes the output files written only by 
+#                 some decoders, i.e. "tagging-output.confidence" and 
+#                 "tagging-output.kbest", also if compressed, so that the 
+#                 files left after a decoder is benchmarked are all its own.
+# Arguments     : None.
+# Returns       : None.
+###############################################################################
+def remove_decoder_outputs():
+
+    for file_name in ('tagging-output.confidence', 'tagging-output.kbest'):
+        for extension in [''] + ['.' + compression for compression, magic\
+                                 in pos_tagging.COMPRESSIONS]:
+            if os.path.exists(file_name + extension):
+                os.remove(file_name + extension)
+
+###############################################################################
+# End of remove_decoder_outputs function
+###############################################################################
+
+###############################################################################
+# Function      : main()
+# Description   : Entry point for the program.
+# Arguments     : None. Command Line Arguments in Python are retrieved from
+#                 sys.argv variable of sys module.
+# Returns       : None.
+###############################################################################
+def main():
+
+    if len(sys.argv) < 7:
+        print "\n\tSample usage: "
+        print "\tpython benchmark.py -tr postr -ts postst -tk poskey\n"
+        return
+
+    train_file_name = sys.argv[2]
+    test_file_name = sys.argv[4]
+    gold_std_file_name = sys.argv[6]
+
+    get_cmd_line_option = pos_tagging.get_cmd_line_option
+
+    engines = get_cmd_line_option('-engines',\
+              ','.join(pos_tagging.ENGINES)).split(',')
+    repeat = int(get_cmd_line_option('-repeat', '1'))
+
+    '''
+    Count the tokens and sentences of both files first, outside of the 
+    stages. The tokens of test file are counted the same way as 
+    benchmark_decoders does.
+    '''
+    train_file_handle = pos_tagging.open_file(train_file_name)
+    train_sentences = pos_tagging.split_train_sentences(\
+                      pos_tagging.clean_lines(train_file_handle))
+    train_file_handle.close()
+
+    train_token_count = sum(len(pos_tagging.get_tagged_words(\
+                            sentence_lines)) for sentence_lines in\
+                            train_sentences)
+    train_sentence_count = len(train_sentences)
+    del train_sentences
+
+    test_token_count = 0
+    test_sentence_count = 0
+
+    for words, spaces in pos_tagging.read_sentences(test_file_name):
+        if words:
+            test_token_count += len(pos_tagging.get_observation_lists(\
+                                    words)[1]) - 1
+            test_sentence_count += 1
+
+    stage_results = []
+
+    hmm_counts, stage_result = run_stage('count',\
+        lambda: count_training_file(train_file_name), train_token_count,\
+        train_sentence_count, repeat)
+    stage_results.append(stage_result)
+
+    tagger = pos_tagging.Tagger(\
+             get_cmd_line_option('-smoothing', 'witten-bell'),\
+             float(get_cmd_line_option('-k', '1.0')), 'bigram',\
+             int(get_cmd_line_option('-kbest', '5')),\
+             float(get_cmd_line_option('-beam', '1000')),\
+             int(get_cmd_line_option('-max-lattice-cells', '1000000')),\
+             not get_cmd_line_option('-no-unknown-constraints', None),\
+             int(get_cmd_line_option('-quantize', '0')) or None,\
+             int(get_cmd_line_option('-min-word-count', '1')))
+
+    stage_results.append(run_stage('train',\
+        lambda: tagger.train_from_counts(hmm_counts), train_token_count,\
+        train_sentence_count, repeat)[1])
+
+    if 'trigram' in engines:
+        stage_results.append(run_stage('trigram-table',\
+            tagger.build_trigram_table, train_token_count,\
+            train_sentence_count, repeat)[1])
+
+    '''
+    Decode and evaluate the test file with each decoder. The accuracy is
+    kept with the results of evaluation, so that the decoders can be
+    compared for accuracy as well as speed.
+    '''
+    for engine in engines:
+
+        if engine not in pos_tagging.ENGINES:
+            raise ValueError("unknown engine: " + engine)
+
+        tagger.engine = engine
+        remove_decoder_outputs()
+
+        stage_results.append(run_stage('decode-' + engine,\
+            lambda: decode_test_file(test_file_name, tagger),\
+            test_token_count, test_sentence_count, repeat)[1])
+
+        report, stage_result = run_stage('evaluate-' + engine,\
+            lambda: pos_tagging.evaluate_tagging("tagging-output",\
+            gold_std_file_name, tagger.known_words), test_token_count,\
+            test_sentence_count, repeat)
+
+        stage_result['accuracy'] = report['accuracy']
+        stage_results.append(stage_result)
+
+    results = {'python': sys.version.split()[0],\
+               'train_file': train_file_name,\
+               'test_file': test_file_name,\
+               'repeat': repeat,\
+               'stages': stage_results}
+
+    results_file_handle = open(get_cmd_line_option('-o', 'benchmark.json'),\
+                               'w')
+    json.dump(results, results_file_handle, indent=2, sort_keys=True)
+    results_file_handle.close()
+
+###############################################################################
+# End of main function
+###############################################################################
+
+'''
+Boilerplate syntax to specify that main() method is the entry point for
+this program.
+'''
+
+if __name__ == '__main__':
+
+    main()
+
+##############################################################################
+# End of benchmark.py program
+##############################################################################
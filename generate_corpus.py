@@ -0,0 +1,354 @@
+##############################################################################
+# Problem
+# Description       : This program generates synthetic corpora of any size
+#                     from a training file, for measuring how the POS-tagger
+#                     in pos_tagging.py scales with size of its inputs, e.g.
+#                     by benchmark.py. It writes a training file, a test file
+#                     and its gold std. file, in the same format as the
+#                     bundled pos-train.txt, pos-test.txt and
+#                     pos-test-key.txt files.
+#
+#                     The sentences are generated in one of two ways:
+#                     a) resample - sentences of the training file are
+#                        picked at random, keeping their lines and square
+#                        brackets as they are.
+#                     b) hmm - sentences are sampled from the HMM formed from
+#                        the training file. Tags are sampled from the tag
+#                        bigram counts starting at '.' until next '.', and a
+#                        word is sampled for each tag from the words tagged
+#                        with it. Each sentence is written in a single line,
+#                        followed by a line having its period.
+#
+#                     Every n-th sentence of the training file is held out
+#                     for the test file only, so that the test file has
+#                     unknown words. In hmm mode, test sentences are sampled
+#                     from the HMM of held out sentences.
+#
+# Usage             : This program takes the training file as first input,
+#                     followed by optional inputs e.g. to generate corpora
+#                     10 times the size of pos-train.txt use
+#
+# python generate_corpus.py -tr pos-train.txt -scale 10
+#
+#                     Following optional inputs can be given:
+#                     -scale <x> = number of tokens in generated training
+#                                  file, as multiple of tokens in the given
+#                                  training file. Default is 1.
+#                     -mode resample|hmm = the way sentences are generated.
+#                                  Default is resample.
+#                     -test-fraction <f> = fraction of sentences held out
+#                                  for test file, which is also the size of
+#                                  test file relative to training file.
+#                                  It should be more than 0 and at most 
+#                                  0.5. Default is 0.1.
+#                     -seed <n>  = seed of random numbers. Default is 1.
+#                     -o <prefix> = prefix of generated files. Default is
+#                                  "synthetic", which writes
+#                                  "synthetic-train.txt", "synthetic-test.txt"
+#                                  and "synthetic-test-key.txt".
+#
+# Prog. Language    : Programming Language used for this program is Python
+#                     (Version 2.7.3).
+##############################################################################
+
+'''
+import statements to include Python's in-built module functionalities in the
+program
+'''
+# sys module is used to access command line arguments
+import sys
+
+# re module is used to remove tags from the words of test file
+import re
+
+# random module is used to pick sentences, tags and words
+import random
+
+# bisect module is used to sample from cumulative counts
+import bisect
+
+# pos_tagging module is used for reading the training file and forming HMM
+import pos_tagging
+
+'''
+Regex matching a word-tag pair, to remove the tag from it. The word is
+matched greedily, so that the pair is split at the last '/' char, the same
+way as training file is read by pos_tagging.py.
+'''
+WORD_TAG_PAIR_PATTERN = re.compile(r'(\S+)/\S+')
+
+# sentences sampled from HMM are cut at this length, if they don't reach '.'
+MAX_SENTENCE_LENGTH = 200
+
+###############################################################################
+# Function      : get_cumulative_counts(counter)
+# Description   : This function converts a Counter object into a list of its
+#                 items and a list of cumulative counts, for sampling the
+#                 items in proportion to their counts.
+# Arguments     : counter - A Counter object
+# Returns       : A list of items.
+#                 A list of cumulative counts of the items.
+###############################################################################
+def get_cumulative_counts(counter):
+
+    items = sorted(counter)
+    cumulative_counts = []
+    total_count = 0
+
+    for item in items:
+        total_count = total_count + counter[item]
+        cumulative_counts.append(total_count)
+
+    return items, cumulative_counts
+
+###############################################################################
+# End of get_cumulative_counts function
+###############################################################################
+
+###############################################################################
+# Function      : sample(random_generator, items, cumulative_counts)
+# Description   : This function picks an item in proportion to its count.
+# Arguments     : random_generator - A random.Random object
+#                 items, cumulative_counts - As returned by
+#                                            get_cumulative_counts
+# Returns       : The picked item.
+###############################################################################
+def sample(random_generator, items, cumulative_counts):
+
+    return items[bisect.bisect_right(cumulative_counts,\
+                 random_generator.random() * cumulative_counts[-1])]
+
+###############################################################################
+# End of sample function
+###############################################################################
+
+###############################################################################
+# Function      : resample_sentences(random_generator, sentences)
+# Description   : This function generates sentences by picking sentences of
+#                 the training file at random.
+# Arguments     : random_generator - A random.Random object
+#                 sentences - List of sentences, each of which is a list of
+#                             lines of training file
+# Returns       : A generator of sentences, each a list of (line of tagged
+#                 words, number of tokens in it) pairs.
+###############################################################################
+def resample_sentences(random_generator, sentences):
+
+    sentences = [[(line, len(pos_tagging.get_tagged_words([line])))\
+                  for line in sentence_lines] for sentence_lines in sentences]
+
+    while True:
+        yield random_generator.choice(sentences)
+
+###############################################################################
+# End of resample_sentences function
+###############################################################################
+
+###############################################################################
+# Function      : sample_hmm_sentences(random_generator, sentences)
+# Description   : This function generates sentences by sampling tags and
+#                 words from the HMM formed from sentences of training file.
+# Arguments     : random_generator - A random.Random object
+#                 sentences - List of sentences, each of which is a list of
+#                             lines of training file
+# Returns       : A generator of sentences, each a list of (line of tagged
+#                 words, number of tokens in it) pairs.
+###############################################################################
+def sample_hmm_sentences(random_generator, sentences):
+
+    hmm_counts = pos_tagging.get_hmm_counts(pos_tagging.clean_lines(\
+                 line for sentence_lines in sentences\
+                 for line in sentence_lines))
+
+    '''
+    Get the cumulative counts of tags following each tag, and of words
+    tagged with each tag. The words are escaped the same way as they are
+    written in the training file.
+    '''
+    next_tag_dict = {}
+
+    for (tag1, tag2), freq in hmm_counts['bigram_freq'].iteritems():
+        next_tag_dict.setdefault(tag1, {})[tag2] = freq
+
+    for tag1 in next_tag_dict:
+        next_tag_dict[tag1] = get_cumulative_counts(next_tag_dict[tag1])
+
+    tag_words_dict = {}
+
+    for (word, tag), freq in hmm_counts['word_tag_freq'].iteritems():
+        tag_words_dict.setdefault(tag, {})[word.replace('/', '\\/')] = freq
+
+    for tag in tag_words_dict:
+        tag_words_dict[tag] = get_cumulative_counts(tag_words_dict[tag])
+
+    while True:
+
+        word_tag_pairs = []
+        tag = '.'
+
+        '''
+        Sample the tags of the sentence, starting after a '.' and ending at
+        the next '.', which is written in a line of its own.
+        '''
+        while len(word_tag_pairs) < MAX_SENTENCE_LENGTH:
+
+            # the last tag of training file may not be followed by any tag
+            if tag not in next_tag_dict:
+                break
+
+            tag = sample(random_generator, *next_tag_dict[tag])
+
+            if tag == '.':
+                break
+
+            word_tag_pairs.append(sample(random_generator,\
+                                  *tag_words_dict[tag]) + '/' + tag)
+
+        sentence = [('./. \n', 1)]
+
+        if word_tag_pairs:
+            sentence.insert(0, (' '.join(word_tag_pairs) + ' \n',\
+                                len(word_tag_pairs)))
+
+        yield sentence
+
+###############################################################################
+# End of sample_hmm_sentences function
+###############################################################################
+
+###############################################################################
+# Function      : write_corpus(sentence_generator, token_count, file_name,
+#                              test_file_name)
+# Description   : This function writes generated sentences into a file of
+#                 tagged words, and also into a file of words only (test
+#                 file), if its gold std. file is being written.
+# Arguments     : sentence_generator - A generator of sentences, as returned
+#                                      by resample_sentences
+#                 token_count - Number of tokens to be written. Sentences
+#                               are written till this count is reached.
+#                 file_name - Name of the file of tagged words
+#                 test_file_name - Name of the test file, or None if only
+#                                  tagged words are written
+# Returns       : The number of tokens written.
+###############################################################################
+def write_corpus(sentence_generator, token_count, file_name,\
+                 test_file_name=None):
+
+    file_handle = open(file_name, 'w')
+
+    if test_file_name:
+        test_file_handle = open(test_file_name, 'w')
+
+    written_token_count = 0
+
+    while written_token_count < token_count:
+
+        for line, line_token_count in sentence_generator.next():
+            file_handle.write(line)
+
+            if test_file_name:
+                test_file_handle.write(WORD_TAG_PAIR_PATTERN.sub(r'\1',\
+                                       line))
+
+            written_token_count = written_token_count + line_token_count
+
+    file_handle.close()
+
+    if test_file_name:
+        test_file_handle.close()
+
+    return written_token_count
+
+###############################################################################
+# End of write_corpus function
+###############################################################################
+
+###############################################################################
+# Function      : main()
+# Description   : Entry point for the program.
+# Arguments     : None. Command Line Arguments in Python are retrieved from
+#                 sys.argv variable of sys module.
+# Returns       : None.
+###############################################################################
+def main():
+
+    if len(sys.argv) < 3:
+        print "\n\tSample usage: "
+        print "\tpython generate_corpus.py -tr postr -scale 10\n"
+        return
+
+    train_file_name = sys.argv[2]
+
+    # optional arguments start after -tr value
+    optional_args = sys.argv[3:]
+    get_cmd_line_option = pos_tagging.get_cmd_line_option
+
+    scale = float(get_cmd_line_option('-scale', '1', optional_args))
+    mode = get_cmd_line_option('-mode', 'resample', optional_args)
+    test_fraction = float(get_cmd_line_option('-test-fraction', '0.1',\
+                                              optional_args))
+    random_generator = random.Random(int(get_cmd_line_option('-seed', '1',\
+                                                             optional_args)))
+    prefix = get_cmd_line_option('-o', 'synthetic', optional_args)
+
+    '''
+    Every n-th sentence is held out for the test file, so at least every 
+    second sentence is left for the training file.
+    '''
+    if not 0 < test_fraction <= 0.5:
+        print "\n\t-test-fraction should be more than 0 and at most 0.5"
+        print "\tpython generate_corpus.py -tr postr -test-fraction 0.1\n"
+        return
+
+    if mode == 'resample':
+        generate_sentences = resample_sentences
+    elif mode == 'hmm':
+        generate_sentences = sample_hmm_sentences
+    else:
+        raise ValueError("unknown mode: " + mode)
+
+    '''
+    Read the sentences of training file as they are, with square brackets,
+    and hold out every n-th of them for the test file.
+    '''
+    train_file_handle = pos_tagging.open_file(train_file_name)
+    sentences = pos_tagging.split_train_sentences(train_file_handle)
+    train_file_handle.close()
+
+    token_count = sum(len(pos_tagging.get_tagged_words(sentence_lines))\
+                      for sentence_lines in sentences)
+
+    test_interval = int(round(1.0 / test_fraction))
+
+    train_sentences = [sentence_lines for i, sentence_lines in\
+                       enumerate(sentences) if i % test_interval]
+    test_sentences = sentences[::test_interval]
+
+    train_token_count = write_corpus(generate_sentences(random_generator,\
+                        train_sentences), scale * token_count,\
+                        prefix + '-train.txt')
+
+    test_token_count = write_corpus(generate_sentences(random_generator,\
+                       test_sentences), scale * token_count * test_fraction,\
+                       prefix + '-test-key.txt', prefix + '-test.txt')
+
+    print "Wrote %d training tokens into %s and %d test tokens into %s" %\
+          (train_token_count, prefix + '-train.txt', test_token_count,\
+           prefix + '-test.txt')
+
+###############################################################################
+# End of main function
+###############################################################################
+
+'''
+Boilerplate syntax to specify that main() method is the entry point for
+this program.
+'''
+
+if __name__ == '__main__':
+
+    main()
+
+##############################################################################
+# End of generate_corpus.py program
+##############################################################################
@@ -40,6 +40,106 @@
 #                     Please note that sequence of the inputs SHOULD be same as
 #                     shown above. i.e. -tr <training file name> 
 #                     -ts <test file name> 
+#
+#                     The input files may be compressed by gzip, bzip2 or xz
+#                     (xz needs backports.lzma package in Python 2), e.g.
+#                     pos-train.txt.gz. They are decompressed while reading.
+#                     
+#                     Following optional inputs can be given after above
+#                     inputs:
+#                     -engine bigram|trigram|posterior|kbest = the decoder
+#                                  used for tagging. Default is bigram. 
+#                                  posterior also writes confidence of each
+#                                  tag into "tagging-output.confidence" file.
+#                                  kbest also writes k best tag sequences of
+#                                  each sentence into "tagging-output.kbest",
+#                                  with their log probs, as found by the 
+#                                  decoder. Tags of unknown words decided 
+#                                  after decoding are only in tagging-output.
+#                     -kbest <k> = number of tag sequences written by kbest
+#                                  decoder. Default is 5.
+#                     -beam <width> = beam width of trigram decoder. Default
+#                                  is 1000.
+#                     -max-lattice-cells <n> = most backpointers and path
+#                                  probs (words x tags) kept at a time by 
+#                                  bigram decoder. For longer sentences, it
+#                                  keeps path probs of only some words and
+#                                  recomputes backpointers during backtrace,
+#                                  and fails if n is too small even for 
+#                                  that. Default is 1000000.
+#                     -bench     = print tokens/sec of all decoders for the
+#                                  test file.
+#                     -smoothing none|add-k|witten-bell|interpolation = 
+#                                  smoothing of tag transition probabilities.
+#                                  Default is witten-bell.
+#                     -k <k>     = k for add-k smoothing. Default is 1.
+#                     -constraints <file> = file of tags fixed for words of
+#                                  test file, one "<sentence number> <word
+#                                  position> <tag>" per line.
+#                     -no-unknown-constraints = do not fix tags of unknown
+#                                  words before decoding.
+#                     -quantize 8|16 = quantize log probabilities of the
+#                                  tables of tagger into 8 or 16 bit codes,
+#                                  for a smaller model. The accuracy and 
+#                                  snapshot size of model are reported. In
+#                                  memory, only the tag dictionary is kept 
+#                                  as codes. Tag transition tables are also
+#                                  kept as floats for the decoders, so the
+#                                  memory used by a running tagger is not 
+#                                  reduced as much as the snapshot size.
+#                     -min-word-count <n> = leave words seen less than n
+#                                  times in training file out of the HMM, 
+#                                  and tag them as unknown words. Default
+#                                  is 1.
+#                     -prune-curve <n1,n2..> = print the size and accuracy
+#                                  of tagger for each of these
+#                                  -min-word-count values, and write them
+#                                  into "pruning_curve.csv".
+#                     -save <file> = save the trained tagger into the file,
+#                                  to be loaded by load_tagger() or
+#                                  ModelRegistry.
+#                     -processes <n> = decode sentences of test file in n
+#                                  parallel processes, scheduled longest
+#                                  first, while another thread reads the
+#                                  test file and the output is written in
+#                                  order. Default is 1.
+#                     -compress-output gz|bz2|xz = compress output files,
+#                                  e.g. "tagging-output.gz".
+#                     -dump-intermediates = also write cleaned training
+#                                  file (name appended with '.clean') and
+#                                  "tags_sequence_file", for debugging.
+#                     -log-level debug|info|warning = level of information
+#                                  logged. debug logs sizes of tables formed
+#                                  and tags of every -log-every <n>-th 
+#                                  (default 100th) sentence, info logs 
+#                                  summaries of training and tagging. 
+#                                  Default is warning.
+#                     -metrics-port <port> = serve metrics of tagging, like
+#                                  sentences and tokens tagged, unknown 
+#                                  words and decode time by sentence length,
+#                                  in Prometheus text format on the port of
+#                                  localhost while the program runs.
+#                     -metrics-file <file> = write these metrics into the
+#                                  file every -metrics-interval <seconds>
+#                                  (default 10) and at the end.
+#                     -timings   = print the time taken by each stage e.g.
+#                                  count, form-HMM, decode and evaluate.
+#                     -profile   = also profile each stage by cProfile into
+#                                  "profile-<stage>.prof" file, and its 
+#                                  memory into "profile-<stage>.memory" if
+#                                  Python has tracemalloc module.
+#
+#                     To do k-fold cross validation on the training file,
+#                     instead of tagging a test file, give number of folds
+#                     and training file only e.g.
+#
+# python pos_tagging.py -cv 10 -tr pos-train.txt -engine trigram
+#
+#                     It prints accuracy, accuracy of unknown words and 
+#                     tokens tagged per second of each fold and all folds.
+#                     The folds are tagged in parallel, by number of CPUs
+#                     processes or by the number given by optional
+#                     -processes <n> input.
 #                     
 #                     This program creates an output file with name 
 #                     "tagging-output", which contains the tagged words from 
@@ -47,10 +147,42 @@
 #                     matrix of tagging, which denotes inaccuracies happened
 #                     in the tagger i.e. percentage of times a tag is 
 #                     incorrectly assigned to a word instead of other tag.
+#                     It also writes "conf_matrix_counts.csv" having counts
+#                     of all tag pairs, "tag_metrics.csv" having precision,
+#                     recall and F1 of each tag, and "evaluation.json"
+#                     having all of these along with accuracy of words seen
+#                     and not seen in training file (known and unknown).
+#                     
+#                     The tagger can also be used from other Python programs,
+#                     without any files, through Tagger class e.g.
+#
+#                     import pos_tagging
+#                     tagger = pos_tagging.Tagger(engine='trigram')
+#                     tagger.train([[('No', 'RB'), (',', ','), ('.', '.')]])
+#                     tags = tagger.tag(['No', ',', '.'])
+#
+#                     tag_batch() tags a list of sentences, save() and 
+#                     load_tagger() save and load a trained tagger.
+#                     ModelRegistry keeps the taggers of several saved 
+#                     models within a memory budget, loading each when it is
+#                     first used and evicting the least recently used e.g.
+#
+#                     registry = pos_tagging.ModelRegistry({'news':
+#                                'news.model', 'finance': 'finance.model'},
+#                                200 * 1024 * 1024)
+#                     tags = registry.tag('finance', ['No', ',', '.'])
+#
+#                     start_model_watch(seconds) reloads a tagger in the
+#                     background when its file is saved again, e.g. by
+#                     -save, and switches to it once it is loaded and
+#                     checked. Requests being tagged go on with the old one.
+#
+#                     pos_tagging.tagger_metrics has metrics of tagging, which
+#                     can be served by its start_http_server(port) or
+#                     written by write_file(file_name) in Prometheus format.
 #                      
 # Algorithm         : 1) This program first reads the training and test files 
-#                        entered by user. And make their copies to keep them
-#                        intact.
+#                        entered by user, without changing or copying them.
 #                     2) It then compares the words from the training file with
 #                        the words from test file to find out the unknown words
 #                     3) The tags of the unknown words are found using a rule
@@ -124,185 +256,400 @@ import collections
 # python csv module is used for pretty printing of confusion matrix
 import csv
 
+# math module is used for log space arithmetic in the decoders
+import math
+
+# heapq module is used for keeping k best paths in k-best viterbi decoder
+import heapq
+
+# time module is used for measuring throughput of the decoders
+import time
+
+# functools module is used for binding decoder names to the Tagger decoders
+import functools
+
+# cPickle module is used for saving and loading trained taggers
+import cPickle
+
+# json module is used for writing the evaluation report
+import json
+
+# multiprocessing module is used for tagging folds of cross validation and
+# sentences of test file in parallel
+import multiprocessing
+
+# logging module is used for logging debug information
+import logging
+
+# bisect module is used for finding the buckets of metrics histograms
+import bisect
+
+# threading module is used for serving and writing metrics in background,
+# and for the pipeline decoding test file in parallel processes
+import threading
+
+# Queue module is used for passing sentences between threads decoding them
+import Queue
+
+# BaseHTTPServer module is used for serving metrics on a local port
+import BaseHTTPServer
+
+# mmap module is used for reading test file through memory maps
+import mmap
+
+# contextlib module is used for timing the stages of the program
+import contextlib
+
+# cProfile module is used for profiling the stages of the program
+import cProfile
+
 '''
-Set the value of debug flag. debug flag is used to decide whether to print
-debug information in the output or not. This flag will be a global variable.
+tracemalloc module is used for profiling memory of the stages, if this
+version of Python has it. It is not there before Python 3.4.
 '''
-debug = False
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
 
-###############################################################################
-# Function      : create_copy(original_file_name)
-# Description   : This function creates a copy of the file, which is passed as
-#                 parameter to the function. It opens the file, reads all line
-#                 from it and writes them into a copy file. Copy file name will
-#                 be same as original file name appended with '.copy' 
-#                 extension.This function will return the name of copy file 
-#                 created.
-# Arguments     : original_file_name- Name of the file for which copy is to be
-#                 created
-# Returns       : The name of copy file created.
-###############################################################################
-def create_copy(original_file_name):
-    
-    '''
-    Open the original file using in built open function in read mode.
-    Open function takes two parameters: 
-    1) Path of the file to be opened
-    2) Mode in which file should be opened. Valid modes are
-       r  - read 
-       w  - write
-       a  - append
-       r+ - read and write
-       b  - binary
-    open function returns a file object (referred hereafter as file handle).
-    We can use this file handle to read, write or append a string to
-    file.
-    '''
-    original_file_handle = open(original_file_name, 'r')
+# array module is used for keeping quantized tables of tagger in less memory
+import array
 
-    '''
-    Create a copy file using open function in write mode. Name of the copy
-    file will be original copy file appended with '.copy'
-    '''
-    copy_file_name = original_file_name + ".copy"
+# gzip, bz2 and io modules are used for reading and writing compressed files
+import gzip
+import bz2
+import io
 
-    copy_file_handle = open(copy_file_name, 'w')
+'''
+lzma module is used for reading and writing xz compressed files. Python 2 
+does not have it, but it can be installed as backports.lzma package.
+'''
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
 
-    '''
-    Read all lines from the original file using its file handle.
-    For this, use in-built readlines function. readlines function reads 
-    lines from the file specified by file handle and returns a Python list
-    containing each line as one element of list. This list will also have a 
-    trailing newline character to each element.
-    e.g. If the contents of file are:
+'''
+Logger of the program. Debug information is logged through it at DEBUG 
+level, and summaries of training and tagging at INFO level, so that they 
+can be turned on without changing the code. Nothing is logged per word or
+per tag, and only every log_sentence_interval-th sentence is logged while
+tagging, so that logging does not slow down tagging of large files.
+'''
+logger = logging.getLogger('pos_tagging')
 
-    Neo
-    Trinity
-    Morpheus
+log_sentence_interval = 100
 
-    then, readlines will return a list with the contents like:
-    ['Neo\n','Trinity\n','Morpheus\n']
+'''
+Regex matching a word of the test file along with the white space before it.
+It is compiled once here, as it is applied to every line of the test file.
+'''
+SENTENCE_WORD_PATTERN = re.compile(r'(\s*)(\S+)')
 
-    '''
-    # read all lines from original file and store them into a list
-    original_file_list = original_file_handle.readlines()
+'''
+Compressions of files read and written by open_file, as (file extension,
+magic bytes at the start of file) pairs.
+'''
+COMPRESSIONS = (('gz', '\x1f\x8b'), ('bz2', 'BZh'), ('xz', '\xfd7zXZ\x00'))
 
-    ''' 
-    Iterate over the original_file_list so that its content can be 
-    written into copy file. For iteration over the list, For loop can be used.
-    Such for loops reads each element of list and store them in a counter 
-    variable automatically. This counter variable is modified to new element
-    on each iteration.
-    e.g. If the elements of a list sample_list are as follows :
+'''
+Numbers of bits of codes of quantized tables of Tagger, and the type codes
+of array objects keeping them.
+'''
+QUANTIZATION_TYPECODES = {8: 'B', 16: 'H'}
 
-    ['Neo\n','Trinity\n','Morpheus\n']
+# names of the decoders which can be used for tagging
+ENGINES = ('bigram', 'posterior', 'kbest', 'trigram')
 
-    and if we write for loop for above list like below
+# names of the Counter objects in counts returned by get_hmm_counts
+HMM_COUNTERS = ('word_freq', 'tag_freq', 'word_tag_freq', 'bigram_freq',\
+                'trigram_freq')
 
-    for sample_list_element in sample_list:
-        print sample_list_element
+'''
+Names of the Counter objects of tags in counts returned by get_hmm_counts,
+which are all that the trigram table is built from, so these are the only
+counts saved with a tagger.
+'''
+TAG_COUNTERS = ('tag_freq', 'bigram_freq', 'trigram_freq')
 
-    then value of sample_list_element for first iteration will be Neo\n.
-    Similarly values of this variable for second and third iteration will be
-    Trinity\n and Morpheus\n resp.
-    '''
+'''
+Seconds spent in each stage of the program, added up by timed_stage. If 
+profile_stages is set, timed_stage also profiles the stages into files.
+'''
+stage_times = collections.OrderedDict()
+profile_stages = False
 
-    '''
-    iterate over original_file_list and write the contents of list to copy file
-    using in-built write function. write function writes a string passed to it
-    into a file, specified by file handle on which write function is called.
-    '''
-    for original_file_line in original_file_list:
-        copy_file_handle.write(original_file_line)
+# name of the stage being profiled, as profiles are not nested
+profiled_stage = None
 
-    '''
-    Close original and copy file using in built close function called on file
-    handle.
-    '''
+'''
+If dump_intermediates is set, dump_intermediate writes the lines made while
+processing the input files into files. It is set by -dump-intermediates
+flag of main, so that the programs using this module are not affected by
+their own command line.
+'''
+dump_intermediates = False
+
+'''
+Number of sentences of test file scheduled together among the processes,
+when they are decoded in parallel processes. The sentences of a window are
+sent to the processes longest first. At most two windows of sentences are
+sent ahead of the sentences given out in order, so the processes go on to
+the next window while the last sentences of a window are decoded.
+'''
+decode_window_size = 1000
+
+'''
+Number of bytes of test file mapped into memory at a time by 
+read_mapped_sentences.
+'''
+read_map_size = 16 * 1024 * 1024
+
+'''
+Number of sentences kept in each queue between the stages of pipeline,
+which decodes the test file in parallel processes.
+'''
+pipeline_queue_size = 2000
+
+'''
+Number of unknown words whose tags are kept in the cache of a tagger. When
+the cache is full it is emptied, so that a tagger running for a long time
+does not keep every unknown word it has seen.
+'''
+unknown_word_cache_size = 100000
+
+'''
+Share of words of gold std. file which could not be aligned with tagging
+output, above which evaluate_tagging warns that the files may not match.
+'''
+misaligned_warning_share = 0.05
+
+# tagger of a process decoding sentences, set by init_decode_worker
+worker_tagger = None
+
+###############################################################################
+# Function      : open_file(file_name, mode)
+# Description   : This function opens a file, which may be compressed by
+#                 gzip, bzip2 or xz. The file is decompressed or compressed
+#                 as it is read or written, so no uncompressed copy of it is
+#                 made on disk. A file being read is taken as compressed if
+#                 it starts with the magic bytes of a compression, whatever
+#                 its name is. A file being written is compressed if its 
+#                 name ends with the extension of a compression (.gz, .bz2
+#                 or .xz). xz needs lzma module, which Python 2 has only as
+#                 backports.lzma package.
+# Arguments     : file_name - Name of the file
+#                 mode - 'r' for reading (default) or 'w' for writing
+# Returns       : A file object of the file.
+###############################################################################
+def open_file(file_name, mode='r'):
+
+    compression = None
+
+    if mode == 'r':
+        file_handle = open(file_name, 'rb')
+        magic_bytes = file_handle.read(max(len(magic) for extension, magic\
+                                       in COMPRESSIONS))
+        file_handle.close()
+
+        for extension, magic in COMPRESSIONS:
+            if magic_bytes.startswith(magic):
+                compression = extension
+    else:
+        for extension, magic in COMPRESSIONS:
+            if file_name.endswith('.' + extension):
+                compression = extension
+
+    if compression is None:
+        return open(file_name, mode)
 
-    original_file_handle.close()
-    copy_file_handle.close()
+    if compression == 'gz':
+        '''
+        Lines of GzipFile are read faster through a BufferedReader in 
+        Python 2.
+        '''
+        if mode == 'r':
+            return io.BufferedReader(gzip.open(file_name, 'rb'))
+
+        return gzip.open(file_name, 'wb')
+
+    if compression == 'bz2':
+        return bz2.BZ2File(file_name, mode)
 
-    return copy_file_name 
+    if lzma is None:
+        raise ImportError("lzma module is needed for xz compressed file: " +\
+                          file_name)
+
+    return lzma.LZMAFile(file_name, mode + 'b')
 
 ###############################################################################
-# End of create_copy Function
+# End of open_file function
 ###############################################################################
 
 ###############################################################################
-# Function      : clean_file(file_name)
-# Description   : This function cleans the file passed as parameter to it.
+# Function      : clean_lines(lines)
+# Description   : This function cleans the lines passed as parameter to it.
 #                 Cleaning process will remove all square brackets from the 
-#                 file passed to this function.
-# Arguments     : file_name - Name of the file to be cleaned.
-# Returns       : None.
+#                 lines. The lines are cleaned one by one as they are read,
+#                 so that no cleaned copy of the file is needed.
+# Arguments     : lines - An iterable of lines to be cleaned, e.g. a file 
+#                         handle.
+# Returns       : A generator of cleaned lines.
 ###############################################################################
-def clean_file(file_name):
-    
-    # open the file in read mode
-    file_handle = open(file_name, 'r') 
+def clean_lines(lines):
 
     '''
-    Get all lines from this file using readlines() function and store into
-    a list.
+    Iterate over the lines and remove all square bracket characters 
+    from each line. For this, in built replace() function will be used.
     '''
-    file_lines_list = file_handle.readlines()
+    for line in lines:
+        yield line.replace('[','').replace(']','')
 
-    '''
-    Close the file. This is required as I want to overwrite the same file.
-    Overwriting will avoid creation of multiple intermediate files.
-    '''
-    file_handle.close()
+###############################################################################
+# End of clean_lines Function
+###############################################################################
+
+###############################################################################
+# Function      : dump_intermediate(file_name, lines)
+# Description   : This function writes lines made while processing the input
+#                 files into a file, if dump_intermediates is set. This is 
+#                 only for debugging, the program does not read these files
+#                 back.
+# Arguments     : file_name - Name of the file to be written
+#                 lines - An iterable of lines to be written
+# Returns       : None.
+###############################################################################
+def dump_intermediate(file_name, lines):
+
+    if not dump_intermediates:
+        return
 
-    '''
-    Now open the file in write mode so as to write all characters except the 
-    square brackets from the file. Using write mode for a file in Python 
-    erases the existing file with the same. And this will facilitate 
-    overwriting of the file for the program.
-    '''
     file_handle = open(file_name, 'w')
 
-    '''
-    Iterate over the file_lines_list and remove all square bracket characters 
-    from each element line of list. For this, in built replace() 
-    function will be used.
-    Write the converted lines into the file specified by file_handle.
-    '''
-    for file_line in file_lines_list:
-        
-        file_handle.write(file_line.replace('[','').replace(']',''))
+    for line in lines:
+        file_handle.write(line)
 
-    # close the file before exiting function
     file_handle.close()
 
 ###############################################################################
-# End of clean_file Function
+# End of dump_intermediate Function
 ###############################################################################
 
 ###############################################################################
-# Function      : form_HMM(train_file)
-# Description   : This function forms the HMM for POS-tagging. It creates the
-#                 tag transition Probabilities matrix and observation likelihood
-#                 Probabilities matrix (which represent HMM in this program) 
-#                 from the training file passed as param.
-#                 
-#                 These two matrices will be used in viterbi algorithm to find
-#                 out most probable tags for each word in test file.
-# Arguments     : train_file -  Name of training file, used to form HMM 
-# Returns       : A dict object storing mapping of tag bigrams to their tag
-#                 tag transition probabilities
-#                 A dict object storing mapping of word-tag pairs with their
-#                 observation likelihood Probabilities
-#                 List of all unique tags - to be used in applying viterbi
-#                 algo to HMM
+# Function      : timed_stage(stage_name)
+# Description   : This function measures the time taken by a stage of the 
+#                 program, used as a context manager e.g.
+#
+#                 with timed_stage('decode'):
+#                     viterbi_decode(test_file_name, tagger)
+#
+#                 The time is added to stage_times of the stage, so a stage
+#                 run many times (e.g. for each sentence) gets its total 
+#                 time. Stages can be nested in other stages.
+#
+#                 If profile_stages is set, the stage is also profiled by
+#                 cProfile into file "profile-<stage name>.prof", which can
+#                 be read by pstats module, and the memory allocated by 
+#                 the stage is written into "profile-<stage name>.memory",
+#                 if tracemalloc module is available. Only the outermost
+#                 stage is profiled, as profilers can not be nested.
+# Arguments     : stage_name - Name of the stage
+# Returns       : A context manager.
 ###############################################################################
-def form_HMM(train_file):
-    
+@contextlib.contextmanager
+def timed_stage(stage_name):
+
+    global profiled_stage
+
+    profile = None
+
+    if profile_stages and profiled_stage is None:
+        profiled_stage = stage_name
+
+        if tracemalloc is not None:
+            tracemalloc.start()
+
+        profile = cProfile.Profile()
+        profile.enable()
+
+    start_time = time.time()
+
+    try:
+        yield
+    finally:
+        stage_times[stage_name] = stage_times.get(stage_name, 0.0) +\
+                                  time.time() - start_time
+
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats('profile-' + stage_name + '.prof')
+
+            if tracemalloc is not None:
+                memory_stats = tracemalloc.take_snapshot().statistics(\
+                               'lineno')
+                tracemalloc.stop()
+
+                memory_file_handle = open('profile-' + stage_name +\
+                                          '.memory', 'w')
+                for memory_stat in memory_stats[:50]:
+                    memory_file_handle.write(str(memory_stat) + '\n')
+                memory_file_handle.close()
+
+            profiled_stage = None
+
+###############################################################################
+# End of timed_stage function
+###############################################################################
+
+###############################################################################
+# Function      : print_stage_times()
+# Description   : This function prints the time taken by each stage, in 
+#                 the sequence the stages were first run. Times of nested 
+#                 stages are also included in the times of outer stages.
+# Arguments     : None.
+# Returns       : None.
+###############################################################################
+def print_stage_times():
+
+    for stage_name, seconds in stage_times.iteritems():
+        print "%-16s %10.3f sec" % (stage_name, seconds)
+
+###############################################################################
+# End of print_stage_times function
+###############################################################################
+
+###############################################################################
+# Function      : get_hmm_counts(train_lines)
+# Description   : This function counts the words and tags of the lines of
+#                 training file passed as param. The HMM is formed from
+#                 these counts by form_HMM function.
+#
+#                 Counts of different parts of training file can be added
+#                 and subtracted by add_hmm_counts and subtract_hmm_counts
+#                 functions, e.g. to form the HMM of all but one fold of
+#                 training file in cross validation without reading it again.
+# Arguments     : train_lines -  An iterable of cleaned lines of training file,
+#                                used to form HMM
+# Returns       : A dict object having following counts:
+#                 'unique_tags' - List of all unique tags, in the sequence
+#                                 they first appear in training file
+#                 'word_freq' - A Counter object of words, as they are
+#                               written in training file
+#                 'tag_freq' - A Counter object of tags
+#                 'word_tag_freq' - A Counter object of (word, tag) pairs
+#                 'bigram_freq' - A Counter object of tag bigrams
+#                 'trigram_freq' - A Counter object of tag trigrams
+###############################################################################
+def get_hmm_counts(train_lines):
+
     '''
-    Start building tag transition Probabilities matrix and observation 
-    likelihood Probabilities matrix.
-    
-    The approach, followed to get theses matrices, is as follows:
+    Start counting the words and tags needed for tag transition
+    Probabilities matrix and observation likelihood Probabilities matrix.
+
+    The approach, followed to get theses counts, is as follows:
     
     1) I am not using any specific sentence marker like <s> for denoting a
     start of sentence tag. Instead of that, I am using '.' for marking
@@ -348,100 +695,70 @@ def form_HMM(train_file):
 
     ['NNP', ',', 'CD', 'NNS', 'JJ', 'MD', 'VB', 'DT', 'NN', 'IN', '.']
 
-    6) Each unique word (type), obtained from the above separating of words and
-    tags, will be stored in a list "unique_words". This list will specify the 
-    space of all valid types. 
+    6) Each word (type), obtained from the above separating of words and
+    tags, will be counted in a Counter object "word_freq", as it is written 
+    in training file i.e. with escaped '/' chars. The words of this counter 
+    specify the space of all known types. 
 
     E.g. if the training file has following contents as given in step 5,then 
-    list of all types unique_words will look like this:
+    the known types will be:
     
     ['.', 'Pierre', 'Vinken', ',', '61', 'years', 'old', 'will', 'join', 'the'
     , 'board', 'as', 'a', 'nonexecutive', 'director', 'Nov.', '29']
 
-    7) A dict object (map) "tag_to_words_mapping_dict" will be maintained that 
-    will store mapping of each POS tag and list of different words that are 
-    tagged for it. This will dict object be used in calculating observation 
-    likelihood.
+    7) A Counter object "word_tag_freq" will be maintained that will store 
+    the number of times each word is tagged with each POS tag, and another 
+    Counter object "tag_freq" the number of times each tag appears. These
+    will be used in calculating observation likelihood.
 
     E.g. if the training file has following contents as given in step 5,then 
-    dict object "tag_to_words_mapping_dict" will look like this:
+    Counter object "word_tag_freq" will look like this:
     
     -------------------------------------------------------------------------
-    | Tag   |   List of words                                               |
-    -------------------------------------------------------------------------
-    | NNP   |   ['Pierre', 'Vinken', 'Nov.']                                |
-    -------------------------------------------------------------------------
-    | ,     |   [',', ',']                                                  |
-    -------------------------------------------------------------------------
-    | CD    |   ['61', '29']                                                |
-    -------------------------------------------------------------------------
-    | NNS   |   ['years']                                                   |
-    -------------------------------------------------------------------------
-    | JJ    |   ['old', 'nonexecutive']                                     |
+    | word-tag pair         |   count                                       |
     -------------------------------------------------------------------------
-    | MD    |   ['will']                                                    |
+    | ('Pierre', 'NNP')     |   1                                           |
     -------------------------------------------------------------------------
-    | VB    |   ['join']                                                    |
+    | (',', ',')            |   2                                           |
     -------------------------------------------------------------------------
-    | DT     |  ['the', 'a']                                                |
+    | ('the', 'DT')         |   1                                           |
     -------------------------------------------------------------------------
-    | NN    |   ['director','board']                                        |
-    -------------------------------------------------------------------------
-    | IN    |   ['as']                                                      |
-    -------------------------------------------------------------------------
-    | .     |   ['.']                                                       |
+    | ('director', 'NN')    |   1                                           |
     -------------------------------------------------------------------------
  
+    Counting the pairs, instead of keeping the list of words tagged for each
+    tag, makes the count of a word-tag pair a lookup instead of a scan of 
+    the list.
 
     8) The sequence in which tags appear in the training file will be stored in
-    a file viz. "tag_sequence_file". This file will be used to calculate tag 
-    transition Probabilities. 
+    a list viz. "tags_sequence". This list will be used to count tag bigrams
+    and trigrams for tag transition Probabilities. 
     
     E.g. if the training file has following contents as given in step 5,then 
-    file "tag_sequence_file" will look like this: 
+    list "tags_sequence" will look like this: 
 
-    "NNP NNP , CD NNS JJ , MD VB DT NN IN DT JJ NN NNP CD ."
+    ['NNP', 'NNP', ',', 'CD', 'NNS', 'JJ', ',', 'MD', 'VB', 'DT', 'NN', 'IN', 
+    'DT', 'JJ', 'NN', 'NNP', 'CD', '.']
  
     '''
     
-    # open the train file in read mode
-    train_file_handle = open(train_file, 'r') 
-
-    # open the tag sequence file in write mode
-    tags_seq_file_name =  'tags_sequence_file'
-    tags_seq_file_handle = open(tags_seq_file_name, 'w')
+    # initialize a list to store the sequence of tags from training file
+    tags_sequence = []
 
     '''
-    Get all lines from training file using readlines() function and store them 
-    into a list. 
-    
-    Append a period tag at the start of contents of this list first.
+    Append a period tag at the start of lines of training file first.
     '''
-    train_file_lines_list = []
-
-    train_file_lines_list.append("./.\n") 
-    for line in train_file_handle.readlines():
-        train_file_lines_list.append(line)
-
-
-    if debug:
-        print train_file_lines_list
-
-    # close the training file
-    train_file_handle.close()
+    train_file_lines_list = itertools.chain(["./.\n"], train_lines)
     
     # initialize a list to store the unique tags from training file
     unique_tags = []
 
-    # initialize a list to store the unique words from training file
-    unique_words = []
-    
     '''
-    Initialize a dict object to store mapping of a POS tag to the words 
-    tagged with it
+    Initialize Counter objects to count words, tags and word-tag pairs
     '''
-    
-    tag_to_words_mapping_dict = {}
+    word_freq = collections.Counter()
+    tag_freq = collections.Counter()
+    word_tag_freq = collections.Counter()
 
     '''
     Iterate over the train_file_lines_list to separate out words from the tags.
@@ -451,20 +768,12 @@ def form_HMM(train_file):
         # convert multi space characters from each line to a single space
         train_file_line = " ".join(train_file_line.split())
         
-        if debug:
-            print "\n"
-            print train_file_line
-        
         '''
         Split each train_file_line by single space characters to get all word
         -tag pairs present in that line. These pairs will be stored in a list
         called as word_tag_pairs_list.
         '''
         word_tag_pairs_list = train_file_line.split(" ")
-
-        if debug:
-            print "\nword-tag pairs:"
-            print word_tag_pairs_list
         
         '''
         Iterate over this pairs' list and separate words and tags from each
@@ -492,33 +801,18 @@ def form_HMM(train_file):
                 # replace all escaped '/' chars from the word with a single '/'
                 word1 = word.replace('\\/', '/')
 
-                if debug:
-                    print word1
-                
-                '''
-                Insert the word into unique_words if it is already not present
-                in it
-                '''
-                if word1 not in unique_words:
-                    unique_words.append(word1)
-
+                # count the word as it is written in training file
+                word_freq[word] += 1
 
                 # get the separated tag
                 tag = word_tag_pair[word_tag_pair.rfind('/') + 1:]
                 
-                if debug:
-                    print tag
-                
                 ''' 
                 If a tag is a composite (ambiguous) tag, then select only 
                 first tag out of it. 
                 '''
                 if '|' in tag:
                     tag = tag.split('|')[0]
-    
-                    if debug:    
-                        print "\ncomposite tag"
-                        print tag 
 
                 '''
                 Insert the tag into unique_tags if it is already no present
@@ -528,217 +822,371 @@ def form_HMM(train_file):
                     unique_tags.append(tag)
 
                 '''
-                Write the tag in the tag sequence file.
-                '''
-                tags_seq_file_handle.write(tag + " ")
-
-                '''
-                Insert the POS tags and words that appear for that tag in the 
-                dict tag_to_words_mapping_dict.This dict object will have all
-                tags as the keys and a list of words that are tagged with the
-                key tag will be the values.
+                Append the tag to the tag sequence.
                 '''
+                tags_sequence.append(tag)
 
                 '''
-                First check if the tag is present in the dict object as a key.
-                Insert it as a key if it is not.
-                '''
-                if tag not in tag_to_words_mapping_dict.keys():
-                        tag_to_words_mapping_dict[tag] = []
-                    
-                '''
-                Add the word to the word list present for the given tag in 
-                tag_to_words_mapping_dict
+                Count the tag and the word tagged with it. The words are
+                counted with '/' chars unescaped, the same way as they are
+                looked up in the HMM.
                 '''
-                tag_to_words_mapping_dict[tag].append(word1)
+                tag_freq[tag] += 1
+                word_tag_freq[(word1, tag)] += 1
 
-    if debug:
-        print unique_tags
-        print len(unique_tags)
-        print unique_words
-        print len(unique_words)
-        print tag_to_words_mapping_dict
+    logger.debug("Counted %d tags, %d words, %d word-tag pairs",\
+                 len(unique_tags), len(word_freq), len(word_tag_freq))
 
-
-    # close the tag sequence file
-    tags_seq_file_handle.close()
-
-    '''
-    Calculate the frequencies of each tag in the tag sequence file. For this,
-    simply calculate the length of each words list from 
-    tag_to_words_mapping_dict for each tag. This length will give the freq of
-    each tag. The mapping of each tag to it's frequency will be stored in 
-    ordered dict object tag_to_freq_dict.
-    
-    In python normal dict object is unordered .To maintain order of insertion, 
-    instead of normal dict, an OrderedDict object will be used. 
-    OrderedDict class belongs to Python module collections. 
-    The usage of ordered dicts was learnt
-    from the article by Doug Hellman, present at the link:
-
-    http://www.doughellmann.com/PyMOTW/collections/ordereddict.html 
-    '''
-    
-    ''' 
-    Initialize an ordered dict object to store the mapping of tags and their
-    frequencies 
     '''
-    tag_to_freq_dict = collections.OrderedDict()
-    
-    for tag, words in tag_to_words_mapping_dict.iteritems():
-        tag_to_freq_dict[tag] = len(words)    
- 
-    if debug:
-        print tag_to_freq_dict
-    
+    Write the tag sequence into "tags_sequence_file", if intermediate files
+    are asked for. The line is joined only then, as it is as long as the
+    training file.
     '''
-    Get the tag transition probabilities matrix by calling 
-    get_tag_trans_prob_matrix function. 
-    
-    This function takes following arguments:
-    1) A dict object storing mappings of each tag to its freq.
-    2) File containing sequence of tags as they appear in training file
-    
-    And it returns an ordered dict object containing mapping of tag bigrams
-    to their tag transition Probabilities. This dict object represents our 
-    tag transition probability matrix.
-    
-    A sample tag transition prob matrix dict object will be like this:
+    if dump_intermediates:
+        dump_intermediate('tags_sequence_file',\
+                          [' '.join(tags_sequence) + ' '])
 
-    -----------------------------------------------------------
-    | tag bigram        |           probability                |
-    -----------------------------------------------------------
-    | ('.','.')         |           0.0000001                 |
-    -----------------------------------------------------------
-    | ('NN','NN')       |           0.0002                    |
-    -----------------------------------------------------------
     '''
+    Count the occurrences of each of tag bigram and trigram from the tags
+    sequence. For this, Counter object will be used.
     
-    tag_transition_prob_matrix = get_tag_trans_prob_matrix(\
-                                 tag_to_freq_dict, tags_seq_file_name)
-
-    if debug:
-       print tag_transition_prob_matrix
-    
-    '''
-    Get the observation likelihood matrix by calling get_obs_lkhd_prob_matrix.
+    The count of bigrams from the word list will be done using
+    Counter object, islice and izip functions from itertools module.
 
-    This function takes following arguments:
-    1) A list containing all unique tags
-    2) A list containing all unique words (types)
-    3) A dict object containing mapping of each POS tag with the list of words
-       tagged for that tag
-    4) A dict object containing mapping of each POS tag with its frequency
+    The sample code for counting the bigrams was posted as a question
+    asked by me on www.stackoverflow.com. The discussion of this
+    question is present in the link:
 
-    
-    And it returns an ordered dict object containing mapping of word-tag
-    pairs with their observation likelihood probabilities. This dict 
-    object represents our observation likelihood matrix.
-    
-    A sample obs. likelihood prob matrix dict object will be like this:
+    http://stackoverflow.com/questions/12488722/
+    counting-bigrams-pair-of-two-words-in-a-file-using-python 
 
-    -----------------------------------------------------------
-    | word-tag pair     |           probability                |
-    -----------------------------------------------------------
-    | ('I','.')         |           0.0000001                 |
-    -----------------------------------------------------------
-    | ('to','TO')       |           0.2907                    |
-    -----------------------------------------------------------
- 
+    I have used the code suggested in the answer by stackoverflow user
+    Abhinav Sarkar. The tags are already separated above, so the regex
+    given in the answer is not needed here.
     '''
+    bigram_freq = collections.Counter(itertools.izip(tags_sequence,\
+                  itertools.islice(tags_sequence, 1, None)))
+    trigram_freq = collections.Counter(itertools.izip(tags_sequence,\
+                   itertools.islice(tags_sequence, 1, None),\
+                   itertools.islice(tags_sequence, 2, None)))
 
-    word_tag_obs_lkhd_dict = get_obs_lkhd_prob_matrix(unique_words,\
-                                                      unique_tags,\
-                                                     tag_to_words_mapping_dict\
-                                                      ,tag_to_freq_dict)
-    if debug:
-        print "HMM"
-        print unique_words
-        print len(unique_words)
-
-    # return tag transition probability matrix and observation likelihood matrix
-    return tag_transition_prob_matrix, word_tag_obs_lkhd_dict \
-    ,unique_tags
+    return {'unique_tags': unique_tags, 'word_freq': word_freq,\
+            'tag_freq': tag_freq, 'word_tag_freq': word_tag_freq,\
+            'bigram_freq': bigram_freq, 'trigram_freq': trigram_freq}
 
 ###############################################################################
-# End of form_HMM function
+# End of get_hmm_counts function
 ###############################################################################
 
 ###############################################################################
-# Function      : get_tag_trans_prob_matrix(tag_to_freq_dict, 
-#                 tags_seq_file_name)
-# Description   : This function creates the tag transition Probabilities matrix
-#                 from the tags list and file containing the seq of tags. 
-# Arguments     : tag_to_freq_dict - A dict object storing mappings of each tag
-#                                    to its freq
-#                 tags_seq_file_name - File containing sequence of tags as they
-#                                      appear in training file 
-# Returns       : An ordered dict object mapping tag bigrams to their tag 
-#                 transition Probabilities.
+# Function      : get_start_counts()
+# Description   : This function gives the counts of the period added at the
+#                 start of training file by get_hmm_counts, i.e. the counts
+#                 of an empty training file. The period is counted as a 
+#                 word, a tag and a word-tag pair, but not in any tag bigram
+#                 or trigram.
+# Arguments     : None.
+# Returns       : A dict object of Counter objects, as in the counts 
+#                 returned by get_hmm_counts.
 ###############################################################################
-def get_tag_trans_prob_matrix(tag_to_freq_dict, tags_seq_file_name):
+def get_start_counts():
 
-    # open the tag sequence file in read mode
-    tags_seq_file_handle = open(tags_seq_file_name,'r')
-    
-    # get the contents of tag sequence file into a list variable
-    tag_seq_file_contents = tags_seq_file_handle.readlines()    
-    
-    '''
-    Iterate over the tag_to_freq_dict twice to form the tags bigrams. These
-    tag bigrams will be stored in another ordered dict tag_bigram_dict as the
-    keys. The Probabilities for these tag bigrams, calculated later in this 
-    function, will be the values for tag bigram keys. These Probabilities are 
-    initialized to 0 here.
+    start_counts = dict((name, collections.Counter()) for name in\
+                        HMM_COUNTERS)
 
-    The keys in this dict will actually be python tuples. The usage of python
-    tuples was learnt from the link:
+    start_counts['word_freq']['.'] = 1
+    start_counts['tag_freq']['.'] = 1
+    start_counts['word_tag_freq'][('.', '.')] = 1
 
-    http://www.tutorialspoint.com/python/python_tuples.htm
-    '''
-    # initialize an ordered dict to store tag bigrams 
+    return start_counts
 
-    tag_bigrams_dict = collections.OrderedDict() 
+###############################################################################
+# End of get_start_counts function
+###############################################################################
 
-    for tag1 in tag_to_freq_dict.keys():
-        for tag2 in tag_to_freq_dict.keys():
-            
-            # Initialize all tag trans. probabilities as 0 for each tag bigram
-            tag_bigrams_dict[(tag1,tag2)] = 0.0000
+###############################################################################
+# Function      : add_hmm_counts(hmm_counts_list)
+# Description   : This function adds the counts of different parts of 
+#                 training file, as returned by get_hmm_counts. Each part 
+#                 is counted with a period at its start, which the whole 
+#                 file has only once, so the counts of the periods added 
+#                 for all parts but the first are taken out of the total.
+#                 The tag trigrams spanning the end of one part and the 
+#                 start of next are not in the counts of either part, so 
+#                 they are not in the total.
+# Arguments     : hmm_counts_list - A list of counts of parts of training file
+# Returns       : A dict object of counts of all the parts together, in the
+#                 same form as returned by get_hmm_counts.
+###############################################################################
+def add_hmm_counts(hmm_counts_list):
+
+    total_counts = {'unique_tags': []}
+    start_counts = get_start_counts()
+
+    for i, hmm_counts in enumerate(hmm_counts_list):
+
+        for tag in hmm_counts['unique_tags']:
+            if tag not in total_counts['unique_tags']:
+                total_counts['unique_tags'].append(tag)
+
+        for name in HMM_COUNTERS:
+            total_counts[name] = total_counts.get(name,\
+                                 collections.Counter()) + hmm_counts[name]
+
+            if i > 0:
+                total_counts[name] = total_counts[name] - start_counts[name]
+
+    return total_counts
+
+###############################################################################
+# End of add_hmm_counts function
+###############################################################################
+
+###############################################################################
+# Function      : subtract_hmm_counts(total_counts, hmm_counts)
+# Description   : This function subtracts the counts of a part of training 
+#                 file from the counts of whole training file, e.g. to get 
+#                 the counts of all folds but one in cross validation. The
+#                 counts of period at the start of the part are subtracted
+#                 along with it, so they are added back for the start of 
+#                 the rest.
+# Arguments     : total_counts - Counts of whole training file
+#                 hmm_counts - Counts of the part of training file, 
+#                              included in total_counts
+# Returns       : A dict object of counts of rest of the training file, in 
+#                 the same form as returned by get_hmm_counts. Tags which 
+#                 are not left in the rest are removed from unique_tags.
+###############################################################################
+def subtract_hmm_counts(total_counts, hmm_counts):
+
+    start_counts = get_start_counts()
+
+    # Counter objects drop the items, whose counts become zero
+    rest_counts = dict((name, total_counts[name] - hmm_counts[name] +\
+                        start_counts[name]) for name in HMM_COUNTERS)
+
+    rest_counts['unique_tags'] = [tag for tag in total_counts['unique_tags']\
+                                  if rest_counts['tag_freq'][tag] > 0]
+
+    return rest_counts
+
+###############################################################################
+# End of subtract_hmm_counts function
+###############################################################################
+
+###############################################################################
+# Function      : prune_hmm_counts(hmm_counts, min_word_count)
+# Description   : This function removes the words seen less than a given
+#                 number of times in training file from the counts, so that
+#                 they are not in the observation likelihood Probabilities 
+#                 matrix and tag dictionary formed from the counts. Such 
+#                 words become unknown words, and are tagged by rule based 
+#                 approach. The counts of tags are not changed, so the 
+#                 observation likelihoods of the words left are the same as
+#                 without pruning.
+# Arguments     : hmm_counts - Counts of training file, as returned by 
+#                              get_hmm_counts
+#                 min_word_count - The least number of times a word should
+#                                  be seen to be kept
+# Returns       : A dict object of pruned counts, in the same form as 
+#                 returned by get_hmm_counts. Counters other than those of
+#                 words are the same objects as in hmm_counts.
+###############################################################################
+def prune_hmm_counts(hmm_counts, min_word_count):
+
+    pruned_counts = dict(hmm_counts)
+
+    pruned_counts['word_freq'] = collections.Counter(dict(\
+        (word, freq) for word, freq in hmm_counts['word_freq'].iteritems()\
+        if freq >= min_word_count))
+
+    '''
+    Words of word-tag pairs have no escaped '/' chars, unlike the words of
+    word_freq, so count them again from the pairs.
+    '''
+    word_counts = collections.Counter()
+
+    for (word, tag), freq in hmm_counts['word_tag_freq'].iteritems():
+        word_counts[word] += freq
+
+    pruned_counts['word_tag_freq'] = collections.Counter(dict(\
+        ((word, tag), freq) for (word, tag), freq in\
+        hmm_counts['word_tag_freq'].iteritems()\
+        if word_counts[word] >= min_word_count))
+
+    logger.debug("Pruned words seen less than %d times: %d of %d words"\
+                 " left", min_word_count, len(pruned_counts['word_freq']),\
+                 len(hmm_counts['word_freq']))
+
+    return pruned_counts
+
+###############################################################################
+# End of prune_hmm_counts function
+###############################################################################
+
+###############################################################################
+# Function      : form_HMM(hmm_counts, smoothing, add_k)
+# Description   : This function forms the HMM for POS-tagging. It creates the
+#                 tag transition Probabilities matrix and observation likelihood
+#                 Probabilities matrix (which represent HMM in this program) 
+#                 from the counts of training file passed as param.
+#                 
+#                 These two matrices will be used in viterbi algorithm to find
+#                 out most probable tags for each word in test file.
+# Arguments     : hmm_counts -  Counts of training file, as returned by 
+#                               get_hmm_counts, used to form HMM 
+#                 smoothing - Smoothing applied to tag transition
+#                             probabilities. See get_tag_trans_prob_matrix.
+#                 add_k - The k used by 'add-k' smoothing
+# Returns       : A dict object storing mapping of tag bigrams to their tag
+#                 tag transition probabilities
+#                 A dict object storing mapping of word-tag pairs with their
+#                 observation likelihood Probabilities
+#                 List of all unique tags - to be used in applying viterbi
+#                 algo to HMM
+###############################################################################
+def form_HMM(hmm_counts, smoothing='none', add_k=1.0):
+
+    unique_tags = hmm_counts['unique_tags']
+
+    '''
+    Get the frequencies of each tag. The mapping of each tag to it's 
+    frequency will be stored in ordered dict object tag_to_freq_dict, in 
+    the sequence of unique_tags.
+    
+    In python normal dict object is unordered .To maintain order of insertion, 
+    instead of normal dict, an OrderedDict object will be used. 
+    OrderedDict class belongs to Python module collections. 
+    The usage of ordered dicts was learnt
+    from the article by Doug Hellman, present at the link:
 
+    http://www.doughellmann.com/PyMOTW/collections/ordereddict.html 
+    '''
+    tag_to_freq_dict = collections.OrderedDict((tag,\
+                       hmm_counts['tag_freq'][tag]) for tag in unique_tags)
     
     '''
-    Count the occurrences of each of tag bigram from the tags sequence file . 
-    For this, Counter object will be used.
+    Get the tag transition probabilities matrix by calling 
+    get_tag_trans_prob_matrix function. 
     
-    The count of bigrams from the word list will be done using
-    Counter object, islice and izip functions from itertools module.
+    This function takes following arguments:
+    1) A dict object storing mappings of each tag to its freq.
+    2) A Counter object of tag bigrams
+    3) Smoothing to be applied for unseen tag bigrams and its k value
+    
+    And it returns an ordered dict object containing mapping of tag bigrams
+    to their tag transition Probabilities. This dict object represents our 
+    tag transition probability matrix.
+    
+    A sample tag transition prob matrix dict object will be like this:
 
-    The sample code for counting the bigrams was posted as a question
-    asked by me on www.stackoverflow.com. The discussion of this
-    question is present in the link:
+    -----------------------------------------------------------
+    | tag bigram        |           probability                |
+    -----------------------------------------------------------
+    | ('.','.')         |           0.0000001                 |
+    -----------------------------------------------------------
+    | ('NN','NN')       |           0.0002                    |
+    -----------------------------------------------------------
+    '''
+    
+    with timed_stage('transitions'):
+        tag_transition_prob_matrix = get_tag_trans_prob_matrix(\
+                                     tag_to_freq_dict,\
+                                     hmm_counts['bigram_freq'],\
+                                     smoothing, add_k)
+
+    logger.debug("Tag transition matrix: %d tag bigrams",\
+                 len(tag_transition_prob_matrix))
+    
+    '''
+    Get the observation likelihood matrix by calling get_obs_lkhd_prob_matrix.
 
-    http://stackoverflow.com/questions/12488722/
-    counting-bigrams-pair-of-two-words-in-a-file-using-python 
+    This function takes following arguments:
+    1) A Counter object of word-tag pairs
+    2) A dict object containing mapping of each POS tag with its frequency
 
-    I have used the code suggested in the answer by stackoverflow user
-    Abhinav Sarkar. I have modified the regex given in the answer to fit
-    for characters that could be present in the tags.
+    And it returns an ordered dict object containing mapping of word-tag
+    pairs with their observation likelihood probabilities. This dict 
+    object represents our observation likelihood matrix. Only the word-tag
+    pairs seen in training file are kept in it, the rest have zero 
+    probability.
     
-    This will give me frequencies for all tag bigrams with non-zero 
-    frequencies. These non-zero frequencies will be stored in the counter 
-    object bigram_non_zero_freq.
+    A sample obs. likelihood prob matrix dict object will be like this:
 
+    -----------------------------------------------------------
+    | word-tag pair     |           probability                |
+    -----------------------------------------------------------
+    | ('I','PRP')       |           0.0412                    |
+    -----------------------------------------------------------
+    | ('to','TO')       |           0.2907                    |
+    -----------------------------------------------------------
+ 
     '''
-    
-    words = re.findall('[\w.,$`\':()#]+', open('tags_sequence_file').read())
-    bigram_non_zero_freq = collections.Counter(itertools.izip(words,\
-                           itertools.islice(words, 1, None)))
+
+    with timed_stage('emissions'):
+        word_tag_obs_lkhd_dict = get_obs_lkhd_prob_matrix(\
+                                 hmm_counts['word_tag_freq'],\
+                                 tag_to_freq_dict)
+
+    '''
+    Return tag transition probability matrix, observation likelihood matrix
+    and unique tags.
+    '''
+    return tag_transition_prob_matrix, word_tag_obs_lkhd_dict, unique_tags
+
+###############################################################################
+# End of form_HMM function
+###############################################################################
+
+###############################################################################
+# Function      : get_tag_trans_prob_matrix(tag_to_freq_dict, 
+#                 bigram_non_zero_freq, smoothing, add_k)
+# Description   : This function creates the tag transition Probabilities matrix
+#                 from the tags list and the counts of tag bigrams. 
+# Arguments     : tag_to_freq_dict - A dict object storing mappings of each tag
+#                                    to its freq
+#                 bigram_non_zero_freq - A Counter object of tag bigrams 
+#                                        appearing in training file 
+#                 smoothing - One of the following:
+#                             'none' - unseen tag bigrams get 0 probability
+#                             'add-k' - add k to count of every tag bigram
+#                             'witten-bell' - Witten-Bell smoothing, backing
+#                                             off to tag unigrams
+#                             'interpolation' - linear interpolation with
+#                                               tag unigrams
+#                 add_k - The k used by 'add-k' smoothing
+# Returns       : An ordered dict object mapping tag bigrams to their tag 
+#                 transition Probabilities.
+###############################################################################
+def get_tag_trans_prob_matrix(tag_to_freq_dict, bigram_non_zero_freq,\
+                              smoothing='none', add_k=1.0):
+
+    '''
+    Iterate over the tag_to_freq_dict twice to form the tags bigrams. These
+    tag bigrams will be stored in another ordered dict tag_bigram_dict as the
+    keys. The Probabilities for these tag bigrams, calculated later in this 
+    function, will be the values for tag bigram keys. These Probabilities are 
+    initialized to 0 here.
+
+    The keys in this dict will actually be python tuples. The usage of python
+    tuples was learnt from the link:
+
+    http://www.tutorialspoint.com/python/python_tuples.htm
+    '''
+    # initialize an ordered dict to store tag bigrams 
+
+    tag_bigrams_dict = collections.OrderedDict() 
+
+    for tag1 in tag_to_freq_dict.keys():
+        for tag2 in tag_to_freq_dict.keys():
+            
+            # Initialize all tag trans. probabilities as 0 for each tag bigram
+            tag_bigrams_dict[(tag1,tag2)] = 0.0000
 
     '''
     Now we have all tag bigrams in the tag_bigrams_dict with probabilities
     initialized as 0. Replace these 0 probabilities only for those tag bigrams
-    which are present in the bigram_non_zero_freq counter object, built above.
+    which are present in the bigram_non_zero_freq counter object.
     Divide the freq counts from bigram_non_zero_freq counter object by 
     freq counts of first unigram in tag bigram (retrieved from 
     tag_to_freq_dict) to get the probabilities.
@@ -749,116 +1197,3502 @@ def get_tag_trans_prob_matrix(tag_to_freq_dict, tags_seq_file_name):
         tag_bigrams_dict[(bigram_str_freq[0])] = \
                                 float(bigram_str_freq[1]) /\
                                 float(tag_to_freq_dict[bigram_str_freq[0][0]])
+
+    '''
+    Apply the smoothing to the probabilities found above, so that unseen
+    tag bigrams don't get a zero probability. A zero probability makes every
+    path through that bigram zero in viterbi's algorithm, and if it happens
+    for all tags of a word, all paths get tied at zero.
+
+    Smoothing is done here once, while forming the HMM, so that decoders
+    never need to handle zero probabilities or back off for each word.
+    '''
+    if smoothing not in ('none', 'add-k', 'witten-bell', 'interpolation'):
+        raise ValueError("unknown smoothing: " + smoothing)
+
+    total_tags = float(sum(tag_to_freq_dict.values()))
+
+    '''
+    For Witten-Bell smoothing, get the number of different tags seen after
+    each tag.
+    '''
+    follower_types_dict = collections.Counter(\
+                          tag1 for tag1, tag2 in bigram_non_zero_freq)
+
+    '''
+    For interpolation, find the weight of the bigram estimate by deleted
+    interpolation, the same way as in get_tag_trigram_log_prob_table. A 
+    training file too short for any tag bigram has only the unigram 
+    estimate.
+    '''
+    if smoothing == 'interpolation':
+
+        bigram_weight = 0.0
+        unigram_weight = 0.0
+
+        for (tag1, tag2), freq in bigram_non_zero_freq.iteritems():
+            if tag_to_freq_dict[tag1] > 1:
+                bigram_estimate = float(freq - 1) /\
+                                  float(tag_to_freq_dict[tag1] - 1)
+            else:
+                bigram_estimate = 0.0
+
+            if total_tags > 1:
+                unigram_estimate = float(tag_to_freq_dict[tag2] - 1) /\
+                                   float(total_tags - 1)
+            else:
+                unigram_estimate = 0.0
+
+            if bigram_estimate >= unigram_estimate:
+                bigram_weight = bigram_weight + freq
+            else:
+                unigram_weight = unigram_weight + freq
+
+        if bigram_weight + unigram_weight:
+            bigram_weight = bigram_weight / (bigram_weight + unigram_weight)
+
+    for (tag1, tag2) in tag_bigrams_dict.keys():
+
+        bigram_freq = float(bigram_non_zero_freq[(tag1, tag2)])
+        tag1_freq = float(tag_to_freq_dict[tag1])
+        unigram_prob = float(tag_to_freq_dict[tag2]) / total_tags
+
+        if smoothing == 'add-k':
+            tag_bigrams_dict[(tag1, tag2)] = (bigram_freq + add_k) /\
+                (tag1_freq + add_k * len(tag_to_freq_dict))
+
+        elif smoothing == 'witten-bell':
+            tag_bigrams_dict[(tag1, tag2)] = (bigram_freq +\
+                follower_types_dict[tag1] * unigram_prob) /\
+                (tag1_freq + follower_types_dict[tag1])
+
+        elif smoothing == 'interpolation':
+            tag_bigrams_dict[(tag1, tag2)] = bigram_weight *\
+                tag_bigrams_dict[(tag1, tag2)] +\
+                (1.0 - bigram_weight) * unigram_prob
+
+    return tag_bigrams_dict
+
+###############################################################################
+# End of get_tag_trans_prob_matrix function
+###############################################################################
+
+###############################################################################
+# Function      : get_tag_trans_log_prob_table(unique_tags,
+#                 tag_transition_prob_matrix)
+# Description   : This function converts the tag transition Probabilities
+#                 matrix into a dense table of log probabilities, which is
+#                 used by the decoders. It is built once after forming the
+#                 HMM, so that decoders only do list lookups and additions.
+# Arguments     : unique_tags - A list storing all valid tags
+#                 tag_transition_prob_matrix - A dict object storing mapping of
+#                                              tag bigrams to their tag
+#                                              tag transition probabilities
+# Returns       : A nested list table[t2][t1] storing log of P(t2 | t1),
+#                 indexed by the positions of tags in unique_tags. Each row
+#                 holds transitions into a tag from all previous tags. Zero
+#                 probabilities are stored as -inf.
+###############################################################################
+def get_tag_trans_log_prob_table(unique_tags, tag_transition_prob_matrix):
+
+    tag_trans_log_prob_table = []
+
+    for tag2 in unique_tags:
+        tag2_row = []
+        for tag1 in unique_tags:
+            prob = tag_transition_prob_matrix[(tag1, tag2)]
+
+            if prob > 0.0:
+                tag2_row.append(math.log(prob))
+            else:
+                tag2_row.append(float('-inf'))
+
+        tag_trans_log_prob_table.append(tag2_row)
+
+    return tag_trans_log_prob_table
+
+###############################################################################
+# End of get_tag_trans_log_prob_table function
+###############################################################################
+
+###############################################################################
+# Function      : get_tag_trigram_log_prob_table(unique_tags,
+#                 hmm_counts)
+# Description   : This function creates the second order (trigram) tag
+#                 transition Probabilities table from the counts of tags. 
+#                 Trigram, bigram and unigram estimates are combined by 
+#                 linear interpolation, so that unseen tag trigrams still get
+#                 a non-zero probability.
+# Arguments     : unique_tags - A list storing all valid tags
+#                 hmm_counts - Counts of training file, as returned by
+#                              get_hmm_counts
+# Returns       : A nested list table[t1][t2][t3] storing log of
+#                 P(t3 | t1, t2), indexed by the positions of tags in
+#                 unique_tags.
+#                 A tuple of the three interpolation weights (unigram, bigram,
+#                 trigram).
+###############################################################################
+def get_tag_trigram_log_prob_table(unique_tags, hmm_counts):
+
+    unigram_freq = hmm_counts['tag_freq']
+    bigram_freq = hmm_counts['bigram_freq']
+    trigram_freq = hmm_counts['trigram_freq']
+
+    total_tags = sum(unigram_freq.values())
+
+    '''
+    Find the interpolation weights by deleted interpolation, as described in
+    Brants (2000) "TnT - A Statistical Part-of-Speech Tagger". For each
+    trigram t1 t2 t3, compare the three estimates of P(t3) with the
+    trigram itself removed from the counts and give the trigram's count to
+    the weight of the estimate which is largest.
+    '''
+    lambda_1 = lambda_2 = lambda_3 = 0.0
+
+    for (tag1, tag2, tag3), freq in trigram_freq.iteritems():
+
+        if bigram_freq[(tag1, tag2)] > 1:
+            trigram_estimate = float(freq - 1) /\
+                               float(bigram_freq[(tag1, tag2)] - 1)
+        else:
+            trigram_estimate = 0.0
+
+        if unigram_freq[tag2] > 1:
+            bigram_estimate = float(bigram_freq[(tag2, tag3)] - 1) /\
+                              float(unigram_freq[tag2] - 1)
+        else:
+            bigram_estimate = 0.0
+
+        unigram_estimate = float(unigram_freq[tag3] - 1) /\
+                           float(total_tags - 1)
+
+        best_estimate = max(unigram_estimate, bigram_estimate,\
+                            trigram_estimate)
+
+        if best_estimate == trigram_estimate:
+            lambda_3 = lambda_3 + freq
+        elif best_estimate == bigram_estimate:
+            lambda_2 = lambda_2 + freq
+        else:
+            lambda_1 = lambda_1 + freq
+
+    lambda_total = lambda_1 + lambda_2 + lambda_3
+
+    # a training file too short for any trigram has only unigram estimates
+    if lambda_total:
+        lambdas = (lambda_1 / lambda_total, lambda_2 / lambda_total,\
+                   lambda_3 / lambda_total)
+    else:
+        lambdas = (1.0, 0.0, 0.0)
+
+    logger.debug("Trigram interpolation weights: %.4f %.4f %.4f", *lambdas)
+
+    '''
+    Build the dense table of interpolated log probabilities.
+
+    P(t3 | t1, t2) = l1 * P(t3) + l2 * P(t3 | t2) + l3 * P(t3 | t1, t2)
+
+    The table is indexed by positions of tags in unique_tags, so that the
+    decoder can look up a whole row of t3 values for a given (t1, t2) state
+    without building any tuple keys.
+    '''
+    tag_trigram_log_prob_table = []
+
+    for tag1 in unique_tags:
+        tag1_rows = []
+        for tag2 in unique_tags:
+            tag2_row = []
+            for tag3 in unique_tags:
+                prob = lambdas[0] * float(unigram_freq[tag3]) /\
+                       float(total_tags)
+
+                if unigram_freq[tag2] > 0:
+                    prob = prob + lambdas[1] *\
+                           float(bigram_freq[(tag2, tag3)]) /\
+                           float(unigram_freq[tag2])
+
+                if bigram_freq[(tag1, tag2)] > 0:
+                    prob = prob + lambdas[2] *\
+                           float(trigram_freq[(tag1, tag2, tag3)]) /\
+                           float(bigram_freq[(tag1, tag2)])
+
+                tag2_row.append(math.log(prob))
+            tag1_rows.append(tag2_row)
+        tag_trigram_log_prob_table.append(tag1_rows)
+
+    return tag_trigram_log_prob_table, lambdas
+
+###############################################################################
+# End of get_tag_trigram_log_prob_table function
+###############################################################################
+
+###############################################################################
+# Function      : get_obs_lkhd_prob_matrix(word_tag_freq, tag_to_freq_dict)
+# Description   : This function creates the observation likelihood probability
+#                 matrix for each word and tag in the training file
+# Arguments     : word_tag_freq - A Counter object of word-tag pairs in the
+#                                 training file
+#                 tag_to_freq_dict - A dict object storing mappings of each tag
+#                                    to its freq
+# Returns       : An ordered dict object mapping word, tag pair to its 
+#                 observation likelihood Probabilities. Word-tag pairs not
+#                 present in it have zero probability.
+###############################################################################
+
+def get_obs_lkhd_prob_matrix(word_tag_freq, tag_to_freq_dict):
+
+    '''
+    Iterate over the word-tag pairs seen in training file. For each such
+    word-tag pair, divide the number of times the word is tagged with tag 
+    in pair by total number of times the tag appears in training file. 
+    The first count will be retrieved from word_tag_freq and second from
+    tag_to_freq_dict.
+    The mapping of each word-tag pair to its observation likelihood probability
+    will be stored in an ordered dict object viz. word_tag_obs_lkhd_dict.
+    '''
     
-    if debug:
-        print tag_bigrams_dict
-        print len(tag_bigrams_dict)
-        
-        
-    # close tag sequence file
-    tags_seq_file_handle.close()
+    word_tag_obs_lkhd_dict =  collections.OrderedDict()
+
+    for (word, tag), freq in word_tag_freq.iteritems():
+
+        word_tag_obs_lkhd_dict[(word,tag)] = \
+            float(freq) / float(tag_to_freq_dict[tag])
+
+    logger.debug("Observation likelihood matrix: %d word-tag pairs",\
+                 len(word_tag_obs_lkhd_dict))
+
+    return word_tag_obs_lkhd_dict
+###############################################################################
+# End of get_obs_lkhd_prob_matrix function
+###############################################################################
+
+###############################################################################
+# Function      : get_tag_dictionary(unique_tags, word_tag_obs_lkhd_dict)
+# Description   : This function creates a tag dictionary, i.e. the list of
+#                 tags each training word has been seen with, along with log
+#                 of the observation likelihood of the word for that tag.
+#                 The decoders use it to consider only these tags for a
+#                 known word instead of all valid tags.
+# Arguments     : unique_tags - A list storing all valid tags
+#                 word_tag_obs_lkhd_dict - A dict object storing mapping
+#                                          of word-tag pairs with their
+#                                          observation likelihood Probabilities
+# Returns       : A dict object mapping each word to a list of
+#                 (tag index, log obs. likelihood) pairs.
+###############################################################################
+def get_tag_dictionary(unique_tags, word_tag_obs_lkhd_dict):
+
+    # map each tag to its position in unique_tags
+    tag_index_dict = dict((tag, i) for i, tag in enumerate(unique_tags))
+
+    tag_dictionary = {}
+
+    for (word, tag), prob in word_tag_obs_lkhd_dict.iteritems():
+        if prob > 0.0:
+            tag_dictionary.setdefault(word, []).append(\
+                (tag_index_dict[tag], math.log(prob)))
+
+    # keep the tags of each word in the sequence of unique_tags
+    for word_candidates in tag_dictionary.itervalues():
+        word_candidates.sort()
+
+    return tag_dictionary
+
+###############################################################################
+# End of get_tag_dictionary function
+###############################################################################
+
+###############################################################################
+# Function      : quantize_log_probs(log_probs, bits)
+# Description   : This function quantizes log probabilities into unsigned 
+#                 integer codes of given number of bits, for keeping the
+#                 tables of a tagger in less memory. The codes are uniform 
+#                 bins of log probabilities between 0 and the lowest log 
+#                 probability, i.e. a log probability is -code * scale. The
+#                 highest code stands for log of 0 probability (-inf).
+# Arguments     : log_probs - An iterable of log probabilities
+#                 bits - Number of bits of a code, 8 or 16
+# Returns       : An array object of codes.
+#                 The scale of codes.
+###############################################################################
+def quantize_log_probs(log_probs, bits):
+
+    log_probs = list(log_probs)
+    max_code = 2 ** bits - 1
+
+    lowest_log_prob = min([log_prob for log_prob in log_probs\
+                           if log_prob != float('-inf')] or [0.0])
+    scale = -lowest_log_prob / (max_code - 1) or 1.0
+
+    codes = array.array(QUANTIZATION_TYPECODES[bits],\
+                        [max_code if log_prob == float('-inf') else\
+                         int(round(-log_prob / scale))\
+                         for log_prob in log_probs])
+
+    return codes, scale
+
+###############################################################################
+# End of quantize_log_probs function
+###############################################################################
+
+###############################################################################
+# Function      : get_dequantized_levels(codes, scale)
+# Description   : This function gives the log probability of each distinct
+#                 code given by quantize_log_probs. Log probabilities got
+#                 back through it share one float object for each code, 
+#                 instead of having one for each log probability.
+# Arguments     : codes - An array object of codes
+#                 scale - The scale of codes
+# Returns       : A dict object mapping each code in codes to its log 
+#                 probability.
+###############################################################################
+def get_dequantized_levels(codes, scale):
+
+    max_code = 2 ** (codes.itemsize * 8) - 1
+
+    return dict((code, float('-inf') if code == max_code else -code * scale)\
+                for code in set(codes))
+
+###############################################################################
+# End of get_dequantized_levels function
+###############################################################################
+
+###############################################################################
+# Function      : dequantize_log_probs(codes, scale)
+# Description   : This function converts the codes given by 
+#                 quantize_log_probs back into log probabilities.
+# Arguments     : codes - An array object of codes
+#                 scale - The scale of codes
+# Returns       : A list of log probabilities, sharing one float object for
+#                 each distinct code.
+###############################################################################
+def dequantize_log_probs(codes, scale):
+
+    return map(get_dequantized_levels(codes, scale).__getitem__, codes)
+
+###############################################################################
+# End of dequantize_log_probs function
+###############################################################################
+
+###############################################################################
+# Function      : get_dequantized_table(codes, scale, row_length, dimensions)
+# Description   : This function converts the codes of a dense table of log 
+#                 probabilities, e.g. tag transition log prob table, into
+#                 the nested lists of log probabilities used by decoders.
+#                 The lists only refer to at most 2 ** bits float objects, 
+#                 so they take about a quarter of the memory of a table 
+#                 built from float log probabilities.
+# Arguments     : codes - An array object of codes of all rows of the table,
+#                         one after another
+#                 scale - The scale of codes
+#                 row_length - Number of log probabilities in a row, i.e. 
+#                              number of tags
+#                 dimensions - Number of dimensions of the table, e.g. 3 
+#                              for tag trigram log prob table
+# Returns       : A nested list of log probabilities.
+###############################################################################
+def get_dequantized_table(codes, scale, row_length, dimensions=2):
+
+    table = dequantize_log_probs(codes, scale)
+
+    for i in range(dimensions - 1):
+        table = [table[j:j + row_length] for j in range(0, len(table),\
+                                                         row_length)]
+
+    return table
+
+###############################################################################
+# End of get_dequantized_table function
+###############################################################################
+
+###############################################################################
+# Class         : QuantizedTagDictionary
+# Description   : This class keeps a tag dictionary, as returned by 
+#                 get_tag_dictionary, in arrays of tag indexes and of 
+#                 quantized log obs. likelihoods, instead of lists of 
+#                 tuples of int and float objects. The (tag index, log obs.
+#                 likelihood) pairs of a word are made only when they are
+#                 looked up by decoders, so the decoders work on the 
+#                 quantized arrays through the same get method as that of 
+#                 a dict object. The log obs. likelihoods are taken from 
+#                 a dict object of the distinct codes, got by 
+#                 get_dequantized_levels, so a lookup makes no float object.
+###############################################################################
+class QuantizedTagDictionary(object):
+
+    ###########################################################################
+    # Function      : __init__(self, tag_dictionary, bits)
+    # Description   : This function quantizes a tag dictionary.
+    # Arguments     : tag_dictionary - A dict object as returned by 
+    #                                  get_tag_dictionary
+    #                 bits - Number of bits of quantized log obs. 
+    #                        likelihoods, 8 or 16
+    # Returns       : None.
+    ###########################################################################
+    def __init__(self, tag_dictionary, bits):
+
+        '''
+        The pairs of all words are kept one after another in the arrays. 
+        Each word is mapped to the position of its first pair and number of
+        its pairs, packed into an int as position << 16 | number.
+        '''
+        self.positions = {}
+
+        tag_indexes = []
+        log_lkhds = []
+
+        for word, word_candidates in tag_dictionary.iteritems():
+
+            self.positions[word] = len(tag_indexes) << 16 |\
+                                   len(word_candidates)
+
+            for tag_index, log_lkhd in word_candidates:
+                tag_indexes.append(tag_index)
+                log_lkhds.append(log_lkhd)
+
+        self.tag_indexes = array.array('B' if max(tag_indexes or [0]) < 256\
+                                       else 'H', tag_indexes)
+        self.codes, self.scale = quantize_log_probs(log_lkhds, bits)
+        self.levels = get_dequantized_levels(self.codes, self.scale)
+
+    ###########################################################################
+    # Function      : get(self, word, default)
+    # Description   : This function gives the (tag index, log obs. 
+    #                 likelihood) pairs of a word.
+    # Arguments     : word - The word
+    #                 default - Value given for a word not in dictionary
+    # Returns       : A list of (tag index, log obs. likelihood) pairs, or 
+    #                 default.
+    ###########################################################################
+    def get(self, word, default=None):
+
+        position = self.positions.get(word)
+
+        if position is None:
+            return default
+
+        start = position >> 16
+        end = start + (position & 0xffff)
+
+        return zip(self.tag_indexes[start:end],\
+                   map(self.levels.__getitem__, self.codes[start:end]))
+
+    ###########################################################################
+    # Function      : __getstate__(self)
+    # Description   : This function gives the attributes to be saved, 
+    #                 leaving out the log obs. likelihoods of the codes, 
+    #                 which are got back from the codes when loaded.
+    # Arguments     : None.
+    # Returns       : A dict object of attributes.
+    ###########################################################################
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+        state['levels'] = None
+
+        return state
+
+    ###########################################################################
+    # Function      : __setstate__(self, state)
+    # Description   : This function sets the attributes of a loaded tag 
+    #                 dictionary.
+    # Arguments     : state - A dict object of attributes, as given by 
+    #                         __getstate__
+    # Returns       : None.
+    ###########################################################################
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self.levels = get_dequantized_levels(self.codes, self.scale)
+
+    def __contains__(self, word):
+
+        return word in self.positions
+
+    def __len__(self):
+
+        return len(self.positions)
+
+###############################################################################
+# End of QuantizedTagDictionary class
+###############################################################################
+
+###############################################################################
+# Function      : get_sentence_candidates(observation_list, unique_tags,
+#                                         tag_dictionary, constraints)
+# Description   : This function finds the tags which each word of a sentence
+#                 can take in the decoders, along with log of obs. likelihood
+#                 of the word for those tags. 
+#                 1) The leading '.' can only take '.' tag.
+#                 2) A word with a constraint (a tag already decided for it, 
+#                    e.g. by rule based approach for unknown words) can only 
+#                    take that tag. This collapses the word's column of the 
+#                    lattice to a single state before decoding. A tag not
+#                    seen in the training file has no state in the lattice,
+#                    so the word is left unconstrained, and the tag is given
+#                    to it after decoding (see Tagger.decode).
+#                 3) A known word can take the tags it has been seen with in 
+#                    the training file (tag dictionary).
+#                 4) An unknown word can take any tag.
+# Arguments     : observation_list - List of words of the sentence, with
+#                                    leading and trailing '.'
+#                 unique_tags - A list storing all valid tags
+#                 tag_dictionary - A dict object mapping words to their
+#                                  (tag index, log obs. likelihood) pairs as
+#                                  returned by get_tag_dictionary
+#                 constraints - A dict object mapping positions in 
+#                               observation_list to their fixed tags. It
+#                               can be None for no constraints.
+# Returns       : A list containing list of (tag index, log obs. likelihood) 
+#                 pairs for each word in observation_list.
+###############################################################################
+def get_sentence_candidates(observation_list, unique_tags, tag_dictionary,\
+                            constraints):
+
+    '''
+    If a unknown word is encountered, then assign a dummy high obs.
+    likelihood prob as 0.99 to it for all tags. This dummy prob value is used
+    just to maintain the flow of viterbi algorithm while switching from each
+    observation to the next. The same dummy prob is used for a constrained
+    tag which the word has never been seen with in the training file.
+    '''
+    unknown_word_log_lkhd = math.log(0.99)
+    unknown_word_candidates = [(i, unknown_word_log_lkhd) for i in\
+                               range(len(unique_tags))]
+
+    candidates_list = [[(unique_tags.index('.'), 0.0)]]
+
+    for i in range(1, len(observation_list)):
+
+        word_candidates = tag_dictionary.get(observation_list[i],\
+                                             unknown_word_candidates)
+
+        if constraints and i in constraints and\
+           constraints[i] in unique_tags:
+            tag = unique_tags.index(constraints[i])
+            word_candidates = [(tag, dict(word_candidates).get(tag,\
+                                unknown_word_log_lkhd))]
+
+        candidates_list.append(word_candidates)
+
+    return candidates_list
+
+###############################################################################
+# End of get_sentence_candidates function
+###############################################################################
+
+###############################################################################
+# Function      : get_unknown_word_constraints(observation_list,
+#                                              unknown_word_tags_mapping)
+# Description   : This function converts the tags decided for unknown words
+#                 by rule based approach into constraints for the decoders,
+#                 so that neighbouring words are decoded knowing the tag of
+#                 unknown word.
+# Arguments     : observation_list - List of words of the sentence, with
+#                                    leading and trailing '.'
+#                 unknown_word_tags_mapping - A dict object containing unknown
+#                                             words and their tags
+# Returns       : A dict object mapping positions of unknown words in 
+#                 observation_list to their tags.
+###############################################################################
+def get_unknown_word_constraints(observation_list, unknown_word_tags_mapping):
+
+    constraints = {}
+
+    for i in range(1, len(observation_list)):
+        if observation_list[i] in unknown_word_tags_mapping:
+            constraints[i] = unknown_word_tags_mapping[observation_list[i]]
+
+    return constraints
+
+###############################################################################
+# End of get_unknown_word_constraints function
+###############################################################################
+
+###############################################################################
+# Function      : read_constraints_file(constraints_file_name, unique_tags)
+# Description   : This function reads tags fixed for words of test file, e.g.
+#                 by an upstream named entity recognizer. Each line of the
+#                 file has three fields separated by spaces:
+#
+#                 <sentence number> <word position> <tag>
+#
+#                 Sentence numbers and word positions start from 1 and the
+#                 word positions do not count square brackets. e.g. the line
+#                 "2 5 NNP" fixes NNP tag for fifth word of second sentence.
+# Arguments     : constraints_file_name - Name of the constraints file
+#                 unique_tags - A list storing all valid tags, or None if 
+#                               tags are not checked
+# Returns       : A dict object mapping sentence numbers to dict objects of
+#                 word positions and their tags. It raises ValueError, if a
+#                 line is not in above format or has a tag not in 
+#                 unique_tags.
+###############################################################################
+def read_constraints_file(constraints_file_name, unique_tags=None):
+
+    sentence_constraints = {}
+
+    constraints_file_handle = open_file(constraints_file_name)
+
+    for line_number, line in enumerate(constraints_file_handle, 1):
+        fields = line.split()
+
+        # skip blank lines
+        if not fields:
+            continue
+
+        error_prefix = "constraints file %s, line %d: " %\
+                       (constraints_file_name, line_number)
+
+        if len(fields) != 3 or not fields[0].isdigit() or\
+           not fields[1].isdigit() or int(fields[0]) < 1 or\
+           int(fields[1]) < 1:
+            raise ValueError(error_prefix + "expected <sentence number> "\
+                             "<word position> <tag>, got " + repr(line))
+
+        if unique_tags is not None and fields[2] not in unique_tags:
+            raise ValueError(error_prefix + "tag " + fields[2] +\
+                             " is not in the training file")
+
+        sentence_constraints.setdefault(int(fields[0]), {})[int(fields[1])] =\
+            fields[2]
+
+    constraints_file_handle.close()
+
+    return sentence_constraints
+
+###############################################################################
+# End of read_constraints_file function
+###############################################################################
+
+###############################################################################
+# Function      : bigram_viterbi_step(previous_path_log_probs,
+#                                     word_candidates,
+#                                     tag_trans_log_prob_table)
+# Description   : This function does the recursion step of bigram viterbi's
+#                 algorithm for one word, i.e. finds viterbi path
+#                 probabilities of the word from those of previous word.
+# Arguments     : previous_path_log_probs - A list of log viterbi path
+#                                           probabilities of previous word,
+#                                           indexed by tag position. Tags not
+#                                           possible for the word have -inf.
+#                 word_candidates - A list of (tag index, log obs. likelihood)
+#                                   pairs for the word
+#                 tag_trans_log_prob_table - A table storing log of tag
+#                                            transition probabilities as
+#                                            returned by
+#                                            get_tag_trans_log_prob_table
+# Returns       : A list of log viterbi path probabilities of the word
+#                 A list giving for each tag of the word the tag of previous
+#                 word, which gave the best path for it (backpointers).
+###############################################################################
+def bigram_viterbi_step(previous_path_log_probs, word_candidates,\
+                        tag_trans_log_prob_table):
+
+    path_log_probs = [float('-inf')] * len(previous_path_log_probs)
+    word_backpointers = [0] * len(previous_path_log_probs)
+
+    '''
+    For a constrained word there is a single candidate, so only one row
+    of transitions is looked at.
+    '''
+    for tag, obs_log_lkhd in word_candidates:
+        '''
+        Row of tag_trans_log_prob_table for tag has the log transition
+        probabilities from each previous tag to this tag, so the path
+        probabilities through each previous tag are found by adding
+        the two lists element-wise.
+        '''
+        previous_viterbi_state_log_probs = map(operator.add,\
+                                           previous_path_log_probs,\
+                                           tag_trans_log_prob_table[tag])
+
+        best_log_prob = max(previous_viterbi_state_log_probs)
+
+        path_log_probs[tag] = best_log_prob + obs_log_lkhd
+        word_backpointers[tag] = previous_viterbi_state_log_probs.\
+                                 index(best_log_prob)
+
+    return path_log_probs, word_backpointers
+
+###############################################################################
+# End of bigram_viterbi_step function
+###############################################################################
+
+###############################################################################
+# Function      : bigram_viterbi_sentence(observation_list, unique_tags,
+#                                         tag_trans_log_prob_table,
+#                                         tag_dictionary, constraints,
+#                                         max_lattice_cells)
+# Description   : This function applies the first order (bigram) viterbi's
+#                 algorithm to the words of a single sentence and finds the
+#                 most probable sequence of tags for them.
+# Arguments     : observation_list - List of words of the sentence, with
+#                                    leading and trailing '.'
+#                 unique_tags - A list storing all valid tags
+#                 tag_trans_log_prob_table - A table storing log of tag
+#                                            transition probabilities as
+#                                            returned by
+#                                            get_tag_trans_log_prob_table
+#                 tag_dictionary - A dict object mapping words to their
+#                                  (tag index, log obs. likelihood) pairs as
+#                                  returned by get_tag_dictionary
+#                 constraints - A dict object mapping positions in 
+#                               observation_list to their fixed tags
+#                 max_lattice_cells - Maximum number of backpointers and path
+#                                     probs (words x tags) to be stored at
+#                                     a time. Longer sentences are decoded
+#                                     by checkpointed_bigram_viterbi_sentence
+#                                     within the same limit. None means no
+#                                     limit.
+# Returns       : A list of tags, one for each word in observation_list.
+###############################################################################
+def bigram_viterbi_sentence(observation_list, unique_tags,\
+                            tag_trans_log_prob_table, tag_dictionary,\
+                            constraints=None, max_lattice_cells=None):
+
+    if max_lattice_cells is not None and\
+       len(observation_list) * len(unique_tags) > max_lattice_cells:
+        return checkpointed_bigram_viterbi_sentence(observation_list,\
+               unique_tags, tag_trans_log_prob_table, tag_dictionary,\
+               constraints, max_lattice_cells)
+
+    # get the possible tags of each word
+    candidates_list = get_sentence_candidates(observation_list, unique_tags,\
+                                              tag_dictionary, constraints)
+
+    '''
+    The viterbi path probabilities of the previous word are kept in a list
+    indexed by tag position, in log space. The tags which are not possible
+    for the previous word have -inf, so that they never win the max 
+    without checking for them.
+
+    Initialize the path prob for first word in the sentence i.e. leading 
+    '.' as 1 (log 0) for '.' tag. This will be start state for viterbi's algo.
+    '''
+    previous_path_log_probs = [float('-inf')] * len(unique_tags)
+    previous_path_log_probs[unique_tags.index('.')] = 0.0
+
+    '''
+    For every word after the leading '.', store a list giving for each 
+    possible tag of that word the tag of previous word, which gave the
+    best path for it.
+    '''
+    backpointers = []
+
+    for i in range(1, len(observation_list)):
+
+        previous_path_log_probs, word_backpointers = bigram_viterbi_step(\
+            previous_path_log_probs, candidates_list[i],\
+            tag_trans_log_prob_table)
+
+        backpointers.append(word_backpointers)
+
+    '''
+    Perform backtracing from the best tag of trailing '.', following the
+    backpointers to the leading '.'.
+    '''
+    tag = previous_path_log_probs.index(max(previous_path_log_probs))
+    tag_indices = [tag]
+
+    for word_backpointers in reversed(backpointers):
+        tag = word_backpointers[tag]
+        tag_indices.append(tag)
+
+    tag_indices.reverse()
+
+    return [unique_tags[tag_index] for tag_index in tag_indices]
+
+###############################################################################
+# End of bigram_viterbi_sentence function
+###############################################################################
+
+###############################################################################
+# Function      : checkpointed_bigram_viterbi_sentence(observation_list,
+#                                         unique_tags,
+#                                         tag_trans_log_prob_table,
+#                                         tag_dictionary, constraints,
+#                                         max_lattice_cells)
+# Description   : This function finds the same tags as bigram_viterbi_sentence
+#                 but without storing backpointers for all words of the
+#                 sentence at once. It is used for very long "sentences", e.g.
+#                 text without sentence ending periods, where the n x T
+#                 backpointers would take too much memory.
+#
+#                 The forward pass only keeps the viterbi path probabilities
+#                 of the first word of each segment of L words (checkpoints).
+#                 The backtrace then goes over the segments from last to
+#                 first, recomputing the backpointers of one segment from its
+#                 checkpoint and backtracing through it. So about 
+#                 (n / L + L) x T values are stored at a time, at the cost of
+#                 doing the recursion step twice for each word. L is the 
+#                 largest segment length for which these fit in 
+#                 max_lattice_cells, or sqrt(n) if it is None.
+# Arguments     : Same as bigram_viterbi_sentence.
+# Returns       : A list of tags, one for each word in observation_list. It
+#                 raises ValueError, if even the fewest checkpoints and
+#                 backpointers do not fit in max_lattice_cells.
+###############################################################################
+def checkpointed_bigram_viterbi_sentence(observation_list, unique_tags,\
+                                         tag_trans_log_prob_table,\
+                                         tag_dictionary, constraints=None,\
+                                         max_lattice_cells=None):
+
+    segment_length = get_checkpoint_segment_length(len(observation_list),\
+                     len(unique_tags), max_lattice_cells)
+
+    # get the possible tags of each word
+    candidates_list = get_sentence_candidates(observation_list, unique_tags,\
+                                              tag_dictionary, constraints)
+
+    previous_path_log_probs = [float('-inf')] * len(unique_tags)
+    previous_path_log_probs[unique_tags.index('.')] = 0.0
+
+    '''
+    Forward pass. Keep the viterbi path probabilities of the words at the
+    start of each segment and throw away the backpointers.
+    '''
+    checkpoints = []
+
+    for i in range(1, len(observation_list)):
+
+        if (i - 1) % segment_length == 0:
+            checkpoints.append((i - 1, previous_path_log_probs))
+
+        previous_path_log_probs = bigram_viterbi_step(previous_path_log_probs,\
+                                  candidates_list[i],\
+                                  tag_trans_log_prob_table)[0]
+
+    # start backtracing from the best tag of trailing '.'
+    tag = previous_path_log_probs.index(max(previous_path_log_probs))
+    tag_indices = [tag]
+
+    '''
+    Backtrace segment by segment, from last segment to first. Recompute
+    backpointers of the words after the segment's checkpoint up to the
+    segment end, and follow them from the tag already found for the end.
+    '''
+    segment_end = len(observation_list) - 1
+
+    for segment_start, path_log_probs in reversed(checkpoints):
+
+        segment_backpointers = []
+
+        for i in range(segment_start + 1, segment_end + 1):
+            path_log_probs, word_backpointers = bigram_viterbi_step(\
+                path_log_probs, candidates_list[i], tag_trans_log_prob_table)
+            segment_backpointers.append(word_backpointers)
+
+        for word_backpointers in reversed(segment_backpointers):
+            tag = word_backpointers[tag]
+            tag_indices.append(tag)
+
+        segment_end = segment_start
+
+    tag_indices.reverse()
+
+    return [unique_tags[tag_index] for tag_index in tag_indices]
+
+###############################################################################
+# End of checkpointed_bigram_viterbi_sentence function
+###############################################################################
+
+###############################################################################
+# Function      : get_checkpoint_segment_length(word_count, tag_count,
+#                                               max_lattice_cells)
+# Description   : This function finds the length of segments between 
+#                 checkpoints for checkpointed_bigram_viterbi_sentence. Its
+#                 forward pass keeps a checkpoint of tag_count path probs 
+#                 for each segment of the word_count - 1 words after the 
+#                 leading '.', and its backtrace keeps the backpointers of 
+#                 one segment, tag_count for each word. So for segment 
+#                 length L, (ceil((word_count - 1) / L) + L) x tag_count 
+#                 values are stored at a time.
+# Arguments     : word_count - Number of words of the sentence, with leading
+#                              and trailing '.'
+#                 tag_count - Number of valid tags
+#                 max_lattice_cells - Maximum number of values to be stored
+#                                     at a time, or None
+# Returns       : The largest segment length for which the values fit in 
+#                 max_lattice_cells, or sqrt(word_count) if it is None. It
+#                 raises ValueError, if the values do not fit in 
+#                 max_lattice_cells for any segment length.
+###############################################################################
+def get_checkpoint_segment_length(word_count, tag_count, max_lattice_cells):
+
+    if max_lattice_cells is None:
+        return max(1, int(math.sqrt(word_count)))
+
+    step_count = max(1, word_count - 1)
+
+    # number of words whose checkpoints and backpointers can be stored
+    max_columns = max_lattice_cells // tag_count
+
+    '''
+    Segment length L fits, if L + ceil(step_count / L) <= max_columns, i.e.
+    if L x L - max_columns x L + step_count <= 0, which holds upto the 
+    larger root of this quadratic. The root is found in floating point, so
+    check the length got from it with integers.
+    '''
+    discriminant = max_columns * max_columns - 4 * step_count
+
+    if discriminant >= 0:
+        segment_length = min(step_count, int((max_columns +\
+                                              math.sqrt(discriminant)) / 2))
+
+        while segment_length > 0 and segment_length +\
+              -(-step_count // segment_length) > max_columns:
+            segment_length = segment_length - 1
+
+        if segment_length > 0:
+            return segment_length
+
+    least_columns = min(length + -(-step_count // length) for length in\
+                        set([int(math.sqrt(step_count)),\
+                             int(math.ceil(math.sqrt(step_count)))]) if length)
+
+    raise ValueError("sentence of %d words needs at least %d lattice cells"\
+                     " (%d tags), max_lattice_cells is %d" % (word_count,\
+                     least_columns * tag_count, tag_count, max_lattice_cells))
+
+###############################################################################
+# End of get_checkpoint_segment_length function
+###############################################################################
+
+###############################################################################
+# Function      : kbest_viterbi_sentence(observation_list, unique_tags,
+#                                        tag_trans_log_prob_table,
+#                                        tag_dictionary, k, constraints)
+# Description   : This function applies the k-best variant of bigram
+#                 viterbi's algorithm to the words of a single sentence and
+#                 finds the k most probable sequences of tags for them.
+#                 Instead of only the best path, the k best paths ending in
+#                 each tag are kept for every word, along with backpointers
+#                 to the tag and the rank of the path of previous word they
+#                 extend.
+# Arguments     : observation_list - List of words of the sentence, with
+#                                    leading and trailing '.'
+#                 unique_tags - A list storing all valid tags
+#                 tag_trans_log_prob_table - A table storing log of tag
+#                                            transition probabilities as
+#                                            returned by
+#                                            get_tag_trans_log_prob_table
+#                 tag_dictionary - A dict object mapping words to their
+#                                  (tag index, log obs. likelihood) pairs as
+#                                  returned by get_tag_dictionary
+#                 k - Number of tag sequences to be found
+#                 constraints - A dict object mapping positions in 
+#                               observation_list to their fixed tags
+# Returns       : A list of up to k (log prob, list of tags) pairs, best
+#                 first. Each list of tags has one tag for each word in
+#                 observation_list.
+###############################################################################
+def kbest_viterbi_sentence(observation_list, unique_tags,\
+                           tag_trans_log_prob_table, tag_dictionary, k,\
+                           constraints=None):
+
+    '''
+    Get the possible tags of each word. The tags of unknown words should
+    be given as constraints here, otherwise the k sequences may only differ
+    in tags of unknown words, which are all replaced in final output.
+    '''
+    candidates_list = get_sentence_candidates(observation_list, unique_tags,\
+                                              tag_dictionary, constraints)
+
+    '''
+    lattice[i] is a dict object mapping each possible tag of word i to the
+    list of up to k best paths ending in it. Each path is stored as
+    (log prob, tag of previous word, rank of path of previous word).
+    The leading '.' has a single path with probability 1 (log 0).
+    '''
+    lattice = [{unique_tags.index('.'): [(0.0, None, None)]}]
+
+    for i in range(1, len(observation_list)):
+
+        word_paths = {}
+
+        for tag, obs_log_lkhd in candidates_list[i]:
+            trans_row = tag_trans_log_prob_table[tag]
+
+            '''
+            Extend each of the k best paths of each tag of previous word
+            to this tag and keep the k best of them.
+            '''
+            extended_paths = [(path[0] + trans_row[prev_tag], prev_tag, rank)\
+                              for prev_tag, prev_paths in\
+                              lattice[i - 1].iteritems()\
+                              for rank, path in enumerate(prev_paths)]
+
+            word_paths[tag] = [(log_prob + obs_log_lkhd, prev_tag, rank) for\
+                               log_prob, prev_tag, rank in\
+                               heapq.nlargest(k, extended_paths)]
+
+        lattice.append(word_paths)
+
+    '''
+    Pick the k best paths ending at trailing '.' and backtrace each of them
+    by following the backpointers to the leading '.'.
+    '''
+    final_paths = heapq.nlargest(k, [(path[0], tag, rank) for tag, paths in\
+                                 lattice[-1].iteritems() for rank, path in\
+                                 enumerate(paths)])
+
+    kbest_list = []
+
+    for log_prob, tag, rank in final_paths:
+        tag_indices = []
+
+        for i in range(len(observation_list) - 1, -1, -1):
+            tag_indices.append(tag)
+            prev_tag, prev_rank = lattice[i][tag][rank][1:]
+            tag, rank = prev_tag, prev_rank
+
+        tag_indices.reverse()
+        kbest_list.append((log_prob, [unique_tags[tag_index] for tag_index\
+                                      in tag_indices]))
+
+    return kbest_list
+
+###############################################################################
+# End of kbest_viterbi_sentence function
+###############################################################################
+
+###############################################################################
+# Function      : get_tag_trans_prob_tables(tag_trans_log_prob_table)
+# Description   : This function converts the dense tag transition log prob
+#                 table back to probabilities for forward-backward algorithm,
+#                 which sums the path probabilities instead of taking max.
+# Arguments     : tag_trans_log_prob_table - A table storing log of tag
+#                                            transition probabilities as
+#                                            returned by
+#                                            get_tag_trans_log_prob_table
+# Returns       : A nested list table[t2][t1] storing P(t2 | t1)
+#                 A nested list table[t1][t2] storing P(t2 | t1)
+###############################################################################
+def get_tag_trans_prob_tables(tag_trans_log_prob_table):
+
+    tag_trans_prob_table = [map(math.exp, tag2_row) for tag2_row in\
+                            tag_trans_log_prob_table]
+
+    # transpose the table to get the rows of transitions from each tag
+    tag_trans_prob_table_by_prev = map(list, zip(*tag_trans_prob_table))
+
+    return tag_trans_prob_table, tag_trans_prob_table_by_prev
+
+###############################################################################
+# End of get_tag_trans_prob_tables function
+###############################################################################
+
+###############################################################################
+# Function      : get_marginal_probs(observation_list, unique_tags,
+#                                    tag_trans_prob_table,
+#                                    tag_trans_prob_table_by_prev,
+#                                    tag_dictionary, constraints)
+# Description   : This function applies forward-backward algorithm to the 
+#                 words of a single sentence to get the marginal probability
+#                 of each tag for each word, i.e. the probability of the word
+#                 having that tag summed over all tag sequences of the 
+#                 sentence.
+# Arguments     : observation_list - List of words of the sentence, with
+#                                    leading and trailing '.'
+#                 unique_tags - A list storing all valid tags
+#                 tag_trans_prob_table, tag_trans_prob_table_by_prev -
+#                                    Tag transition probabilities as returned
+#                                    by get_tag_trans_prob_tables
+#                 tag_dictionary - A dict object mapping words to their
+#                                  (tag index, log obs. likelihood) pairs as
+#                                  returned by get_tag_dictionary
+#                 constraints - A dict object mapping positions in 
+#                               observation_list to their fixed tags
+# Returns       : A list having list of marginal probabilities of all tags,
+#                 indexed by tag position, for each word in observation_list.
+#                 The probabilities of each word add up to 1, unless no tag 
+#                 sequence is possible (only without smoothing), when they 
+#                 are all 0.
+###############################################################################
+def get_marginal_probs(observation_list, unique_tags, tag_trans_prob_table,\
+                       tag_trans_prob_table_by_prev, tag_dictionary,\
+                       constraints=None):
+
+    '''
+    Get the possible tags of each word along with their obs. likelihood
+    probabilities.
+    '''
+    period_index = unique_tags.index('.')
+    tag_count = len(unique_tags)
+    candidates_list = [[(tag, math.exp(obs_log_lkhd)) for tag, obs_log_lkhd\
+                        in word_candidates] for word_candidates in\
+                       get_sentence_candidates(observation_list, unique_tags,\
+                                               tag_dictionary, constraints)]
+
+    '''
+    Only the candidate tags of a word can have non-zero probabilities, so
+    the sums of both passes run over the candidate tags of the neighbouring
+    word, which are found once here. A word which can take any tag (an
+    unconstrained unknown word) is summed over whole rows instead.
+    '''
+    candidate_tags_list = [[tag for tag, obs_lkhd in word_candidates]\
+                           for word_candidates in candidates_list]
+
+    '''
+    Forward pass. forward_probs[i][t] is the probability of all tag
+    sequences for words up to i which end with tag t. To avoid underflow
+    for long sentences, the probabilities of each word are divided by their
+    sum (scaled), and the sums are kept in scales list to be used in the
+    backward pass.
+    '''
+    forward_probs = [[0.0] * tag_count]
+    forward_probs[0][period_index] = 1.0
+    scales = [1.0]
+
+    for i in range(1, len(observation_list)):
+        word_forward_probs = [0.0] * tag_count
+        previous_probs = forward_probs[i - 1]
+        previous_tags = candidate_tags_list[i - 1]
+
+        for tag, obs_lkhd in candidates_list[i]:
+            tag_trans_probs = tag_trans_prob_table[tag]
+
+            if len(previous_tags) == tag_count:
+                forward_prob = sum(map(operator.mul, previous_probs,\
+                                       tag_trans_probs))
+            else:
+                forward_prob = sum([previous_probs[tag1] *\
+                                    tag_trans_probs[tag1] for tag1 in\
+                                    previous_tags])
+
+            word_forward_probs[tag] = forward_prob * obs_lkhd
+
+        scale = sum(word_forward_probs)
+
+        # all paths are zero only if transitions are not smoothed
+        if scale == 0.0:
+            scale = 1.0
+
+        forward_probs.append([prob / scale for prob in word_forward_probs])
+        scales.append(scale)
+
+    '''
+    Backward pass. backward_probs[i][t] is the probability of the words
+    after i given tag t for word i, scaled by the same sums as the forward
+    pass so that forward_probs[i][t] * backward_probs[i][t] directly gives
+    the marginal probability of tag t for word i.
+    '''
+    backward_probs = [None] * len(observation_list)
+    backward_probs[-1] = [1.0] * tag_count
+
+    for i in range(len(observation_list) - 2, -1, -1):
+        next_word_probs = [0.0] * tag_count
+        next_tags = candidate_tags_list[i + 1]
+
+        for tag, obs_lkhd in candidates_list[i + 1]:
+            next_word_probs[tag] = backward_probs[i + 1][tag] * obs_lkhd
+
+        word_backward_probs = [0.0] * tag_count
+
+        for tag in candidate_tags_list[i]:
+            tag_trans_probs = tag_trans_prob_table_by_prev[tag]
+
+            if len(next_tags) == tag_count:
+                backward_prob = sum(map(operator.mul, tag_trans_probs,\
+                                        next_word_probs))
+            else:
+                backward_prob = sum([tag_trans_probs[tag2] *\
+                                     next_word_probs[tag2] for tag2 in\
+                                     next_tags])
+
+            word_backward_probs[tag] = backward_prob / scales[i + 1]
+
+        backward_probs[i] = word_backward_probs
+
+    '''
+    Multiply the forward and backward probabilities of each word, and 
+    divide them by their sum to get the marginal probabilities.
+    '''
+    marginal_probs_list = []
+
+    for i in range(0, len(observation_list)):
+        marginal_probs = map(operator.mul, forward_probs[i],\
+                             backward_probs[i])
+        total_prob = sum(marginal_probs)
+
+        if total_prob == 0.0:
+            total_prob = 1.0
+
+        marginal_probs_list.append([marginal_prob / total_prob for\
+                                    marginal_prob in marginal_probs])
+
+    return marginal_probs_list
+
+###############################################################################
+# End of get_marginal_probs function
+###############################################################################
+
+###############################################################################
+# Function      : posterior_decode_sentence(observation_list, unique_tags,
+#                                           tag_trans_prob_table,
+#                                           tag_trans_prob_table_by_prev,
+#                                           tag_dictionary,
+#                                           unknown_word_tags_mapping,
+#                                           constraints)
+# Description   : This function finds the tag of each word of a single
+#                 sentence by posterior decoding. It gets the marginal 
+#                 probability of each tag for each word by 
+#                 get_marginal_probs, and picks the tag with highest 
+#                 marginal probability. The marginal
+#                 probability of the chosen tag is the confidence of tagger
+#                 for that word.
+# Arguments     : observation_list - List of words of the sentence, with
+#                                    leading and trailing '.'
+#                 unique_tags - A list storing all valid tags
+#                 tag_trans_prob_table, tag_trans_prob_table_by_prev -
+#                                    Tag transition probabilities as returned
+#                                    by get_tag_trans_prob_tables
+#                 tag_dictionary - A dict object mapping words to their
+#                                  (tag index, log obs. likelihood) pairs as
+#                                  returned by get_tag_dictionary
+#                 unknown_word_tags_mapping - A dict object containing unknown
+#                                             words and their tags
+#                 constraints - A dict object mapping positions in 
+#                               observation_list to their fixed tags
+# Returns       : A list of tags, one for each word in observation_list
+#                 A list of marginal probabilities of those tags. For unknown
+#                 words, it is the marginal probability of the tag decided by
+#                 rule based approach.
+###############################################################################
+def posterior_decode_sentence(observation_list, unique_tags,\
+                              tag_trans_prob_table,\
+                              tag_trans_prob_table_by_prev, tag_dictionary,\
+                              unknown_word_tags_mapping, constraints=None):
+
+    marginal_probs_list = get_marginal_probs(observation_list, unique_tags,\
+                          tag_trans_prob_table, tag_trans_prob_table_by_prev,\
+                          tag_dictionary, constraints)
+
+    '''
+    Pick the tag with the highest marginal probability for each word. For
+    unknown words, the tag decided by rule based approach is written in
+    final output, so report the marginal probability of that tag.
+    '''
+    observation_tags = []
+    confidences = []
+
+    for i in range(0, len(observation_list)):
+        marginal_probs = marginal_probs_list[i]
+
+        if observation_list[i] in unknown_word_tags_mapping:
+            tag = unknown_word_tags_mapping[observation_list[i]]
+            tag_index = unique_tags.index(tag) if tag in unique_tags else None
+        else:
+            tag_index = marginal_probs.index(max(marginal_probs))
+            tag = unique_tags[tag_index]
+
+        observation_tags.append(tag)
+
+        if tag_index is None:
+            confidences.append(0.0)
+        else:
+            confidences.append(marginal_probs[tag_index])
+
+    return observation_tags, confidences
+
+###############################################################################
+# End of posterior_decode_sentence function
+###############################################################################
+
+###############################################################################
+# Function      : trigram_viterbi_sentence(observation_list, unique_tags,
+#                                          tag_trigram_log_prob_table,
+#                                          tag_dictionary, beam_width,
+#                                          constraints)
+# Description   : This function applies the second order (trigram) viterbi's
+#                 algorithm to the words of a single sentence and finds the
+#                 most probable sequence of tags for them. The states of the
+#                 lattice are pairs of tags (previous tag, current tag).
+#                 To avoid going over all T^3 tag combinations for each
+#                 word, the lattice is pruned in two ways:
+#                 1) A known word is only paired with the tags it has been
+#                    seen with in the training file (tag dictionary).
+#                 2) At each position, states whose path probability is lower
+#                    than best path probability divided by beam_width are
+#                    dropped (beam search).
+# Arguments     : observation_list - List of words of the sentence, with
+#                                    leading and trailing '.'
+#                 unique_tags - A list storing all valid tags
+#                 tag_trigram_log_prob_table - A table storing log of
+#                                              P(t3 | t1, t2) as returned by
+#                                              get_tag_trigram_log_prob_table
+#                 tag_dictionary - A dict object mapping words to their
+#                                  (tag index, log obs. likelihood) pairs as
+#                                  returned by get_tag_dictionary
+#                 beam_width - Ratio between best path prob and lowest path
+#                              prob that is kept at each position
+#                 constraints - A dict object mapping positions in 
+#                               observation_list to their fixed tags
+# Returns       : A list of tags, one for each word in observation_list.
+###############################################################################
+def trigram_viterbi_sentence(observation_list, unique_tags,\
+                             tag_trigram_log_prob_table, tag_dictionary,\
+                             beam_width, constraints=None):
+
+    # get the possible tags of each word
+    candidates_list = get_sentence_candidates(observation_list, unique_tags,\
+                                              tag_dictionary, constraints)
+
+    log_beam_width = math.log(beam_width)
+
+    '''
+    The leading '.' is the start state. It is paired with a '.' as its
+    previous tag, as the training file is also started with a period.
+    The path probabilities are kept in log space, so that they are added
+    instead of multiplied and do not underflow for long sentences.
+    '''
+    period_index = unique_tags.index('.')
+    states = {(period_index, period_index): 0.0}
+
+    '''
+    For every position, store a dict object mapping each tag pair state to
+    the tag before it, which gave the best path for that state.
+    '''
+    backpointers = []
+
+    for i in range(1, len(observation_list)):
+
+        new_states = {}
+        new_backpointers = {}
+
+        for (tag1, tag2), path_log_prob in states.iteritems():
+            trans_row = tag_trigram_log_prob_table[tag1][tag2]
+
+            for tag3, obs_log_lkhd in candidates_list[i]:
+                log_prob = path_log_prob + trans_row[tag3] + obs_log_lkhd
+                state = (tag2, tag3)
+
+                if state not in new_states or log_prob > new_states[state]:
+                    new_states[state] = log_prob
+                    new_backpointers[state] = tag1
+
+        # prune the states falling out of the beam
+        threshold = max(new_states.itervalues()) - log_beam_width
+        states = dict((state, log_prob) for state, log_prob in\
+                      new_states.iteritems() if log_prob >= threshold)
+
+        backpointers.append(new_backpointers)
+
+    '''
+    Backtrace from the best state at the trailing '.'. backpointers[i - 1]
+    gives the tag at position i - 2 for the tag pair at positions i - 1
+    and i.
+    '''
+    tag1, tag2 = max(states, key=states.get)
+    tag_indices = [tag2, tag1]
+
+    for i in range(len(observation_list) - 1, 1, -1):
+        tag0 = backpointers[i - 1][(tag1, tag2)]
+        tag_indices.append(tag0)
+        tag1, tag2 = tag0, tag1
+
+    tag_indices.reverse()
+
+    return [unique_tags[tag_index] for tag_index in tag_indices]
+
+###############################################################################
+# End of trigram_viterbi_sentence function
+###############################################################################
+
+###############################################################################
+# Function      : read_sentences(file_name)
+# Description   : This function reads the test file and yields its 
+#                 sentences one by one. A sentence ends at a word which
+#                 is a single period '.' character, so that periods in
+#                 abbreviations, fractional numbers and strings like '...' are
+#                 not taken as sentence ends.
+#
+#                 Along with the words of the sentence, it gives the white
+#                 space (spaces and newlines) found before each word in the
+#                 file. This keeps the original line layout of the test file,
+#                 so that the tagged words can be written in the same layout
+#                 without reading the test file again.
+#
+#                 An uncompressed file is read through memory maps by 
+#                 read_mapped_sentences function, and a compressed file line
+#                 by line by read_line_sentences function. Both give the same
+#                 sentences.
+# Arguments     : file_name -  Name of the test file, which may be
+#                                compressed
+# Returns       : A generator of (words, spaces) pairs, one for each sentence.
+#                 words is the list of words of the sentence along with the
+#                 square brackets. spaces is a list having the white space
+#                 before each word, and one more element for the white space
+#                 after the last word upto the end of its line.
+###############################################################################
+def read_sentences(file_name):
+
+    file_handle = open_file(file_name)
+
+    if isinstance(file_handle, file):
+        sentences = read_mapped_sentences(file_handle)
+    else:
+        sentences = read_line_sentences(file_handle)
+
+    for sentence in sentences:
+        yield sentence
+
+    file_handle.close()
+
+###############################################################################
+# End of read_sentences function
+###############################################################################
+
+###############################################################################
+# Function      : read_mapped_sentences(file_handle)
+# Description   : This function reads the sentences of an uncompressed test
+#                 file, as described for read_sentences, through memory maps
+#                 of the file. The words are found by matching 
+#                 SENTENCE_WORD_PATTERN over the mapped bytes, so the file is
+#                 not split into lines and no string is made for the text
+#                 of file other than the words and white space given out.
+#
+#                 The file is mapped in parts of read_map_size bytes, each
+#                 ending at the end of a line, so that no word is split 
+#                 between two parts, and only one part is mapped at a time.
+#                 So the memory used does not grow with the size of file.
+# Arguments     : file_handle - File object of the test file
+# Returns       : A generator of (words, spaces) pairs, as described for 
+#                 read_sentences.
+###############################################################################
+def read_mapped_sentences(file_handle):
+
+    file_size = os.fstat(file_handle.fileno()).st_size
+
+    words = []
+    spaces = []
+
+    # white space read from the file but not yet put before any word
+    pending_space = ''
+
+    # offset in the file upto which it has been read
+    file_offset = 0
+
+    while file_offset < file_size:
+
+        '''
+        Map the part of file starting at file_offset. A map can start only
+        at a multiple of mmap.ALLOCATIONGRANULARITY, so it may start a bit 
+        before file_offset. The part is made larger, if it does not have a
+        line end, unless it is the last part of file.
+        '''
+        map_offset = file_offset - file_offset % mmap.ALLOCATIONGRANULARITY
+        map_size = read_map_size
+
+        while True:
+
+            map_size = min(map_size, file_size - map_offset)
+            file_map = mmap.mmap(file_handle.fileno(), map_size,\
+                                 access=mmap.ACCESS_READ, offset=map_offset)
+            position = file_offset - map_offset
+
+            if map_offset + map_size == file_size:
+                part_end = map_size
+                break
+
+            part_end = file_map.rfind('\n', position) + 1
+
+            if part_end > 0:
+                break
+
+            file_map.close()
+            map_size = map_size * 2
+
+        for match in SENTENCE_WORD_PATTERN.finditer(file_map, position,\
+                                                    part_end):
+            '''
+            If the previous word on this line ended a sentence, then this
+            word starts the next sentence.
+            '''
+            if words and words[-1] == '.':
+                spaces.append('')
+                yield words, spaces
+                words = []
+                spaces = []
+
+            spaces.append(pending_space + file_map[position:match.start(2)])
+            words.append(match.group(2))
+            pending_space = ''
+            position = match.end()
+
+            '''
+            If this word ends a sentence and it is the last word of its 
+            line, then give out the sentence with the white space upto the 
+            end of line.
+            '''
+            if words[-1] == '.':
+                line_end = file_map.find('\n', position, part_end)
+
+                if line_end != -1 and\
+                   not file_map[position:line_end].strip():
+                    spaces.append(file_map[position:line_end + 1])
+                    yield words, spaces
+                    words = []
+                    spaces = []
+                    position = line_end + 1
+
+        pending_space = pending_space + file_map[position:part_end]
+        file_offset = map_offset + part_end
+        file_map.close()
+
+    '''
+    Give out the words after the last period, if any, along with the white
+    space at the end of the file.
+    '''
+    if words or pending_space:
+        spaces.append(pending_space)
+        yield words, spaces
+
+###############################################################################
+# End of read_mapped_sentences function
+###############################################################################
+
+###############################################################################
+# Function      : read_line_sentences(file_handle)
+# Description   : This function reads the sentences of a test file, as 
+#                 described for read_sentences, line by line. It is used for
+#                 compressed files, which cannot be mapped into memory.
+# Arguments     : file_handle - File object of the test file
+# Returns       : A generator of (words, spaces) pairs, as described for 
+#                 read_sentences.
+###############################################################################
+def read_line_sentences(file_handle):
+
+    words = []
+    spaces = []
+
+    # white space read from the file but not yet put before any word
+    pending_space = ''
+
+    for line in file_handle:
+
+        line_end = 0
+
+        for match in SENTENCE_WORD_PATTERN.finditer(line):
+            '''
+            If the previous word on this line ended a sentence, then this
+            word starts the next sentence.
+            '''
+            if words and words[-1] == '.':
+                spaces.append('')
+                yield words, spaces
+                words = []
+                spaces = []
+
+            spaces.append(pending_space + match.group(1))
+            words.append(match.group(2))
+            pending_space = ''
+            line_end = match.end()
+
+        pending_space = pending_space + line[line_end:]
+
+        # if the last word of the line ended a sentence, then give it out
+        if words and words[-1] == '.':
+            spaces.append(pending_space)
+            yield words, spaces
+            words = []
+            spaces = []
+            pending_space = ''
+
+    '''
+    Give out the words after the last period, if any, along with the white
+    space at the end of the file.
+    '''
+    if words or pending_space:
+        spaces.append(pending_space)
+        yield words, spaces
+
+###############################################################################
+# End of read_line_sentences function
+###############################################################################
+
+###############################################################################
+# Function      : get_observation_lists(sentence_words)
+# Description   : This function converts the words of a sentence from the
+#                 test file into the list of words given to the decoders.
+# Arguments     : sentence_words - List of words of the sentence as given by
+#                                  read_sentences
+# Returns       : List of words with leading and trailing '.' along with the
+#                 square brackets
+#                 Same list with the square brackets removed
+###############################################################################
+def get_observation_lists(sentence_words):
+
+    # append a leading period
+    observation_list1 = ['.'] + sentence_words
+
+    '''
+    Append a trailing period, if the sentence does not end with one. This 
+    can happen for the last sentence of the test file.
+    '''
+    if len(observation_list1) == 1 or observation_list1[-1] != '.':
+        observation_list1.append('.')
+    
+    '''
+    Remove all square brackets from the observation list created above and
+    create a new list with remaining words. Square brackets are not used
+    in POS tagging so removal of them is okay here. 
+
+    The approach for removing all occurrences of square brackets from 
+    a python list is borrowed from a similar question asked on 
+    stackoverflow forum. It can be found here :
+
+    http://stackoverflow.com/questions/1157106/
+    remove-all-occurences-of-a-value-from-a-python-list
+
+    I have followed the usage of lambda expressions as suggested by 
+    answer given by user "Mark Rushakoff" for above mentioned question.
+    '''
+
+    observation_list = filter (lambda a: a != '[' and  a != ']',\
+                               observation_list1)
+
+    return observation_list1, observation_list
+
+###############################################################################
+# End of get_observation_lists function
+###############################################################################
+
+###############################################################################
+# Function      : benchmark_decoders(test_file, decoders, clear_cache)
+# Description   : This function measures the throughput of the decoders on
+#                 the sentences of test file and prints tokens decoded per
+#                 second for each decoder.
+# Arguments     : test_file -  Name of test file
+#                 decoders - A list of (name, decoder) pairs. A decoder is a
+#                            function taking observation list of a sentence
+#                            and its constraints, and returning its list of
+#                            tags (or tags and their confidences).
+#                 clear_cache - A function called before timing each 
+#                               decoder, e.g. to empty the cache of tags of
+#                               unknown words, so that every decoder finds
+#                               them again. It can be None.
+# Returns       : An ordered dict object mapping decoder name to its tokens
+#                 per second.
+###############################################################################
+def benchmark_decoders(test_file, decoders, clear_cache=None):
+
+    # read the sentences of the test file the same way as viterbi_decode
+    observation_lists = [get_observation_lists(words)[1] for words, spaces in\
+                         read_sentences(test_file) if words]
+
+    # leading '.' is only a start state, so it is not counted as a token
+    token_count = sum(len(observation_list) - 1 for observation_list in\
+                      observation_lists)
+
+    tokens_per_sec_dict = collections.OrderedDict()
+
+    for decoder_name, decoder in decoders:
+
+        if clear_cache:
+            clear_cache()
+
+        start_time = time.time()
+
+        for observation_list in observation_lists:
+            decoder(observation_list, None)
+
+        elapsed_time = time.time() - start_time
+        tokens_per_sec_dict[decoder_name] = token_count / elapsed_time
+
+        print "%-10s %10.1f tokens/sec (%d tokens in %.2f sec)" %\
+              (decoder_name, tokens_per_sec_dict[decoder_name], token_count,\
+               elapsed_time)
+
+    return tokens_per_sec_dict
+
+###############################################################################
+# End of benchmark_decoders function
+###############################################################################
+
+###############################################################################
+# Class         : TaggerMetrics
+# Description   : This class keeps the operational metrics of a tagger 
+#                 running for a long time e.g. as a service, so that its
+#                 workers can be sized and slow inputs can be spotted:
+#                 1) Counters of sentences, tokens and unknown words tagged
+#                 2) Histograms of length of sentences, and of time taken
+#                    to decode a sentence for each bucket of lengths
+#                 3) Counters of hits and misses of the cache of tags of
+#                    unknown words. An unknown word is looked up once for
+#                    a sentence, so it is counted once for each sentence
+#                    it is in.
+#                 4) Time taken to load or train the tagger
+#                 5) Counters of taggers loaded, evicted and reloaded by 
+#                    model registry, and the number and size of taggers 
+#                    loaded in it
+#
+#                 The metrics are given in Prometheus text format, which 
+#                 can be served on a local port or written into a file 
+#                 periodically. Tagger records its metrics in the 
+#                 tagger_metrics object of this class.
+###############################################################################
+class TaggerMetrics(object):
+
+    # names and descriptions of counters
+    COUNTERS = (('sentences_total', 'Sentences tagged'),\
+                ('tokens_total', 'Tokens tagged'),\
+                ('unknown_words_total', 'Unknown words tagged'),\
+                ('unknown_word_cache_hits_total',\
+                 'Distinct unknown words of sentences whose tags were'\
+                 ' found in the cache'),\
+                ('unknown_word_cache_misses_total',\
+                 'Distinct unknown words of sentences whose tags were not'\
+                 ' in the cache'),\
+                ('model_loads_total', 'Taggers loaded by model registry'),\
+                ('model_evictions_total',\
+                 'Taggers evicted by model registry'),\
+                ('model_registry_hits_total',\
+                 'Requests for taggers already loaded in model registry'),\
+                ('model_reloads_total',\
+                 'Taggers reloaded by model registry after their files'\
+                 ' changed'),\
+                ('model_reload_failures_total',\
+                 'Changed files of taggers which could not be reloaded'))
+
+    # upper bounds of buckets of sentence lengths, in tokens
+    LENGTH_BUCKETS = (10, 20, 40, 80)
+
+    # upper bounds of buckets of decode time of a sentence, in seconds
+    LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,\
+                       0.1, 0.25, 0.5, 1.0)
+
+    ###########################################################################
+    # Function      : __init__(self)
+    # Description   : This function creates the metrics with all counts 0.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def __init__(self):
+
+        # metrics can be recorded and read by different threads
+        self.lock = threading.Lock()
+
+        self.counters = collections.OrderedDict((name, 0) for name,\
+                        help_text in self.COUNTERS)
+
+        self.model_load_seconds = 0.0
+        self.model_train_seconds = 0.0
+
+        # number and total file size of taggers loaded in model registry
+        self.loaded_models = 0
+        self.loaded_model_bytes = 0
+
+        '''
+        Counts of sentences in each length bucket, and for each length
+        bucket the counts of sentences in each latency bucket along with
+        the total decode time. The last bucket of each is for values above
+        all upper bounds.
+        '''
+        self.length_counts = [0] * (len(self.LENGTH_BUCKETS) + 1)
+        self.latency_counts = [[0] * (len(self.LATENCY_BUCKETS) + 1)\
+                               for bucket in self.length_counts]
+        self.latency_sums = [0.0] * len(self.length_counts)
+
+    ###########################################################################
+    # Function      : count(self, name)
+    # Description   : This function adds one to a counter.
+    # Arguments     : name - Name of the counter, one of COUNTERS
+    # Returns       : None.
+    ###########################################################################
+    def count(self, name):
+
+        with self.lock:
+            self.counters[name] += 1
+
+    ###########################################################################
+    # Function      : observe_sentence(self, token_count, unknown_count,
+    #                                  cache_hit_count, cache_miss_count,
+    #                                  seconds)
+    # Description   : This function records the metrics of a tagged sentence.
+    # Arguments     : token_count - Number of tokens of the sentence
+    #                 unknown_count - Number of unknown words in it
+    #                 cache_hit_count - Number of distinct unknown words of
+    #                                   the sentence whose tags were 
+    #                                   already in the cache
+    #                 cache_miss_count - Number of distinct unknown words of
+    #                                    the sentence whose tags were not in
+    #                                    the cache
+    #                 seconds - Time taken to decode the sentence
+    # Returns       : None.
+    ###########################################################################
+    def observe_sentence(self, token_count, unknown_count, cache_hit_count,\
+                         cache_miss_count, seconds):
+
+        length_bucket = bisect.bisect_left(self.LENGTH_BUCKETS, token_count)
+        latency_bucket = bisect.bisect_left(self.LATENCY_BUCKETS, seconds)
+
+        with self.lock:
+            self.counters['sentences_total'] += 1
+            self.counters['tokens_total'] += token_count
+            self.counters['unknown_words_total'] += unknown_count
+            self.counters['unknown_word_cache_hits_total'] += cache_hit_count
+            self.counters['unknown_word_cache_misses_total'] += \
+                cache_miss_count
+
+            self.length_counts[length_bucket] += 1
+            self.latency_counts[length_bucket][latency_bucket] += 1
+            self.latency_sums[length_bucket] += seconds
+
+    ###########################################################################
+    # Function      : get_prometheus_text(self)
+    # Description   : This function gives the metrics in Prometheus text 
+    #                 exposition format. Decode time histogram has a label
+    #                 'length' for the bucket of sentence lengths, e.g. 
+    #                 "11-20" tokens.
+    # Arguments     : None.
+    # Returns       : A string of the metrics.
+    ###########################################################################
+    def get_prometheus_text(self):
+
+        lines = []
+
+        def add_metric(name, metric_type, help_text):
+            lines.append('# HELP pos_tagger_%s %s' % (name, help_text))
+            lines.append('# TYPE pos_tagger_%s %s' % (name, metric_type))
+
+        length_labels = []
+        lower_bound = 1
+
+        for upper_bound in self.LENGTH_BUCKETS:
+            length_labels.append('%d-%d' % (lower_bound, upper_bound))
+            lower_bound = upper_bound + 1
+
+        length_labels.append('%d+' % lower_bound)
+
+        with self.lock:
+
+            for name, help_text in self.COUNTERS:
+                add_metric(name, 'counter', help_text)
+                lines.append('pos_tagger_%s %d' % (name, self.counters[name]))
+
+            unknown_count = self.counters['unknown_words_total']
+
+            add_metric('unknown_word_ratio', 'gauge',\
+                       'Fraction of tokens which are unknown words')
+            lines.append('pos_tagger_unknown_word_ratio %.6f' %\
+                         (float(unknown_count) /\
+                          max(self.counters['tokens_total'], 1)))
+
+            cache_hit_count = self.counters['unknown_word_cache_hits_total']
+
+            add_metric('unknown_word_cache_hit_ratio', 'gauge',\
+                       'Fraction of lookups of cache of unknown words which'\
+                       ' were hits')
+            lines.append('pos_tagger_unknown_word_cache_hit_ratio %.6f' %\
+                         (float(cache_hit_count) / max(cache_hit_count +\
+                          self.counters['unknown_word_cache_misses_total'],\
+                          1)))
+
+            add_metric('model_load_seconds', 'gauge',\
+                       'Time taken to load the tagger')
+            lines.append('pos_tagger_model_load_seconds %.6f' %\
+                         self.model_load_seconds)
+
+            add_metric('model_train_seconds', 'gauge',\
+                       'Time taken to train the tagger')
+            lines.append('pos_tagger_model_train_seconds %.6f' %\
+                         self.model_train_seconds)
+
+            add_metric('loaded_models', 'gauge',\
+                       'Taggers loaded in model registry')
+            lines.append('pos_tagger_loaded_models %d' % self.loaded_models)
+
+            add_metric('loaded_model_bytes', 'gauge',\
+                       'Total file size of taggers loaded in model registry')
+            lines.append('pos_tagger_loaded_model_bytes %d' %\
+                         self.loaded_model_bytes)
+
+            add_metric('sentence_length_tokens', 'histogram',\
+                       'Number of tokens of sentences tagged')
+            cumulative_count = 0
+
+            for upper_bound, count in zip(self.LENGTH_BUCKETS,\
+                                          self.length_counts):
+                cumulative_count = cumulative_count + count
+                lines.append('pos_tagger_sentence_length_tokens_bucket'\
+                             '{le="%d"} %d' % (upper_bound, cumulative_count))
+
+            lines.append('pos_tagger_sentence_length_tokens_bucket'\
+                         '{le="+Inf"} %d' % self.counters['sentences_total'])
+            lines.append('pos_tagger_sentence_length_tokens_sum %d' %\
+                         self.counters['tokens_total'])
+            lines.append('pos_tagger_sentence_length_tokens_count %d' %\
+                         self.counters['sentences_total'])
+
+            add_metric('sentence_decode_seconds', 'histogram',\
+                       'Time taken to decode a sentence, by its length')
+
+            for length_label, latency_counts, latency_sum, length_count in\
+                zip(length_labels, self.latency_counts, self.latency_sums,\
+                    self.length_counts):
+
+                cumulative_count = 0
+
+                for upper_bound, count in zip(self.LATENCY_BUCKETS,\
+                                              latency_counts):
+                    cumulative_count = cumulative_count + count
+                    lines.append('pos_tagger_sentence_decode_seconds_bucket'\
+                                 '{length="%s",le="%g"} %d' % (length_label,\
+                                 upper_bound, cumulative_count))
+
+                lines.append('pos_tagger_sentence_decode_seconds_bucket'\
+                             '{length="%s",le="+Inf"} %d' % (length_label,\
+                             length_count))
+                lines.append('pos_tagger_sentence_decode_seconds_sum'\
+                             '{length="%s"} %.6f' % (length_label,\
+                             latency_sum))
+                lines.append('pos_tagger_sentence_decode_seconds_count'\
+                             '{length="%s"} %d' % (length_label,\
+                             length_count))
+
+        return '\n'.join(lines) + '\n'
+
+    ###########################################################################
+    # Function      : write_file(self, file_name)
+    # Description   : This function writes the metrics into a file. The file
+    #                 is replaced at once, so that a reader never sees it
+    #                 half written.
+    # Arguments     : file_name - Name of the file
+    # Returns       : None.
+    ###########################################################################
+    def write_file(self, file_name):
+
+        file_handle = open(file_name + '.tmp', 'w')
+        file_handle.write(self.get_prometheus_text())
+        file_handle.close()
+
+        os.rename(file_name + '.tmp', file_name)
+
+    ###########################################################################
+    # Function      : start_file_dump(self, file_name, interval)
+    # Description   : This function starts a background thread, which writes
+    #                 the metrics into a file periodically.
+    # Arguments     : file_name - Name of the file
+    #                 interval - Seconds between two writes
+    # Returns       : The started thread.
+    ###########################################################################
+    def start_file_dump(self, file_name, interval):
+
+        def dump_metrics():
+            while True:
+                time.sleep(interval)
+                self.write_file(file_name)
+
+        dump_thread = threading.Thread(target=dump_metrics)
+        dump_thread.daemon = True
+        dump_thread.start()
+
+        return dump_thread
+
+    ###########################################################################
+    # Function      : start_http_server(self, port)
+    # Description   : This function starts a background thread, which serves
+    #                 the metrics over HTTP on a local port, for Prometheus
+    #                 to scrape. Every path of the server gives the metrics,
+    #                 e.g. http://localhost:<port>/metrics
+    # Arguments     : port - Port number
+    # Returns       : The HTTP server.
+    ###########################################################################
+    def start_http_server(self, port):
+
+        metrics = self
+
+        class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = metrics.get_prometheus_text()
+                self.send_response(200)
+                self.send_header('Content-Type',\
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            # requests are not logged into stderr
+            def log_message(self, format, *args):
+                pass
+
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', port),\
+                                           MetricsHandler)
+
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+
+        return server
+
+###############################################################################
+# End of TaggerMetrics class
+###############################################################################
+
+# metrics recorded by all taggers of this program
+tagger_metrics = TaggerMetrics()
+
+###############################################################################
+# Class         : Tagger
+# Description   : This class holds an HMM formed from training data along 
+#                 with the tables built from it for the decoders, so that 
+#                 the POS-tagger can be used from other Python programs on 
+#                 words in memory, without reading or writing any files. 
+#                 e.g.
+#
+#                 import pos_tagging
+#
+#                 tagger = pos_tagging.Tagger(engine='trigram')
+#                 tagger.train([[('No', 'RB'), (',', ','), ('it', 'PRP'),
+#                                ('was', 'VBD'), ('.', '.')]])
+#                 tags = tagger.tag(['it', 'was', '.'])
+#
+#                 The command line program is a wrapper over this class.
+###############################################################################
+class Tagger(object):
+
+    ###########################################################################
+    # Function      : __init__(self, smoothing, add_k, engine, kbest, 
+    #                          beam_width, max_lattice_cells,
+    #                          constrain_unknown_words)
+    # Description   : This function creates an untrained tagger.
+    # Arguments     : smoothing - Smoothing applied to tag transition 
+    #                             probabilities. See get_tag_trans_prob_matrix
+    #                 add_k - The k used by 'add-k' smoothing
+    #                 engine - The decoder used for tagging, one of 'bigram',
+    #                          'trigram', 'posterior' and 'kbest'
+    #                 kbest - Number of tag sequences found by kbest decoder
+    #                 beam_width - Beam width of trigram decoder
+    #                 max_lattice_cells - See bigram_viterbi_sentence
+    #                 constrain_unknown_words - If True, the tags of unknown 
+    #                           words decided by rule based approach are given
+    #                           to the decoder as constraints.
+    #                 quantization_bits - If 8 or 16, log probabilities of
+    #                           the tables used by decoders are quantized
+    #                           into codes of these many bits. See 
+    #                           quantize_tables. Default is None, i.e. they
+    #                           are not quantized.
+    #                 min_word_count - Words of training file seen less 
+    #                           than these many times are left out of the 
+    #                           HMM, and tagged as unknown words. See
+    #                           prune_hmm_counts. Default is 1, i.e. no word
+    #                           is left out.
+    # Returns       : None.
+    ###########################################################################
+    def __init__(self, smoothing='witten-bell', add_k=1.0, engine='bigram',\
+                 kbest=5, beam_width=1000.0, max_lattice_cells=1000000,\
+                 constrain_unknown_words=True, quantization_bits=None,\
+                 min_word_count=1):
+
+        if engine not in ENGINES:
+            raise ValueError("unknown engine: " + engine)
+
+        if quantization_bits and\
+           quantization_bits not in QUANTIZATION_TYPECODES:
+            raise ValueError("quantization bits should be one of: " +\
+                             ', '.join(map(str, sorted(\
+                             QUANTIZATION_TYPECODES))))
+
+        self.smoothing = smoothing
+        self.add_k = add_k
+        self.engine = engine
+        self.kbest = kbest
+        self.beam_width = beam_width
+        self.max_lattice_cells = max_lattice_cells
+        self.constrain_unknown_words = constrain_unknown_words
+        self.quantization_bits = quantization_bits
+        self.min_word_count = min_word_count
+
+        '''
+        Tags of unknown words found so far by rule based approach. It is 
+        filled as the unknown words are seen in sentences being tagged, up
+        to unknown_word_cache_size words, and is not saved with the tagger.
+        '''
+        self.unknown_word_tags_mapping = {}
+
+        # trigram table is built only when trigram decoder is first used
+        self.tag_trigram_log_prob_table = None
+        self.quantized_trigram_table = None
+
+    ###########################################################################
+    # Function      : train(self, tagged_sentences)
+    # Description   : This function forms the HMM from tagged sentences.
+    # Arguments     : tagged_sentences - An iterable of sentences, each of 
+    #                                    which is a list of (word, tag) pairs
+    # Returns       : None.
+    ###########################################################################
+    def train(self, tagged_sentences):
+
+        '''
+        Write the word-tag pairs of each sentence as a line of training file,
+        escaping the '/' characters in words, and form the HMM from them.
+        '''
+        self.train_from_lines(' '.join(word.replace('/', '\\/') + '/' + tag\
+                              for word, tag in sentence) + '\n'\
+                              for sentence in tagged_sentences)
+
+    ###########################################################################
+    # Function      : train_from_lines(self, train_lines)
+    # Description   : This function forms the HMM from the lines of a 
+    #                 training file and builds the tables used by decoders 
+    #                 from it.
+    # Arguments     : train_lines - An iterable of cleaned lines of training
+    #                               file
+    # Returns       : None.
+    ###########################################################################
+    def train_from_lines(self, train_lines):
+
+        start_time = time.time()
+
+        with timed_stage('count'):
+            hmm_counts = get_hmm_counts(train_lines)
+
+        self.train_from_counts(hmm_counts)
+
+        # training time includes counting of training file
+        tagger_metrics.model_train_seconds = time.time() - start_time
+
+    ###########################################################################
+    # Function      : train_from_counts(self, hmm_counts)
+    # Description   : This function forms the HMM from the counts of a 
+    #                 training file and builds the tables used by decoders 
+    #                 from it. Words seen less than min_word_count times are
+    #                 pruned from the counts first.
+    # Arguments     : hmm_counts - Counts of training file, as returned by
+    #                              get_hmm_counts
+    # Returns       : None.
+    ###########################################################################
+    def train_from_counts(self, hmm_counts):
+
+        start_time = time.time()
+
+        if self.min_word_count > 1:
+            hmm_counts = prune_hmm_counts(hmm_counts, self.min_word_count)
+
+        self.hmm_counts = hmm_counts
+
+        '''
+        Get unique words from the training file. A word of a sentence to be
+        tagged is unknown, if it is not one of these.
+        '''
+        self.known_words = set(hmm_counts['word_freq'])
+
+        with timed_stage('form-HMM'):
+            self.tag_transition_prob_matrix, self.word_tag_obs_lkhd_dict,\
+                self.unique_tags = form_HMM(hmm_counts, self.smoothing,\
+                self.add_k)
+
+        with timed_stage('decoder-tables'):
+
+            '''
+            Build the tables used by decoders once: dense log tag 
+            transition table and the tag dictionary of known words.
+            '''
+            self.tag_trans_log_prob_table = get_tag_trans_log_prob_table(\
+                                            self.unique_tags,\
+                                            self.tag_transition_prob_matrix)
+            self.tag_dictionary = get_tag_dictionary(self.unique_tags,\
+                                  self.word_tag_obs_lkhd_dict)
+
+            '''
+            Posterior decoder uses the tag transition probabilities instead
+            of their logs, so convert the table for it.
+            '''
+            self.tag_trans_prob_table, self.tag_trans_prob_table_by_prev = \
+                get_tag_trans_prob_tables(self.tag_trans_log_prob_table)
+
+        if self.quantization_bits:
+            with timed_stage('quantize'):
+                self.quantize_tables()
+
+        self.unknown_word_tags_mapping = {}
+        self.tag_trigram_log_prob_table = None
+        self.quantized_trigram_table = None
+
+        # size of snapshot is found by get_model_info when first asked for
+        self.snapshot_bytes = None
+
+        if self.engine == 'trigram':
+            self.build_trigram_table()
+
+        tagger_metrics.model_train_seconds = time.time() - start_time
+
+        logger.info("Trained tagger: %d tags, %d known words, %d word-tag"\
+                    " pairs", len(self.unique_tags), len(self.known_words),\
+                    len(hmm_counts['word_tag_freq']))
+
+    ###########################################################################
+    # Function      : build_trigram_table(self)
+    # Description   : This function builds the tag trigram table used by 
+    #                 trigram decoder.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def build_trigram_table(self):
+
+        with timed_stage('trigram-table'):
+            self.tag_trigram_log_prob_table, self.lambdas = \
+                get_tag_trigram_log_prob_table(self.unique_tags,\
+                                               self.hmm_counts)
+
+            if self.quantization_bits:
+                self.quantized_trigram_table = quantize_log_probs(\
+                    itertools.chain.from_iterable(itertools.chain.\
+                    from_iterable(self.tag_trigram_log_prob_table)),\
+                    self.quantization_bits)
+                self.tag_trigram_log_prob_table = get_dequantized_table(\
+                    self.quantized_trigram_table[0],\
+                    self.quantized_trigram_table[1], len(self.unique_tags),\
+                    3)
+
+        self.snapshot_bytes = None
+
+    ###########################################################################
+    # Function      : quantize_tables(self)
+    # Description   : This function quantizes the log probabilities of the
+    #                 tables used by decoders, by quantize_log_probs with a
+    #                 scale for each table:
+    #                 1) The tag dictionary is kept as a 
+    #                    QuantizedTagDictionary object, which the decoders
+    #                    look up directly.
+    #                 2) Tag transition tables are small (tags x tags), so 
+    #                    they are kept both as codes and as the log 
+    #                    probabilities got back from the codes, which the 
+    #                    decoders use. Only the codes are saved by save 
+    #                    function.
+    #                 So the decoders tag with the quantized probabilities,
+    #                 and the accuracy got by them shows the loss due to 
+    #                 quantization. The tag transition probabilities matrix
+    #                 and observation likelihood probabilities matrix of the
+    #                 HMM are not needed after this, so they are dropped, as
+    #                 they are from the snapshot.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def quantize_tables(self):
+
+        self.quantized_trans_table = quantize_log_probs(\
+            itertools.chain.from_iterable(self.tag_trans_log_prob_table),\
+            self.quantization_bits)
+
+        self.tag_trans_log_prob_table = get_dequantized_table(\
+            self.quantized_trans_table[0], self.quantized_trans_table[1],\
+            len(self.unique_tags))
+        self.tag_trans_prob_table, self.tag_trans_prob_table_by_prev = \
+            get_tag_trans_prob_tables(self.tag_trans_log_prob_table)
+
+        self.tag_dictionary = QuantizedTagDictionary(self.tag_dictionary,\
+                                                     self.quantization_bits)
+
+        self.tag_transition_prob_matrix = None
+        self.word_tag_obs_lkhd_dict = None
+
+        logger.debug("Quantized tables into %d bit codes: %d tag"\
+                     " dictionary pairs", self.quantization_bits,\
+                     len(self.tag_dictionary.codes))
+
+    ###########################################################################
+    # Function      : get_unknown_word_tags(self, observation_list)
+    # Description   : This function finds the tags of unknown words of a 
+    #                 sentence by rule based approach, taking them from 
+    #                 unknown_word_tags_mapping if they are already there,
+    #                 else adding them to it.
+    # Arguments     : observation_list - List of words of the sentence
+    # Returns       : A dict object containing unknown words of the sentence
+    #                 and their tags.
+    ###########################################################################
+    def get_unknown_word_tags(self, observation_list):
+
+        sentence_unknown_word_tags = {}
+
+        with timed_stage('unknown-words'):
+            for word in observation_list:
+
+                # look up each unknown word of the sentence only once
+                if word in self.known_words or\
+                   word in sentence_unknown_word_tags:
+                    continue
+
+                tag = self.unknown_word_tags_mapping.get(word)
+
+                if tag is None:
+
+                    '''
+                    Empty the cache when it is full, rather than evicting
+                    words one at a time, so that each change of the cache
+                    is a single dict operation, safe for the threads 
+                    sharing the tagger.
+                    '''
+                    if len(self.unknown_word_tags_mapping) >=\
+                       unknown_word_cache_size:
+                        self.clear_cache()
+
+                    tag = get_unknown_word_tag(word)
+                    self.unknown_word_tags_mapping[word] = tag
+
+                sentence_unknown_word_tags[word] = tag
+
+        return sentence_unknown_word_tags
+
+    ###########################################################################
+    # Function      : clear_cache(self)
+    # Description   : This function empties the cache of tags of unknown 
+    #                 words.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def clear_cache(self):
+
+        self.unknown_word_tags_mapping = {}
+
+    ###########################################################################
+    # Function      : get_sentence_constraints(self, observation_list, 
+    #                                          constraints)
+    # Description   : This function finds the constraints of a sentence for
+    #                 the decoder. The constraints given for the sentence take
+    #                 precedence over the tags of unknown words.
+    # Arguments     : observation_list - List of words of the sentence, with
+    #                                    leading and trailing '.'
+    #                 constraints - A dict object mapping positions in 
+    #                               observation_list to their fixed tags. It
+    #                               can be None for no constraints.
+    # Returns       : A dict object containing unknown words and their tags.
+    #                 A dict object mapping positions in observation_list to
+    #                 the tags fixed for the decoder.
+    ###########################################################################
+    def get_sentence_constraints(self, observation_list, constraints=None):
+
+        unknown_word_tags_mapping = self.get_unknown_word_tags(\
+                                    observation_list)
+
+        sentence_constraints = {}
+
+        if self.constrain_unknown_words:
+            sentence_constraints.update(get_unknown_word_constraints(\
+                observation_list, unknown_word_tags_mapping))
+
+        if constraints:
+            sentence_constraints.update(constraints)
+
+        return unknown_word_tags_mapping, sentence_constraints
+
+    ###########################################################################
+    # Function      : run_sentence_decoder(self, engine, observation_list,
+    #                                      constraints)
+    # Description   : This function applies a decoder to a sentence with the
+    #                 constraints found the same way as decode does, but 
+    #                 without deciding the final tags or recording metrics.
+    # Arguments     : engine - Name of the decoder
+    #                 observation_list - List of words of the sentence, with
+    #                                    leading and trailing '.'
+    #                 constraints - A dict object mapping positions in 
+    #                               observation_list to their fixed tags. It
+    #                               can be None for no constraints.
+    # Returns       : Output of the decoder, as described for viterbi_decode.
+    ###########################################################################
+    def run_sentence_decoder(self, engine, observation_list, constraints):
+
+        unknown_word_tags_mapping, sentence_constraints = \
+            self.get_sentence_constraints(observation_list, constraints)
+
+        return self.run_decoder(engine, observation_list,\
+                                sentence_constraints,\
+                                unknown_word_tags_mapping)
+
+    ###########################################################################
+    # Function      : run_decoder(self, engine, observation_list, 
+    #                             constraints, unknown_word_tags_mapping)
+    # Description   : This function applies a decoder to a sentence.
+    # Arguments     : engine - Name of the decoder
+    #                 observation_list - List of words of the sentence, with
+    #                                    leading and trailing '.'
+    #                 constraints - A dict object mapping positions in 
+    #                               observation_list to their fixed tags
+    #                 unknown_word_tags_mapping - Tags of unknown words of 
+    #                                             the sentence, as returned 
+    #                                             by get_unknown_word_tags,
+    #                                             if they are already found.
+    #                                             Only posterior decoder 
+    #                                             uses them.
+    # Returns       : Output of the decoder, as described for viterbi_decode.
+    ###########################################################################
+    def run_decoder(self, engine, observation_list, constraints,\
+                    unknown_word_tags_mapping=None):
+
+        if engine == 'bigram':
+            return bigram_viterbi_sentence(observation_list,\
+                   self.unique_tags, self.tag_trans_log_prob_table,\
+                   self.tag_dictionary, constraints, self.max_lattice_cells)
+
+        if engine == 'posterior':
+
+            if unknown_word_tags_mapping is None:
+                unknown_word_tags_mapping = self.get_unknown_word_tags(\
+                                            observation_list)
+
+            return posterior_decode_sentence(observation_list,\
+                   self.unique_tags, self.tag_trans_prob_table,\
+                   self.tag_trans_prob_table_by_prev, self.tag_dictionary,\
+                   unknown_word_tags_mapping, constraints)
+
+        if engine == 'kbest':
+            return kbest_viterbi_sentence(observation_list,\
+                   self.unique_tags, self.tag_trans_log_prob_table,\
+                   self.tag_dictionary, self.kbest, constraints)
+
+        if engine == 'trigram':
+
+            if self.tag_trigram_log_prob_table is None:
+                self.build_trigram_table()
+
+            return trigram_viterbi_sentence(observation_list,\
+                   self.unique_tags, self.tag_trigram_log_prob_table,\
+                   self.tag_dictionary, self.beam_width, constraints)
+
+        raise ValueError("unknown engine: " + engine)
+
+    ###########################################################################
+    # Function      : get_decoders(self)
+    # Description   : This function gives all decoders of the tagger, e.g. 
+    #                 for benchmark_decoders.
+    # Arguments     : None.
+    # Returns       : A list of (name, decoder) pairs. A decoder is a 
+    #                 function taking the observation list of a sentence and
+    #                 a dict object of its constraints. It finds the tags of
+    #                 unknown words and their constraints, the same way as 
+    #                 decode.
+    ###########################################################################
+    def get_decoders(self):
+
+        # build trigram table now, so that it is not timed with decoding
+        if self.tag_trigram_log_prob_table is None:
+            self.build_trigram_table()
+
+        return [(engine, functools.partial(self.run_sentence_decoder,\
+                 engine)) for engine in ENGINES]
+
+    ###########################################################################
+    # Function      : decode(self, observation_list, constraints)
+    # Description   : This function finds the tags of words of a sentence.
+    #                 The tags given as constraints are taken as they are, 
+    #                 unknown words get the tags decided by rule based 
+    #                 approach and the rest of words get the tags found by 
+    #                 the decoder.
+    # Arguments     : observation_list - List of words of the sentence, with
+    #                                    leading and trailing '.'
+    #                 constraints - A dict object mapping positions in 
+    #                               observation_list to their fixed tags. It
+    #                               can be None for no constraints.
+    #                 record_metrics - Whether the sentence is recorded in
+    #                                  tagger_metrics. It is False for 
+    #                                  sentences which are not asked for, 
+    #                                  e.g. by validate_tagger.
+    # Returns       : A list of tags, one for each word in observation_list.
+    #                 A list of confidences of tags, if the decoder gives 
+    #                 them (posterior), else None.
+    #                 A ranked list of (log prob, list of tags) pairs, if the
+    #                 decoder gives them (kbest), else None.
+    ###########################################################################
+    def decode(self, observation_list, constraints=None, record_metrics=True):
+
+        start_time = time.time()
+
+        '''
+        Find the unknown words of the sentence, and how many of the 
+        distinct ones are already in the cache of tags of unknown words, 
+        for metrics. A word repeated in the sentence is looked up in the 
+        cache only once, by get_unknown_word_tags.
+        '''
+        unknown_words = [word for word in observation_list\
+                         if word not in self.known_words]
+        distinct_unknown_words = set(unknown_words)
+        cache_hit_count = sum(1 for word in distinct_unknown_words\
+                              if word in self.unknown_word_tags_mapping)
+
+        unknown_word_tags_mapping, sentence_constraints = \
+            self.get_sentence_constraints(observation_list, constraints)
+
+        decoder_output = self.run_decoder(self.engine, observation_list,\
+                                          sentence_constraints,\
+                                          unknown_word_tags_mapping)
+
+        kbest_list = None
+
+        '''
+        The tags of best sequence are copied, so that the sequences of 
+        kbest_list stay as found by the decoder, along with their log 
+        probs, when the final tags are decided below.
+        '''
+        if isinstance(decoder_output, list) and\
+           isinstance(decoder_output[0], tuple):
+            kbest_list = decoder_output
+            decoder_output = list(decoder_output[0][1])
+
+        if isinstance(decoder_output, tuple):
+            observation_tags, confidences = decoder_output
+        else:
+            observation_tags, confidences = decoder_output, None
+
+        '''
+        Decide the final tag of each word.
+        '''
+        for i in range(0,len(observation_list)):
+            # if word has a constraint, then take the tag given for it
+            if i in sentence_constraints:
+                observation_tags[i] = sentence_constraints[i]
+            # if the word is unknown, then take tag, got by rule based approach
+            elif observation_list[i] in unknown_word_tags_mapping:
+                observation_tags[i] = unknown_word_tags_mapping[\
+                                      observation_list[i]]
+            # if word is known, then take the tag decided by the decoder
+
+        # leading '.' is only a start state, so it is not counted as a token
+        if record_metrics:
+            tagger_metrics.observe_sentence(len(observation_list) - 1,\
+                                            len(unknown_words),\
+                                            cache_hit_count,\
+                                            len(distinct_unknown_words) -\
+                                            cache_hit_count,\
+                                            time.time() - start_time)
+
+        return observation_tags, confidences, kbest_list
+
+    ###########################################################################
+    # Function      : tag(self, words)
+    # Description   : This function finds the tags of words of a sentence.
+    # Arguments     : words - List of words of the sentence, without square
+    #                         brackets. A '/' in a word is escaped as '\/',
+    #                         the same way as in the test file.
+    # Returns       : A list of tags, one for each word.
+    ###########################################################################
+    def tag(self, words):
+
+        words = list(words)
+        observation_list = get_observation_lists(words)[1]
+
+        # leave the tags of leading and appended trailing '.'
+        return self.decode(observation_list)[0][1:len(words) + 1]
+
+    ###########################################################################
+    # Function      : tag_batch(self, sentences)
+    # Description   : This function finds the tags of words of many 
+    #                 sentences.
+    # Arguments     : sentences - An iterable of lists of words, as given to
+    #                             tag function
+    # Returns       : A list having list of tags for each sentence.
+    ###########################################################################
+    def tag_batch(self, sentences):
+
+        return [self.tag(words) for words in sentences]
+
+    ###########################################################################
+    # Function      : save(self, file_name)
+    # Description   : This function saves the trained tagger into a file,
+    #                 so that it can be loaded by load_tagger function without
+    #                 training again.
+    # Arguments     : file_name - Name of the file
+    # Returns       : None.
+    ###########################################################################
+    def save(self, file_name):
+
+        file_handle = open(file_name, 'wb')
+        cPickle.dump(self, file_handle, cPickle.HIGHEST_PROTOCOL)
+        file_handle.close()
+
+    ###########################################################################
+    # Function      : __getstate__(self)
+    # Description   : This function gives the attributes of the tagger to be
+    #                 saved. If its tables are quantized, the tables of log
+    #                 probabilities got back from codes are left out, along
+    #                 with tag transition probabilities matrix and 
+    #                 observation likelihood probabilities matrix of the HMM
+    #                 which the tables were built from, so that the snapshot
+    #                 is smaller. The cache of tags of unknown words is never
+    #                 saved, so a snapshot only depends on the training file.
+    #                 Of the counts of training file, only the counts of tags
+    #                 are saved, for building the trigram table, and none if
+    #                 the trigram table is already built.
+    # Arguments     : None.
+    # Returns       : A dict object of attributes.
+    ###########################################################################
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+        state['unknown_word_tags_mapping'] = {}
+        state['snapshot_bytes'] = None
+
+        if self.tag_trigram_log_prob_table is not None:
+            state['hmm_counts'] = None
+        elif self.__dict__.get('hmm_counts') is not None:
+            state['hmm_counts'] = dict((name, self.hmm_counts[name])\
+                                       for name in TAG_COUNTERS)
+
+        if self.quantization_bits:
+
+            for name in ('tag_transition_prob_matrix',\
+                         'word_tag_obs_lkhd_dict', 'tag_trans_log_prob_table',\
+                         'tag_trans_prob_table',\
+                         'tag_trans_prob_table_by_prev'):
+                state[name] = None
+
+            if self.quantized_trigram_table is not None:
+                state['tag_trigram_log_prob_table'] = None
+
+        return state
+
+    ###########################################################################
+    # Function      : __setstate__(self, state)
+    # Description   : This function sets the attributes of a loaded tagger,
+    #                 and gets the tables of log probabilities back from the
+    #                 codes, if they are quantized.
+    # Arguments     : state - A dict object of attributes, as given by 
+    #                         __getstate__
+    # Returns       : None.
+    ###########################################################################
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+
+        # taggers saved before quantization was added don't have these
+        self.__dict__.setdefault('quantization_bits', None)
+        self.__dict__.setdefault('quantized_trigram_table', None)
+        self.__dict__.setdefault('min_word_count', 1)
+        self.snapshot_bytes = None
+
+        # taggers saved before the cache was left out have it
+        self.unknown_word_tags_mapping = {}
+
+        if self.quantization_bits:
+
+            self.tag_trans_log_prob_table = get_dequantized_table(\
+                self.quantized_trans_table[0], self.quantized_trans_table[1],\
+                len(self.unique_tags))
+            self.tag_trans_prob_table, self.tag_trans_prob_table_by_prev = \
+                get_tag_trans_prob_tables(self.tag_trans_log_prob_table)
+
+            if self.quantized_trigram_table is not None:
+                self.tag_trigram_log_prob_table = get_dequantized_table(\
+                    self.quantized_trigram_table[0],\
+                    self.quantized_trigram_table[1], len(self.unique_tags),\
+                    3)
+
+    ###########################################################################
+    # Function      : get_model_info(self)
+    # Description   : This function describes the model of the tagger, e.g.
+    #                 for the evaluation report, so that the accuracy of 
+    #                 taggers with different options can be compared along 
+    #                 with the size of their snapshots.
+    # Arguments     : None.
+    # Returns       : A dict object having the engine, smoothing, 
+    #                 quantization bits and least count of known words of 
+    #                 the tagger, the number of known words and the number 
+    #                 of bytes saved by save function. The number of bytes 
+    #                 is found once, till the tagger is trained again or 
+    #                 its trigram table is built.
+    ###########################################################################
+    def get_model_info(self):
+
+        if self.snapshot_bytes is None:
+            self.snapshot_bytes = len(cPickle.dumps(self,\
+                                      cPickle.HIGHEST_PROTOCOL))
+
+        return collections.OrderedDict([('engine', self.engine),\
+               ('smoothing', self.smoothing),\
+               ('quantization_bits', self.quantization_bits),\
+               ('min_word_count', self.min_word_count),\
+               ('known_words', len(self.known_words)),\
+               ('snapshot_bytes', self.snapshot_bytes)])
+
+###############################################################################
+# End of Tagger class
+###############################################################################
+
+###############################################################################
+# Function      : load_tagger(file_name)
+# Description   : This function loads a tagger saved by Tagger.save function.
+# Arguments     : file_name - Name of the file
+# Returns       : The loaded Tagger object.
+###############################################################################
+def load_tagger(file_name):
+
+    start_time = time.time()
+
+    file_handle = open(file_name, 'rb')
+    tagger = cPickle.load(file_handle)
+    file_handle.close()
+
+    tagger_metrics.model_load_seconds = time.time() - start_time
+
+    return tagger
+
+###############################################################################
+# End of load_tagger function
+###############################################################################
+
+###############################################################################
+# Function      : get_file_version(file_name)
+# Description   : This function gives the version of a file, which changes
+#                 when the file is written again, for finding the files of 
+#                 taggers saved again.
+# Arguments     : file_name - Name of the file
+# Returns       : A tuple of modification time and size of the file.
+###############################################################################
+def get_file_version(file_name):
+
+    file_stat = os.stat(file_name)
+
+    return file_stat.st_mtime, file_stat.st_size
+
+###############################################################################
+# End of get_file_version function
+###############################################################################
+
+###############################################################################
+# Function      : validate_tagger(tagger)
+# Description   : This function checks that a loaded object is a trained 
+#                 tagger which can tag, before it replaces a tagger in use.
+# Arguments     : tagger - The loaded object
+# Returns       : None. It raises ValueError, if the tagger is not valid.
+###############################################################################
+def validate_tagger(tagger):
+
+    if not isinstance(tagger, Tagger):
+        raise ValueError("not a Tagger object: " + repr(type(tagger)))
+
+    if not getattr(tagger, 'unique_tags', None) or\
+       not getattr(tagger, 'known_words', None):
+        raise ValueError("tagger is not trained")
+
+    '''
+    Tag a few known words and an unknown word, so that the tables of decoder
+    and the tagging of unknown words are used once. The sentence is not 
+    recorded in tagger_metrics, as it is not asked for by a user of the 
+    tagger, and the tag of unknown word is not kept in its cache.
+    '''
+    unknown_word = 'Unknownword'
+
+    while unknown_word in tagger.known_words:
+        unknown_word = unknown_word + 's'
+
+    words = sorted(itertools.islice(tagger.known_words, 5)) + [unknown_word]
+    observation_list = get_observation_lists(words)[1]
+
+    observation_tags = tagger.decode(observation_list,\
+                                     record_metrics=False)[0]
+    tagger.clear_cache()
+
+    if len(observation_tags) != len(observation_list):
+        raise ValueError("tagger gives wrong number of tags")
+
+###############################################################################
+# End of validate_tagger function
+###############################################################################
+
+###############################################################################
+# Class         : ModelRegistry
+# Description   : This class keeps several taggers, e.g. trained on 
+#                 different corpora, so that a program tagging sentences 
+#                 for others e.g. a service can tag each request by the 
+#                 tagger asked for by it. Each tagger is known by a model 
+#                 id and is saved in a file by Tagger.save function.
+#
+#                 A tagger is loaded only when it is first asked for. The 
+#                 loaded taggers are kept within a memory budget, which is 
+#                 taken up by the size of file of each tagger. When a loaded
+#                 tagger goes over the budget, the least recently used 
+#                 taggers are evicted, i.e. dropped from the registry, till
+#                 the rest are within the budget. A request already being 
+#                 tagged by an evicted tagger is finished by it.
+#
+#                 The files of loaded taggers can be watched, so that a 
+#                 tagger saved again into its file, e.g. after training on
+#                 more data, replaces the loaded one without stopping the 
+#                 program. See reload_models.
+#
+#                 Loads, evictions, reloads and hits of loaded taggers are
+#                 counted in tagger_metrics.
+###############################################################################
+class ModelRegistry(object):
+
+    ###########################################################################
+    # Function      : __init__(self, model_files, memory_budget)
+    # Description   : This function creates a registry having no loaded 
+    #                 taggers.
+    # Arguments     : model_files - A dict object mapping model ids to the
+    #                               names of files of their taggers
+    #                 memory_budget - Total size of files of loaded taggers,
+    #                                 in bytes. The last tagger asked for is
+    #                                 kept, even if it alone is over the 
+    #                                 budget.
+    # Returns       : None.
+    ###########################################################################
+    def __init__(self, model_files, memory_budget):
+
+        self.model_files = dict(model_files)
+        self.memory_budget = memory_budget
+
+        # taggers can be asked for by different threads
+        self.lock = threading.Lock()
+
+        '''
+        Loaded taggers along with the sizes and versions of their files (see
+        get_file_version), mapped from their model ids, in the sequence of
+        their use (least recently used first).
+        '''
+        self.taggers = collections.OrderedDict()
+
+        # versions of files of taggers which could not be reloaded
+        self.failed_versions = {}
+
+    ###########################################################################
+    # Function      : add_model(self, model_id, file_name)
+    # Description   : This function adds a tagger to the registry, without 
+    #                 loading it.
+    # Arguments     : model_id - Model id of the tagger
+    #                 file_name - Name of file of the tagger
+    # Returns       : None.
+    ###########################################################################
+    def add_model(self, model_id, file_name):
+
+        with self.lock:
+            self.model_files[model_id] = file_name
+
+    ###########################################################################
+    # Function      : get_tagger(self, model_id)
+    # Description   : This function gives the tagger of a model id, loading
+    #                 it if it is not loaded, and marks it as the most 
+    #                 recently used tagger.
+    # Arguments     : model_id - Model id of the tagger
+    # Returns       : The Tagger object.
+    ###########################################################################
+    def get_tagger(self, model_id):
+
+        with self.lock:
+
+            if model_id in self.taggers:
+                loaded_tagger = self.taggers.pop(model_id)
+                self.taggers[model_id] = loaded_tagger
+                tagger_metrics.count('model_registry_hits_total')
+                return loaded_tagger[0]
+
+            if model_id not in self.model_files:
+                raise KeyError("unknown model: " + str(model_id))
+
+            file_name = self.model_files[model_id]
+
+        '''
+        Load the tagger without holding the lock, so that the requests for
+        loaded taggers are not kept waiting. If the same tagger is loaded by
+        another thread in the meantime, that one is used.
+        '''
+        file_version = get_file_version(file_name)
+        tagger = load_tagger(file_name)
+
+        with self.lock:
+
+            if model_id in self.taggers:
+                return self.taggers[model_id][0]
+
+            self.taggers[model_id] = (tagger, file_version[1], file_version)
+            tagger_metrics.count('model_loads_total')
+            logger.info("Loaded model %s from %s", model_id, file_name)
+
+            self.evict_taggers()
+
+        return tagger
+
+    ###########################################################################
+    # Function      : evict_taggers(self)
+    # Description   : This function evicts the least recently used taggers,
+    #                 till the loaded taggers are within the memory budget,
+    #                 and updates the metrics of loaded taggers. It is called
+    #                 with the lock held.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def evict_taggers(self):
+
+        loaded_size = sum(size for tagger, size, file_version in\
+                          self.taggers.itervalues())
+
+        while len(self.taggers) > 1 and loaded_size > self.memory_budget:
+
+            model_id, (tagger, size, file_version) = \
+                self.taggers.popitem(last=False)
+            loaded_size = loaded_size - size
+
+            tagger_metrics.count('model_evictions_total')
+            logger.info("Evicted model %s", model_id)
+
+        tagger_metrics.loaded_models = len(self.taggers)
+        tagger_metrics.loaded_model_bytes = loaded_size
+
+    ###########################################################################
+    # Function      : reload_models(self)
+    # Description   : This function reloads the loaded taggers whose files
+    #                 have changed since they were loaded.
+    #
+    #                 Each new tagger is loaded and checked by 
+    #                 validate_tagger, while the old one keeps tagging. Then 
+    #                 it replaces the old one in the registry in a single 
+    #                 step, so each request is tagged wholly by either of 
+    #                 them, and the requests being tagged by the old one are
+    #                 finished by it. A file which cannot be loaded or 
+    #                 checked, e.g. because it is still being written, is 
+    #                 tried again only after it changes again, and the old 
+    #                 tagger is kept till then. So a tagger should better be
+    #                 saved into another file, which is then renamed to the
+    #                 watched file.
+    #
+    #                 The cache of tags of unknown words belongs to a tagger,
+    #                 so the tags found by the old tagger are not used by the
+    #                 new one, except for the words which are unknown to the
+    #                 new one too. These are copied to the new tagger, so 
+    #                 that it does not start with an empty cache.
+    # Arguments     : None.
+    # Returns       : A list of model ids of reloaded taggers.
+    ###########################################################################
+    def reload_models(self):
+
+        with self.lock:
+            loaded_files = [(model_id, self.model_files[model_id],\
+                             file_version) for model_id, (tagger, size,\
+                             file_version) in self.taggers.iteritems()]
+
+        reloaded_model_ids = []
+
+        for model_id, file_name, file_version in loaded_files:
+
+            try:
+                new_file_version = get_file_version(file_name)
+            except OSError:
+                # the file is being renamed, so it is checked next time
+                continue
+
+            if new_file_version == file_version or\
+               self.failed_versions.get(model_id) == new_file_version:
+                continue
+
+            try:
+                tagger = load_tagger(file_name)
+                validate_tagger(tagger)
+            except Exception:
+                logger.warning("Could not reload model %s from %s",\
+                               model_id, file_name, exc_info=True)
+                self.failed_versions[model_id] = new_file_version
+                tagger_metrics.count('model_reload_failures_total')
+                continue
+
+            with self.lock:
+
+                # the old tagger may have been evicted in the meantime
+                if model_id not in self.taggers:
+                    continue
+
+                old_tagger = self.taggers[model_id][0]
+
+                for word, tag in old_tagger.unknown_word_tags_mapping.items():
+                    if word not in tagger.known_words:
+                        tagger.unknown_word_tags_mapping[word] = tag
+
+                # the new tagger keeps the place of old one in sequence of use
+                self.taggers[model_id] = (tagger, new_file_version[1],\
+                                          new_file_version)
+                self.failed_versions.pop(model_id, None)
+
+                tagger_metrics.count('model_reloads_total')
+                logger.info("Reloaded model %s from %s", model_id, file_name)
+
+                self.evict_taggers()
+
+            reloaded_model_ids.append(model_id)
+
+        return reloaded_model_ids
+
+    ###########################################################################
+    # Function      : start_model_watch(self, interval)
+    # Description   : This function starts a background thread, which 
+    #                 reloads the changed taggers by reload_models after 
+    #                 every interval.
+    # Arguments     : interval - Seconds between two checks of the files
+    # Returns       : The started thread.
+    ###########################################################################
+    def start_model_watch(self, interval):
+
+        def watch_models():
+            while True:
+                time.sleep(interval)
+                self.reload_models()
+
+        watch_thread = threading.Thread(target=watch_models)
+        watch_thread.daemon = True
+        watch_thread.start()
+
+        return watch_thread
+
+    ###########################################################################
+    # Function      : tag(self, model_id, words)
+    # Description   : This function finds the tags of words of a sentence by
+    #                 the tagger of a model id. See Tagger.tag.
+    # Arguments     : model_id - Model id of the tagger
+    #                 words - List of words of the sentence
+    # Returns       : A list of tags, one for each word.
+    ###########################################################################
+    def tag(self, model_id, words):
+
+        return self.get_tagger(model_id).tag(words)
+
+    ###########################################################################
+    # Function      : tag_batch(self, model_id, sentences)
+    # Description   : This function tags a list of sentences by the tagger
+    #                 of a model id. See Tagger.tag_batch.
+    # Arguments     : model_id - Model id of the tagger
+    #                 sentences - A list of sentences, each of which is a 
+    #                             list of words
+    # Returns       : A list of lists of tags, one for each sentence.
+    ###########################################################################
+    def tag_batch(self, model_id, sentences):
+
+        return self.get_tagger(model_id).tag_batch(sentences)
+
+###############################################################################
+# End of ModelRegistry class
+###############################################################################
+
+###############################################################################
+# Function      : estimate_sentence_cost(observation_list, tagger, 
+#                                        constraints)
+# Description   : This function estimates the cost of decoding a sentence,
+#                 for scheduling sentences among processes. The decoders 
+#                 take time in proportion to the number of lattice edges,
+#                 i.e. candidate tags of each word times candidate tags of 
+#                 the word before it, so cost is the sum of these products.
+#                 A known word has the tags of its tag dictionary, a word 
+#                 with a constraint (including unknown words, unless they
+#                 are not constrained) has one tag, and an unknown word has
+#                 all tags.
+# Arguments     : observation_list - List of words of the sentence, with
+#                                    leading and trailing '.'
+#                 tagger - A trained Tagger object
+#                 constraints - A dict object mapping positions in 
+#                               observation_list to their fixed tags. It
+#                               can be None for no constraints.
+# Returns       : The estimated cost of the sentence.
+###############################################################################
+def estimate_sentence_cost(observation_list, tagger, constraints):
+
+    cost = 0
+    previous_tag_count = 1
+
+    for i in range(1, len(observation_list)):
+
+        word = observation_list[i]
+
+        if (constraints and i in constraints) or (word not in\
+           tagger.known_words and tagger.constrain_unknown_words):
+            tag_count = 1
+        else:
+            tag_count = len(tagger.tag_dictionary.get(word,\
+                            tagger.unique_tags))
+
+        cost = cost + previous_tag_count * tag_count
+        previous_tag_count = tag_count
+
+    return cost
+
+###############################################################################
+# End of estimate_sentence_cost function
+###############################################################################
+
+###############################################################################
+# Function      : init_decode_worker(tagger)
+# Description   : This function is run once in each process decoding the 
+#                 sentences of test file, to keep the tagger in it, so that 
+#                 the tagger is not sent along with every sentence.
+# Arguments     : tagger - A trained Tagger object
+# Returns       : None.
+###############################################################################
+def init_decode_worker(tagger):
+
+    global worker_tagger
+
+    worker_tagger = tagger
+
+###############################################################################
+# End of init_decode_worker function
+###############################################################################
+
+###############################################################################
+# Function      : decode_sentence_in_worker(sentence_args)
+# Description   : This function decodes a sentence by the tagger of the 
+#                 process, in a process started by decode_sentences.
+# Arguments     : sentence_args - A tuple of index of the sentence in test
+#                                 file, its observation list and its 
+#                                 constraints
+# Returns       : The index of the sentence.
+#                 Output of decode method of the tagger.
+#                 A tuple of number of unknown words, hits and misses of the
+#                 cache of tags of unknown words and seconds taken, for 
+#                 adding them to the metrics of the main process.
+###############################################################################
+def decode_sentence_in_worker(sentence_args):
+
+    index, observation_list, constraints = sentence_args
+
+    unknown_count = tagger_metrics.counters['unknown_words_total']
+    cache_hit_count = tagger_metrics.counters['unknown_word_cache_hits_total']
+    cache_miss_count = tagger_metrics.counters[\
+                       'unknown_word_cache_misses_total']
+    start_time = time.time()
+
+    decoder_output = worker_tagger.decode(observation_list, constraints)
+
+    return index, decoder_output, (\
+           tagger_metrics.counters['unknown_words_total'] - unknown_count,\
+           tagger_metrics.counters['unknown_word_cache_hits_total'] -\
+           cache_hit_count,\
+           tagger_metrics.counters['unknown_word_cache_misses_total'] -\
+           cache_miss_count, time.time() - start_time)
+
+###############################################################################
+# End of decode_sentence_in_worker function
+###############################################################################
+
+###############################################################################
+# Function      : start_pipeline_stage(items, item_queue)
+# Description   : This function starts a stage of the pipeline decoding the
+#                 test file, i.e. a background thread which puts the items
+#                 given by an iterable into a queue, followed by None at the
+#                 end. The queue has a maximum size, so the stage waits for 
+#                 the next stage to take items out of it when it is full, 
+#                 and the items in memory are bounded. If the iterable 
+#                 raises an exception, the thread stops and the exception is
+#                 raised again by get_pipeline_items in the next stage.
+# Arguments     : items - An iterable of items, other than None
+#                 item_queue - A Queue object of maximum size
+# Returns       : A dict object having the exception raised by the stage,
+#                 for get_pipeline_items.
+###############################################################################
+def start_pipeline_stage(items, item_queue):
+
+    stage = {'exc_info': None}
+
+    def put_items():
+        try:
+            for item in items:
+                item_queue.put(item)
+        except Exception:
+            stage['exc_info'] = sys.exc_info()
+
+        item_queue.put(None)
+
+    stage_thread = threading.Thread(target=put_items)
+    stage_thread.daemon = True
+    stage_thread.start()
+
+    return stage
+
+###############################################################################
+# End of start_pipeline_stage function
+###############################################################################
+
+###############################################################################
+# Function      : get_pipeline_items(item_queue, stage)
+# Description   : This function takes the items put into a queue by a stage
+#                 started by start_pipeline_stage, till its end.
+# Arguments     : item_queue - The queue of the stage
+#                 stage - A dict object returned by start_pipeline_stage
+# Returns       : A generator of items of the stage. It raises the exception
+#                 raised by the stage, if any, after its last item.
+###############################################################################
+def get_pipeline_items(item_queue, stage):
+
+    for item in iter(item_queue.get, None):
+        yield item
+
+    if stage['exc_info'] is not None:
+        exc_type, exc_value, exc_traceback = stage['exc_info']
+        raise exc_type, exc_value, exc_traceback
+
+###############################################################################
+# End of get_pipeline_items function
+###############################################################################
+
+###############################################################################
+# Function      : prepare_sentences(test_file, sentence_constraints)
+# Description   : This function reads the sentences of test file and gets
+#                 what is needed for decoding each of them.
+# Arguments     : test_file - Name of test file
+#                 sentence_constraints - As described for viterbi_decode
+# Returns       : A generator of (words, white spaces, observation list, 
+#                 constraints) tuples for sentences of test file. For the 
+#                 white space at the end of test file, observation list and
+#                 constraints are None.
+###############################################################################
+def prepare_sentences(test_file, sentence_constraints):
+
+    sentence_number = 0
+
+    for sentence_words, sentence_spaces in read_sentences(test_file):
+
+        if not sentence_words:
+            yield sentence_words, sentence_spaces, None, None
+            continue
+
+        sentence_number = sentence_number + 1
+
+        # get the words of the sentence, without square brackets
+        observation_list = get_observation_lists(sentence_words)[1]
+        constraints = None
+
+        if sentence_constraints:
+            constraints = sentence_constraints.get(sentence_number)
+
+        yield sentence_words, sentence_spaces, observation_list, constraints
+
+###############################################################################
+# End of prepare_sentences function
+###############################################################################
+
+###############################################################################
+# Function      : decode_windows(prepared_sentences, tagger, pool,
+#                                sentence_slots, stopped)
+# Description   : This function decodes sentences in parallel processes.
+#
+#                 The sentences are taken in windows of decode_window_size
+#                 sentences. The sentences of a window are sent to the 
+#                 processes one by one, longest (by estimated cost) first, 
+#                 and each process takes the next sentence as soon as it is
+#                 done with the last one. So the long sentences are not left
+#                 to the end, and a process is not kept idle while another 
+#                 has a queue of sentences, as it would be with equal chunks
+#                 of sentences given to each process.
+#
+#                 All windows are sent through a single imap_unordered call
+#                 of the pool, so the processes go on to the sentences of 
+#                 next window while the last ones of a window are decoded.
+#                 The decoded sentences are kept till the sentences before
+#                 them are decoded, and given out in the order they were 
+#                 taken. A sentence is sent only after taking a slot from 
+#                 sentence_slots, which is given back when the sentence is
+#                 given out, so that the sentences kept are bounded.
+# Arguments     : prepared_sentences - An iterable of sentences, as given by
+#                                      prepare_sentences
+#                 tagger - A trained Tagger object, which is also the tagger
+#                          of the processes
+#                 pool - A Pool object of processes, started with 
+#                        init_decode_worker
+#                 sentence_slots - A Semaphore object, having the number of
+#                                  sentences which can be sent ahead of the
+#                                  sentences given out
+#                 stopped - An Event object, set to stop sending sentences,
+#                           e.g. before the pool is terminated
+# Returns       : A generator of (words, white spaces, observation list, 
+#                 output of decode method of tagger) tuples, in the order of
+#                 prepared_sentences.
+###############################################################################
+def decode_windows(prepared_sentences, tagger, pool, sentence_slots,\
+                   stopped):
+
+    '''
+    The sentences taken, and the outputs of decoded ones, by their index in
+    prepared_sentences, till they are given out.
+    '''
+    taken_sentences = {}
+    decoder_outputs = {}
+
+    # the exception raised while taking the sentences, if any
+    schedule = {'exc_info': None}
+
+    '''
+    Take the sentences window by window and give out the arguments of 
+    decode_sentence_in_worker for each of them. This generator runs in the 
+    task handler thread of the pool, so an exception raised by it is kept 
+    to be raised again after the sentences taken before it are given out.
+    '''
+    def get_sentence_args():
+
+        try:
+            sentences = enumerate(prepared_sentences)
+
+            while not stopped.is_set():
+
+                window = list(itertools.islice(sentences, decode_window_size))
+
+                if not window:
+                    break
+
+                sentence_args_list = []
+
+                for index, (sentence_words, sentence_spaces,\
+                    observation_list, constraints) in window:
+
+                    taken_sentences[index] = (sentence_words,\
+                                              sentence_spaces,\
+                                              observation_list)
 
-    return tag_bigrams_dict
-    
-###############################################################################
-# End of get_tag_trans_prob_matrix function
-###############################################################################
+                    if sentence_words:
+                        sentence_args_list.append((index, observation_list,\
+                                                   constraints))
+                    else:
+                        decoder_outputs[index] = None
 
-###############################################################################
-# Function      : get_obs_lkhd_prob_matrix(unique_words, unique_tags,\
-#                             tag_to_words_mapping_dict,tag_to_freq_dict)
-# Description   : This function creates the observation likelihood probability
-#                 matrix for each word and tag in the training file
-# Arguments     : unique_words - A list containing all unique words
-#                                from the training file
-#                 unique_tags -  A list containing all unique tags from the
-#                                training file
-#                 tag_to_words_mapping_dict - A dict object containing mapping
-#                                             of each tag to the list of words
-#                                             appearing for that tag
-#                 tag_to_freq_dict - A dict object storing mappings of each tag
-#                                    to its freq
-# Returns       : An ordered dict object mapping tag, word pair to its 
-#                 observation likelihood Probabilities.
-###############################################################################
+                sentence_args_list.sort(key=lambda sentence_args:\
+                    -estimate_sentence_cost(sentence_args[1], tagger,\
+                    sentence_args[2]))
+
+                for sentence_args in sentence_args_list:
+
+                    sentence_slots.acquire()
+
+                    if stopped.is_set():
+                        return
+
+                    yield sentence_args
+        except Exception:
+            schedule['exc_info'] = sys.exc_info()
 
-def get_obs_lkhd_prob_matrix(unique_words, unique_tags,\
-                             tag_to_words_mapping_dict,tag_to_freq_dict):
+    next_index = 0
 
     '''
-    Iterate over the unique_words list and unique_tags list to get all word-tag
-    pairs. For all such word-tag pairs,count the number of times the
-    word is tagged with tag in pair. This count will be retrieved from 
-    tag_to_words_mapping_dict. Divide this count by total number of times the
-    tag appears in training file. This second count will be retrieved from 
-    tag_to_freq_dict.
-    The mapping of each word-tag pair to its observation likelihood probability
-    will be stored in an ordered dict object viz. word_tag_obs_lkhd_dict.
+    After the last decoded sentence (None), give out the sentences left 
+    at the end, which have no words.
     '''
-    
-    word_tag_obs_lkhd_dict =  collections.OrderedDict()
+    for result in itertools.chain(pool.imap_unordered(\
+                  decode_sentence_in_worker, get_sentence_args()), [None]):
 
-    for word in unique_words:
-        for tag in unique_tags:
+        if result is not None:
 
-            word_tag_obs_lkhd_dict[(word,tag)] = \
-                float(tag_to_words_mapping_dict[tag].count(word)) /\
-                float(tag_to_freq_dict[tag])
-            
-            if debug:
-                print word
-                print tag
-                print tag_to_words_mapping_dict[tag]
+            index, decoder_output, (unknown_count, cache_hit_count,\
+                cache_miss_count, seconds) = result
 
-    if debug:
-        print word_tag_obs_lkhd_dict
+            decoder_outputs[index] = decoder_output
+
+            tagger_metrics.observe_sentence(len(taken_sentences[index][2])\
+                - 1, unknown_count, cache_hit_count, cache_miss_count,\
+                seconds)
+
+        while next_index in decoder_outputs:
+
+            sentence_words, sentence_spaces, observation_list = \
+                taken_sentences.pop(next_index)
+
+            yield sentence_words, sentence_spaces, observation_list,\
+                  decoder_outputs.pop(next_index)
+
+            if sentence_words:
+                sentence_slots.release()
+
+            next_index = next_index + 1
+
+    if schedule['exc_info'] is not None:
+        exc_type, exc_value, exc_traceback = schedule['exc_info']
+        raise exc_type, exc_value, exc_traceback
 
-    return word_tag_obs_lkhd_dict
 ###############################################################################
-# End of get_obs_lkhd_prob_matrix function
+# End of decode_windows function
 ###############################################################################
 
 ###############################################################################
-# Function      : preprocess_file(file_name)
-# Description   : This function preprocesses a file before POS tagging. It 
-#                 replaces all newline characters from file with a space.
-#                 It will overwrite the existing file after preprocessing.
-# Arguments     : file_name -  Name of the file to be preprocessed
-# Returns       : None.
+# Function      : decode_sentences(test_file, tagger, sentence_constraints,
+#                                  processes)
+# Description   : This function reads the sentences of test file and decodes
+#                 them by the tagger, in parallel processes if more than one
+#                 process is given.
+#
+#                 For parallel decoding, the sentences go through a pipeline
+#                 of stages, so that reading, decoding and writing of the 
+#                 sentences overlap:
+#                 1) A reader thread reads the sentences by 
+#                    prepare_sentences function.
+#                 2) A decoder thread sends them to the processes by 
+#                    decode_windows function.
+#                 3) The caller, e.g. viterbi_decode, writes the decoded 
+#                    sentences in order as this generator gives them.
+#                 The stages are joined by queues of pipeline_queue_size 
+#                 sentences, so a stage waits while the next stage is behind,
+#                 and only a few windows of sentences are in memory for a 
+#                 test file of any size.
+# Arguments     : test_file - Name of test file
+#                 tagger - A trained Tagger object
+#                 sentence_constraints - As described for viterbi_decode
+#                 processes - Number of processes decoding the sentences
+# Returns       : A generator of (words, white spaces, observation list, 
+#                 output of decode method of tagger) tuples for sentences of
+#                 test file, in their order. For the white space at the end
+#                 of test file, observation list and output are None.
 ###############################################################################
+def decode_sentences(test_file, tagger, sentence_constraints, processes):
 
-def preprocess_file(file_name):
+    prepared_sentences = prepare_sentences(test_file, sentence_constraints)
 
-    # open the file in read mode
-    file_handle =  open(file_name, 'r')
-    
-    # read all lines from the file and store them in a list
-    file_lines_list = file_handle.readlines()
-    
-    # close the file
-    file_handle.close
+    if processes <= 1:
+
+        for sentence_words, sentence_spaces, observation_list, constraints\
+            in prepared_sentences:
+
+            decoder_output = None
+
+            if sentence_words:
+                decoder_output = tagger.decode(observation_list, constraints)
+
+            yield sentence_words, sentence_spaces, observation_list,\
+                  decoder_output
+
+        return
 
-    # open the file again in write mode to overwrite it
-    file_handle =  open(file_name, 'w')
+    # build trigram table once here, instead of in each process
+    if tagger.engine == 'trigram' and\
+       tagger.tag_trigram_log_prob_table is None:
+        tagger.build_trigram_table()
+
+    pool = multiprocessing.Pool(processes, init_decode_worker, (tagger,))
 
     '''
-    Iterate over the file_lines_list and replace all newline chars with 
-    space and write them back into the file
+    Sentences which can be sent to the processes ahead of the sentences
+    given out, and a flag to stop sending them, as used by decode_windows.
     '''
-    for line in file_lines_list:
-        file_handle.write(line.replace('\n',' '))
-    
-    # close the file
-    file_handle.close()        
+    sentence_slots = threading.Semaphore(2 * decode_window_size)
+    stopped = threading.Event()
+
+    try:
+        sentence_queue = Queue.Queue(pipeline_queue_size)
+        reader_stage = start_pipeline_stage(prepared_sentences,\
+                                            sentence_queue)
+
+        decoded_sentence_queue = Queue.Queue(pipeline_queue_size)
+        decoder_stage = start_pipeline_stage(decode_windows(\
+                        get_pipeline_items(sentence_queue, reader_stage),\
+                        tagger, pool, sentence_slots, stopped),\
+                        decoded_sentence_queue)
+
+        for decoded_sentence in get_pipeline_items(decoded_sentence_queue,\
+                                                   decoder_stage):
+            yield decoded_sentence
+
+        pool.close()
+    finally:
+
+        '''
+        The task handler thread of the pool may be waiting for a slot to
+        send the next sentence. Stop it, so that terminate can join it.
+        '''
+        stopped.set()
+        sentence_slots.release()
+
+        pool.terminate()
+        pool.join()
 
 ###############################################################################
-# End of get_obs_lkhd_prob_matrix function
+# End of decode_sentences function
 ###############################################################################
 
 ###############################################################################
-# Function      : viterbi_decode(test_file, unique_tags, 
-#                                word_tag_obs_lkhd_dict,
-#                                tag_transition_prob_matrix,test_copy_file_1)
+# Function      : viterbi_decode(test_file, tagger, sentence_constraints,
+#                                processes, compression)
 # Description   : This function tags all words with HMM POS-tagging using 
 #                 viterbi's decoding algorithm. It uses an HMM, represented by
 #                 tag transition probabilities and observation likelihood 
@@ -867,1039 +4701,1134 @@ def preprocess_file(file_name):
 #                 which has all words from test file with their tags. It also
 #                 writes the unknown words from test file with their tags in
 #                 output file.
-# Arguments     : test_file -  Name of preprocessed test file  
-#                 unique_tags - A list storing all valid tags 
-#                 word_tag_obs_lkhd_dict - A dict object storing mapping 
-#                                          of word-tag pairs with their
-#                                          observation likelihood Probabilities
-#                 tag_transition_prob_matrix - A dict object storing mapping of
-#                                              tag bigrams to their tag
-#                                              tag transition probabilities
-#                 test_copy_file_1 - A copy of original test file
-#                 unknown_word_tags_mapping - A dict object containing unknown
-#                 words and their tags
+# Arguments     : test_file -  Name of test file  
+#                 tagger - A trained Tagger object, having the HMM and the
+#                          decoder to be used
+#                 sentence_constraints - A dict object mapping sentence
+#                           numbers (starting at 1) to dict objects of
+#                           positions of words in that sentence (starting
+#                           at 1, not counting square brackets) and their
+#                           fixed tags.
+#                 processes - Number of processes decoding the sentences in
+#                             parallel. Default is 1, i.e. sentences are
+#                             decoded in this process only.
+#                 compression - Extension of a compression (gz, bz2 or xz),
+#                               if the output files are to be compressed,
+#                               e.g. "tagging-output.gz". Default is None.
 # Returns       : A count of total tokens/ words tagged, which will be later
 #                 used for evaluation of tagger
 ###############################################################################
-def viterbi_decode(test_file, unique_tags, word_tag_obs_lkhd_dict,\
-                   tag_transition_prob_matrix, test_copy_file_1,\
-                   unknown_word_tags_mapping):
+def viterbi_decode(test_file, tagger, sentence_constraints=None,\
+                   processes=1, compression=None):
     
     '''
     I have used the viterbi's decode algorithm as mentioned in the Section
     5.5 of JM text book "Speech and Language Processing". The variable naming
     conventions are same as that of the algorithm specified in the book.
     '''
-    
-    # open the preprocessed test file in read mode
-    test_file_handle = open(test_file, 'r')
+
+    '''
+    Extension of the output files, if they are to be compressed by 
+    open_file.
+    '''
+    output_extension = ''
+
+    if compression:
+        output_extension = '.' + compression
 
     # create tagging-output file which will store the final output
-    op_file_handle = open("tagging-output",'w')
+    op_file_handle = open_file("tagging-output" + output_extension, 'w')
 
-    # get all lines from the preprocessed test file into a list
-    test_file_contents = test_file_handle.read()
-    
-    # close the preprocessed test file
-    test_file_handle.close()
+    # file for confidences of tags, created only if the decoder gives them
+    confidence_file_handle = None
+
+    # file for k best tag sequences, created only if the decoder gives them
+    kbest_file_handle = None
 
-    # open the copy of original test file
-    test_copy_file_1_handle =  open(test_copy_file_1, 'r')
+    '''
+    Read the sentences of test file one by one using read_sentences function.
+    It gives the words of each sentence along with the white space before 
+    each word in test file. A sentence ends at a word which is a single 
+    period character, so that periods in abbreviations, fractional numbers 
+    and strings like '...' are not taken as sentence ends.
+
+    Iterate over the sentences and start applying viterbi's algorithm to
+    each sentence. The steps followed for decoding using viterbi's algo are 
+    as follows:
+
+    1) Viterbi's algorithm requires a start state for building path
+    probability matrix, and as I have used period as the start of sentence 
+    marker, I need to append a '.' at the start of each sentence. The 
+    sentence already ends with a period, except may be the last one, for
+    which a '.' is appended at the end.
+
+    2) Remove the square brackets from the words. This list will have periods
+    as a start and end elements of it and all words of the sentences will lie
+    between the periods in the list. So, start and end periods will also be
+    considered as words in the sentences.
+
+    The name of this list will be observation_list.
+
+    3) Keep the viterbi path probabilities of each tag for the previous word
+    in a list indexed by the position of tag in unique_tags. Probabilities
+    are kept in log space, so that they are added instead of multiplied and
+    don't underflow for long sentences.
+
+    4) Fill in the viterbi path probabilities for the start observation 
+    word '.'. This Probability will simply be 1 (log 0) for '.' tag.
+
+    5) Then perform the recursion step. For the first word through last period
+    in observation, paired with each tag possible for that word, get the 
+    viterbi path Probabilities from the dense tag transition log prob table,
+    which is built once after forming the HMM. Store a backpointer to the
+    best previous tag for each of them.
+
+    6) I have not used any specific termination condition as above recursive 
+    step will terminate automatically after processing trailing period in the
+    observation_list.
+
+    7) Backtrace from the best tag of trailing period by following the
+    backpointers. This backtracing will give me the POS tags for each word.
+
+    8) Write the POS tags along with words into tagging-output file.
 
-    # read the lines from it
-    test_copy_file_lines = test_copy_file_1_handle.readlines()
+    '''
+    # initialize a counter to store the total number of sentences tagged 
+    sentence_counter = 0
 
-    # close the copy of original test file
-    test_copy_file_1_handle.close()   
+    # initialize a counter to store the total number of tokens tagged
+    token_count = 0
 
     '''
-    Iterate over the contents of copy of original file stored in the
-    list test_copy_file_1_handle. Extract all sentences from it and store
-    them into a list test_file_1_sentences. These sentences will be 
-    used later to create final output file.
+    Iterate over the sentences from test file, along with their tags found
+    by decode_sentences function, in parallel processes if more than one
+    process is given.
+    '''
+    for sentence_words, sentence_spaces, observation_list, decoder_output\
+        in decode_sentences(test_file, tagger, sentence_constraints,\
+                            processes):
+
+        '''
+        White space at the end of test file does not have any words with it.
+        Just write it as it is.
+        '''
+        if not sentence_words:
+            op_file_handle.write(''.join(sentence_spaces))
+            continue
 
-    I am using the regex "?<![s\.])[\.][\s]*[\n]" here to extract the
-    sentences, which I have decided to be suitable for sentence extraction 
-    from test file after manual observation of original test file.
+        '''
+        Get the tag for each word in the observation_list from the decoder
+        of tagger. By default it is the bigram viterbi's algorithm described
+        above, applied by bigram_viterbi_sentence function. The tags given
+        for the sentence as constraints take precedence over the tags of 
+        unknown words, which in turn take precedence over the tags found by
+        the decoder.
+
+        A decoder may also return the confidence of each tag along with the
+        tags (posterior decoding). These are written into 
+        "tagging-output.confidence" file, one word/tag pair and its
+        confidence per line, with a blank line after each sentence. The 
+        leading '.' is only a start state, so it is not written.
+
+        Or a decoder may return a ranked list of (log prob, tags) pairs
+        (k-best decoding). The best tags are used for final output and all
+        of them are written into "tagging-output.kbest" file, one sequence
+        per line as <rank> <log prob> <word/tag pairs>, separated by tabs, 
+        with a blank line after each sentence.
+        '''
+        observation_tags, confidences, kbest_list = decoder_output
 
-    This regex has following contents:
+        '''
+        Log the tags of every log_sentence_interval-th sentence, if DEBUG
+        level logging is enabled.
+        '''
+        if sentence_counter % log_sentence_interval == 0 and\
+           logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sentence %d: %s", sentence_counter + 1,\
+                         ' '.join(word + '/' + tag for word, tag in\
+                         zip(observation_list[1:], observation_tags[1:])))
 
-    1) (?<![s\.]) - This is a negative lookbehind regex in python and it means
-    "Match a regex ( [\.][\s]*[\n] ) only if it is not
-    preceded by an S or '.'. The usage of negative lookbehind was learnt from
-    a similar question asked on stackoverflow online forum. It can be found 
-    here:
+        if kbest_list is not None:
 
-    http://stackoverflow.com/questions/8266052/python-regex-negating-
-    meta characters
+            if kbest_file_handle is None:
+                kbest_file_handle = open_file("tagging-output.kbest" +\
+                                              output_extension, 'w')
 
-    I have followed the answer by stackoverflow user "Dave Webb".
-    
-    2) [\.][\s]*[\n] - This means match a period followed by zero or more
-    spaces, which is again followed a newline. 
+            for rank, (log_prob, tags) in enumerate(kbest_list):
+                kbest_file_handle.write("%d\t%.4f\t%s\n" % (rank + 1,\
+                    log_prob, ' '.join(word + '/' + tag for word, tag in\
+                    zip(observation_list[1:], tags[1:]))))
 
-    So, to decide the end of any sentence in original test file, above regex
-    is used. 
+            kbest_file_handle.write("\n")
 
-    In a nutshell, the regex means search for this pattern-
+        if confidences is not None:
+
+            if confidence_file_handle is None:
+                confidence_file_handle = open_file(\
+                    "tagging-output.confidence" + output_extension, 'w')
+
+            for i in range(1, len(observation_list)):
+                confidence_file_handle.write("%s/%s\t%.4f\n" %\
+                    (observation_list[i], observation_tags[i], confidences[i]))
+
+            confidence_file_handle.write("\n")
+
+        '''
+        Now that we have got the tags for each word, write them in output
+        file "tagging-output" in the same layout as the test file. 
+
+        Each word of the sentence is written with the white space found
+        before it in test file, and the word is followed by a '/' and its
+        tag. Square brackets are written as they are. The tags of the words 
+        are taken in order from observation_tags, leaving the tag of leading
+        '.' start state. A trailing '.' appended to the last sentence is not
+        in the test file, so its tag is not written.
+
+        e.g. If the sentence in test file is :
+
+        No , \n[ it ]\n[ was n't Black Monday ]\n. \n
+
+        then the tagged sentence written into tagging-output is :
+
+        No/RB ,/, \n[ it/PRP ]\n[ was/VBD n't/RB Black/NNP Monday/NNP ]\n./. \n
+
+        While writing, count the number of words being tagged. This number 
+        gives us the total tokens present in the test file and it will be
+        later used in calculating overall accuracy of tagger later in the
+        program. This counter is called as token_count here.
+        '''
+        tag_position = 1
+
+        for word, space in zip(sentence_words, sentence_spaces):
+
+            if word == '[' or word == ']':
+                op_file_handle.write(space + word)
+                continue
+
+            op_file_handle.write(space + word + '/' +\
+                                 observation_tags[tag_position])
+
+            tag_position = tag_position + 1
+            token_count = token_count + 1
+
+        op_file_handle.write(sentence_spaces[-1])
+
+        sentence_counter =  sentence_counter + 1
+        
+    # close the final output file
+    op_file_handle.close()
+
+    if confidence_file_handle is not None:
+        confidence_file_handle.close()
+
+    if kbest_file_handle is not None:
+        kbest_file_handle.close()
+
+    logger.info("Tagged %d sentences, %d tokens of %s", sentence_counter,\
+                token_count, test_file)
+
+    # return token_count
+    return token_count
+
+###############################################################################
+# End of viterbi_decode function
+###############################################################################
+
+###############################################################################
+# Function      : read_word_tag_pairs(file_name)
+# Description   : This function reads a tagged file (tagging output or gold
+#                 std. file) line by line and yields its word-tag pairs one
+#                 by one. Square brackets are left out. If a tag is a 
+#                 composite (ambiguous) tag, then only first tag out of it is
+#                 taken.
+# Arguments     : file_name - Name of the tagged file, which may be 
+#                             compressed
+# Returns       : A generator of (line number, word, tag) tuples. Line numbers
+#                 start at 1. tag is '' for a word without a tag.
+###############################################################################
+def read_word_tag_pairs(file_name):
+
+    file_handle = open_file(file_name)
+
+    for line_number, line in enumerate(file_handle, 1):
+
+        # strip sq. brackets from the line and split it by white spaces
+        for word_tag_pair in line.replace('[','').replace(']','').split():
+
+            '''
+            Split the pair by last '/' to separate tag from word. 
+            '''
+            word_tag = word_tag_pair.rsplit('/', 1)
+
+            if len(word_tag) == 1:
+                yield line_number, word_tag[0], ''
+            else:
+                yield line_number, word_tag[0], word_tag[1].split('|')[0]
+
+    file_handle.close()
+
+###############################################################################
+# End of read_word_tag_pairs function
+###############################################################################
+
+###############################################################################
+# Function      : fill_buffer(buffer, word_tag_pairs, size)
+# Description   : This function reads word-tag pairs into a buffer till it 
+#                 has size pairs or the pairs are over.
+# Arguments     : buffer - A deque object of word-tag pairs
+#                 word_tag_pairs - An iterator of word-tag pairs as given by
+#                                  read_word_tag_pairs
+#                 size - Number of pairs wanted in the buffer
+# Returns       : None.
+###############################################################################
+def fill_buffer(buffer, word_tag_pairs, size):
+
+    while len(buffer) < size:
+        try:
+            buffer.append(next(word_tag_pairs))
+        except StopIteration:
+            return
+
+###############################################################################
+# End of fill_buffer function
+###############################################################################
+
+###############################################################################
+# Function      : evaluate_tagging(tagging_op_file_name,  gold_std_file_name,
+#                 known_words, resync_window, model_info)
+# Description   : This function calculates the overall accuracy of the tagging
+#                 done by comparison against manually tagged gold std file.
+#                 It also produces a confusion matrix to show percentage
+#                 of times a tag was wrongly tagged with another tag, and
+#                 a report of precision, recall and F1 of each tag and
+#                 accuracy of known and unknown words. See 
+#                 write_evaluation_report.
+#
+#                 Both files are read together one word at a time, and the
+#                 words of tagging output are aligned with the words of gold
+#                 std. file, not the lines. If the words of the two files do
+#                 not match, e.g. because a word is missing in one of them, it
+#                 is reported as a misalignment and the two files are
+#                 aligned again by looking ahead a few words in both. The
+#                 misaligned words of gold std. file are counted as 
+#                 incorrect taggings in the accuracy, so that tagging 
+#                 output which matches only a small part of gold std. file
+#                 does not get a high accuracy. A warning is printed if 
+#                 more than misaligned_warning_share of them are 
+#                 misaligned.
+# Arguments     : tagging_op_file_name - The name of file tagged by this
+#                                         program
+#                 gold_std_file_name - The name of manually tagged file
+#                 known_words - A set of words of training file, used to find
+#                               accuracy of known and unknown words. It can 
+#                               be None, if it is not needed.
+#                 resync_window - Number of words looked ahead in both files
+#                                 to align them again after a misalignment
+#                 model_info - A dict object describing the model of tagger,
+#                              as given by Tagger.get_model_info, to be
+#                              kept in the report along with the accuracy.
+#                              It can be None.
+# Returns       : A dict object having the evaluation report, as written 
+#                 into "evaluation.json" file.
+###############################################################################
+
+def evaluate_tagging(tagging_op_file_name,  gold_std_file_name, \
+                    known_words=None, resync_window=20, model_info=None):
+
+    tagged_pairs = read_word_tag_pairs(tagging_op_file_name)
+    gold_std_pairs = read_word_tag_pairs(gold_std_file_name)
 
-    Look for line having <'.'><zero or more spaces><'\n'> only if there is 
-    no <s> or <\.> before it. This avoids selection of periods from 
-    abbreviations, fractional numbers and strings like '...'
-    
-    Finding this regex was really a Herculean task as I needed to check it for
-    every sentence from test file. But eventually , I was able to get it.:-)
-
-    sample usage of above regex:
-
-    If the original test file has following contents:
-
-    No , 
-    [ it ]
-    [ was n't Black Monday ]
-    . 
-    But while 
-    [ the New York Stock Exchange ]
-    did n't 
-    [ fall ]
-    apart 
-    [ Friday ]
-    as 
-    [ the Dow Jones Industrial Average ]
-    plunged 
-    [ 190.58 points ]
-    -- most of 
-    [ it ]
-    in 
-    [ the final hour ]
-    -- 
-    [ it ]
-    barely managed to stay  
-    [ this side ]
-    of 
-    [ chaos ]
-    . 
-
-    then the extracted sentences stored in the list test_file_1_sentences will 
-    be like this:
-
-    {
-        [No , 
-        [ it ]
-        [ was n't Black Monday ]
-        . 
-
-        But while 
-        [ the New York Stock Exchange ]
-        did n't 
-        [ fall ]
-        apart 
-        [ Friday ]
-        as 
-        [ the Dow Jones Industrial Average ]
-        plunged 
-        [ 190.58 points ]
-        -- most of 
-        [ it ]
-        in 
-        [ the final hour ]
-        -- 
-        [ it ]
-        barely managed to stay  
-        [ this side ]
-        of 
-        [ chaos ]
-        .
-
-    Please note that despite of using above regex to separate sentences, there
-    was a weird instance of sentence ending in test file at line number 25815. 
-    It was like this [ ) .  ]. This line has a period though it is not really
-    sentence end for the sentence around line 25815. And because of this, 
-    I was getting wrongly fetched sentences by the regex used above. So, I
-    have changed this manually to [ )   ] to remove the period. I took this
-    as a configuration issue and removed the tag. But final output file does 
-    contain a period tagged in this line, just to make its comparison with 
-    gold std file easy.
-
-    This was the sole modification done to test file.
     '''
-    
-    # create list test_file_1_sentences to store all of the extracted sentences
-    test_file_1_sentences = []
-    
-    ''' 
-    Create an intermediate list store individual extracted sentences over each
-    iteration of contents of copy of original file.  
+    Words read from the files but not yet compared. These hold at most 
+    resync_window words, so that the memory used does not depend on size
+    of files.
+    '''
+    tagged_buffer = collections.deque()
+    gold_std_buffer = collections.deque()
+
+    '''
+    Count each pair of tag from tagging output file and correct tag from
+    gold std. file in a Counter object called as confusion_counter. The 
+    pairs with different tags are incorrect taggings.
+    '''
+    confusion_counter = collections.Counter()
+
+    '''
+    Count the words by whether they are known or not and whether they are
+    tagged correctly or not, in a Counter object with keys as 
+    (known, correct) pairs.
+    '''
+    known_word_counter = collections.Counter()
+
+    '''
+    Maintain counters of compared words, of misaligned words and of 
+    misaligned words of gold std. file.
     '''
-    ind_sentence_list = []
+    token_count = 0
+    misaligned_count = 0
+    misaligned_gold_std_count = 0
+
+    while True:
 
-    # iterate over the contents of original copy file to extract sentences
-    for l in test_copy_file_lines:
-        # append each line to the list of individual extracted sentence 
-        ind_sentence_list.append(l)
+        fill_buffer(tagged_buffer, tagged_pairs, 1)
+        fill_buffer(gold_std_buffer, gold_std_pairs, 1)
+
+        if not tagged_buffer or not gold_std_buffer:
+            break
 
         '''
-        If a line has sentence boundary, then join all previously extracted
-        lines and transfer this joined content to the list 
-        test_file_1_sentences.
+        If the words are same, then compare their tags.
         '''
-        if re.findall('(?<![s\.])[\.][\s]*[\n]',l ):
+        if tagged_buffer[0][1] == gold_std_buffer[0][1]:
+
+            word = gold_std_buffer[0][1]
+            tag1 = tagged_buffer.popleft()[2]
+            tag2 = gold_std_buffer.popleft()[2]
+            
+            confusion_counter[(tag1, tag2)] += 1
+            token_count = token_count + 1
+
+            if known_words is not None:
+                known_word_counter[(word in known_words, tag1 == tag2)] += 1
 
-            test_file_1_sentences.append(''.join(ind_sentence_list))
-           
-            # make ind_sentence_list empty to store next sentence 
-            ind_sentence_list = []
             continue
 
-    if debug:
-        print test_file_1_sentences
-        print len(test_file_1_sentences)    
+        '''
+        The words are not same. Look ahead in both files for the nearest 
+        positions i and j, where the words are same again, and leave out the
+        words before them.
+        '''
+        fill_buffer(tagged_buffer, tagged_pairs, resync_window)
+        fill_buffer(gold_std_buffer, gold_std_pairs, resync_window)
+
+        skip = (1, 1)
+
+        for distance in range(1, 2 * resync_window):
+            for i in range(max(0, distance - len(gold_std_buffer) + 1),\
+                           min(distance, len(tagged_buffer) - 1) + 1):
+                if tagged_buffer[i][1] == gold_std_buffer[distance - i][1]:
+                    skip = (i, distance - i)
+                    break
+            else:
+                continue
+            break
+
+        # report first few misalignments only
+        if misaligned_count < 10:
+            print "Misaligned: line %d of %s has '%s', line %d of %s has "\
+                  "'%s'" % (tagged_buffer[0][0], tagging_op_file_name,\
+                  tagged_buffer[0][1], gold_std_buffer[0][0],\
+                  gold_std_file_name, gold_std_buffer[0][1])
+
+        for i in range(skip[0]):
+            tagged_buffer.popleft()
+
+        for i in range(skip[1]):
+            count_misaligned_word(gold_std_buffer.popleft()[1],\
+                                  known_words, known_word_counter)
+
+        misaligned_count = misaligned_count + max(skip)
+        misaligned_gold_std_count = misaligned_gold_std_count + skip[1]
 
-    
     '''
-    Split the contents of test file by period '.' character to get all the 
-    sentences from the file. A period is considered to be valid end of sentence
-    marker for our program. But period may occur in the abbreviations as well,
-    so to do proper segmentation of sentences, I will split the test file
-    by <space><'.'><space> characters. This will make sure that we don't get any
-    false positives in sentence boundary detection.
+    Words left in either file after the other is over are also misaligned.
     '''
-    
-    test_sentences_list = test_file_contents.split(' . ')
-    
-    if debug:
-        for line in test_sentences_list:
-            print line.replace('[','').replace(']','')
+    for pair in itertools.chain(tagged_buffer, tagged_pairs):
+        misaligned_count = misaligned_count + 1
 
-    '''
-    Iterate over the sentences list and start applying viterbi's algorithm to
-    each sentence. The steps followed for decoding using viterbi's algo are 
-    as follows:
+    for pair in itertools.chain(gold_std_buffer, gold_std_pairs):
+        count_misaligned_word(pair[1], known_words, known_word_counter)
+        misaligned_count = misaligned_count + 1
+        misaligned_gold_std_count = misaligned_gold_std_count + 1
 
-    1) As the above splitting by <space><'.'><space> characters 
-    strips the period character from the end of each sentence, append a '.'
-    character at the end of sentence. 
-    
-    2) Also, Viterbi's algorithm requires a start state for building 
-    path probability matrix, and as I have used period as the start of sentence 
-    marker, I need to append a '.' at the start of each sentence.
+    if misaligned_count:
+        print "%d words could not be aligned" % misaligned_count
 
-    3) After this, split the sentence at the space character again to get a 
-    list of words from the sentences. This list will have periods as a start 
-    and end elements of it and all words of the sentences will lie between the
-    periods in the list. So, start and end periods will also be considered as
-    words in the sentences.
+    gold_std_count = token_count + misaligned_gold_std_count
 
-    The name of this list will be observation_list.
+    if misaligned_gold_std_count > misaligned_warning_share * gold_std_count:
+        print "WARNING: %d of %d words of %s could not be aligned, the"\
+              " files may not match" % (misaligned_gold_std_count,\
+              gold_std_count, gold_std_file_name)
 
-    4) Create an ordered dict object path_prob_matrix to store the path 
-    probability matrix of the viterbi algorithm. 
-
-    5) Iterate over all words from observation list and tags, to fill in 
-    each word-tag pair as a key of path_prob_matrix dict object. The viterbi
-    path Probabilities for each word -tag pair will be the values for these 
-    keys.
-
-    e.g. If a sentence in test file is "I run" and if valid tags are PRP,'.' 
-    and VB , then after appending trailing and leading '.' 
-    characters to sentence, path_prob_matrix will look something like this:
-
-    ---------------------------------------------
-    | word-tag pair |    viterbi path prob      |
-    ---------------------------------------------
-    | ('.','.')     |   0.98                    |
-    -------------------------------------------- 
-    | ('.','PRP')   |   0.00                    |
-    --------------------------------------------
-    | ('.','VB')    |   0.00                    |
-    --------------------------------------------
-    | ('I','.')     |   0.00                    |
-    --------------------------------------------
-    | ('I','PRP')   |   0.98                    |
-    --------------------------------------------
-    | ('I','VB')    |   0.00                    |
-    -------------------------------------------- 
-    | ('run','.')   |   0.00                    |
-    --------------------------------------------
-    | ('run','PRP') |   0.00                    |
-    --------------------------------------------
-    | ('run','VB')  |   0.98                    |
-    --------------------------------------------
-    
-    These viterbi path probability values are initialized to zero at first.
+    '''
+    Make the evaluation report from the counts and write it into files.
+    '''
+    report = write_evaluation_report(confusion_counter, known_word_counter,\
+                                     misaligned_count, model_info,\
+                                     misaligned_gold_std_count)
 
-    6) Then fill in the viterbi path probabilities for the start observation 
-    word '.'. These Probabilities will simply be 1.
+    '''
+    Print overall accuracy, and of known and unknown words, if known.
+    '''
+    print report['accuracy']
 
-    7) Initialize the Probabilities of first word paired with all tags
-    product of the tag transition Probabilities and observation likelihood prob.
+    if known_words is not None:
+        print "Known words: %.4f%% of %d, unknown words: %.4f%% of %d" %\
+              (report['known_accuracy'], report['known_count'],\
+               report['unknown_accuracy'], report['unknown_count'])
 
-    8) Then perform the recursion step. For the second word through last period
-    in observation paired with each tag, get the viterbi path Probabilities.
+    if model_info is not None:
+        print "Model: %s" % ', '.join('%s %s' % (name, value) for name,\
+                                      value in model_info.iteritems())
 
-    9) I have not used any specific termination condition as above recursive 
-    step will terminate automatically after processing trailing period in the
-    observation_list.
+    return report
+
+###############################################################################
+# End of evaluate_tagging function
+###############################################################################
+
+###############################################################################
+# Function      : count_misaligned_word(word, known_words, 
+#                                       known_word_counter)
+# Description   : This function counts a misaligned word of gold std. file
+#                 as an incorrect tagging of known or unknown word.
+# Arguments     : word - The misaligned word
+#                 known_words - A set of words of training file, or None
+#                 known_word_counter - A Counter object of (known, correct)
+#                                      pairs, as in evaluate_tagging
+# Returns       : None.
+###############################################################################
+def count_misaligned_word(word, known_words, known_word_counter):
 
-    10) Also, I have not used a backpointer specifically as backtracing will be
-    done by just iterating over path_prob_matrix at the end. This backtracing 
-    will give me the POS tags for each word.
+    if known_words is not None:
+        known_word_counter[(word in known_words, False)] += 1
 
-    11) Write the POS tags along with words into tagging-output file.
+###############################################################################
+# End of count_misaligned_word function
+###############################################################################
+
+###############################################################################
+# Function      : write_evaluation_report(confusion_counter, 
+#                                         known_word_counter,
+#                                         misaligned_count, model_info,
+#                                         misaligned_gold_std_count)
+# Description   : This function makes the evaluation report from the counts
+#                 found by evaluate_tagging and writes it into files:
+#
+#                 1) "conf_matrix.csv" - The percentage of incorrect taggings
+#                    for each pair of correct tag (rows) and wrongly given
+#                    tag (columns), for the tags having any incorrect tagging.
+#                 2) "conf_matrix_counts.csv" - The number of words for each
+#                    pair of correct tag (rows) and given tag (columns), for
+#                    all tags. Correctly tagged words are on the diagonal.
+#                 3) "tag_metrics.csv" - Precision, recall and F1 of each tag.
+#                 4) "evaluation.json" - All of the above along with overall
+#                    accuracy, accuracy of known and unknown words and the
+#                    description of model of tagger, if given.
+#
+#                 The overall accuracy is over all words of gold std. file,
+#                 counting the misaligned ones as incorrect, while the 
+#                 confusion matrix and metrics of tags are over the aligned
+#                 words only.
+# Arguments     : confusion_counter - A Counter object of (given tag, correct
+#                                     tag) pairs
+#                 known_word_counter - A Counter object of (known, correct)
+#                                      pairs. It can be empty.
+#                 misaligned_count - Number of words which could not be 
+#                                    aligned
+#                 model_info - A dict object describing the model of tagger,
+#                              or None
+#                 misaligned_gold_std_count - Number of words of gold std.
+#                                             file which could not be 
+#                                             aligned
+# Returns       : A dict object having the evaluation report.
+###############################################################################
+def write_evaluation_report(confusion_counter, known_word_counter,\
+                            misaligned_count, model_info=None,\
+                            misaligned_gold_std_count=0):
 
     '''
-    # initialize a counter to store the total number of sentences tagged 
-    sentence_counter = 0
+    Build the confusion matrix as a list of lists of counts, with a row for
+    each correct tag and a column for each given tag, over all tags seen in
+    either file. 
+    '''
+    tags = sorted(set(tag for tag_pair in confusion_counter\
+                      for tag in tag_pair))
 
-    # initialize a counter to store the total number of tokens tagged
-    token_count = 0
+    tag_index = dict((tag, i) for i, tag in enumerate(tags))
 
-    # iterate over the sentences list from test file
-    for sentence in test_sentences_list:
-       
-        # append a leading period
-        observation_list1 = ['.']
-        sentence_words_list = sentence.split()
+    confusion_matrix = [[0] * len(tags) for tag in tags]
 
-        for sentence_word in sentence_words_list:
-            observation_list1.append(sentence_word)
+    for (tag1, tag2), count in confusion_counter.iteritems():
+        confusion_matrix[tag_index[tag2]][tag_index[tag1]] = count
 
-        # append a trailing period
-        observation_list1.append('.')
-        
-        '''
-        Remove all square brackets from the observation list created above and
-        create a new list with remaining words. Square brackets are not used
-        in POS tagging so removal of them is okay here. 
+    '''
+    Get the number of correct taggings of each tag from the diagonal, the
+    number of words having each tag in gold std. file from the row sums and
+    the number of words given each tag from the column sums.
+    '''
+    correct_counts = [confusion_matrix[i][i] for i in range(len(tags))]
+    gold_std_counts = map(sum, confusion_matrix)
+    tagged_counts = map(sum, zip(*confusion_matrix))
+
+    token_count = sum(gold_std_counts)
+    incorrect_tags_count = token_count - sum(correct_counts)
+
+    precisions = [float(correct) / tagged if tagged else 0.0 for\
+                  correct, tagged in zip(correct_counts, tagged_counts)]
+    recalls = [float(correct) / gold if gold else 0.0 for\
+               correct, gold in zip(correct_counts, gold_std_counts)]
+    f1_scores = [2 * precision * recall / (precision + recall) if\
+                 precision + recall else 0.0 for precision, recall in\
+                 zip(precisions, recalls)]
+
+    report = collections.OrderedDict()
+
+    gold_std_count = token_count + misaligned_gold_std_count
+
+    report['accuracy'] = float(100) - ((float(incorrect_tags_count +\
+                         misaligned_gold_std_count) /\
+                         float(max(gold_std_count, 1))) * 100)
+    report['aligned_accuracy'] = float(100) - ((float(incorrect_tags_count) /\
+                                 float(max(token_count, 1))) * 100)
+    report['token_count'] = token_count
+    report['misaligned_count'] = misaligned_count
+    report['misaligned_gold_std_count'] = misaligned_gold_std_count
 
-        The approach for removing all occurrences of square brackets from 
-        a python list is borrowed from a similar question asked on 
-        stackoverflow forum. It can be found here :
+    '''
+    Get the accuracy of known and unknown words.
+    '''
+    for known, name in ((True, 'known'), (False, 'unknown')):
 
-        http://stackoverflow.com/questions/1157106/
-        remove-all-occurences-of-a-value-from-a-python-list
+        count = known_word_counter[(known, True)] +\
+                known_word_counter[(known, False)]
 
-        I have followed the usage of lambda expressions as suggested by 
-        answer given by user "Mark Rushakoff" for above mentioned question.
-        '''
+        report[name + '_count'] = count
+        report[name + '_accuracy'] = float(100) *\
+            known_word_counter[(known, True)] / max(count, 1)
 
-        observation_list = filter (lambda a: a != '[' and  a != ']',\
-                                   observation_list1)
+    if model_info is not None:
+        report['model'] = model_info
 
-        if debug:
-            print observation_list
-    
-        # create an ordered dict object to store path prob matrix 
-        path_prob_matrix = collections.OrderedDict()
-
-        '''
-        Build the viterbi path prob matrix for each word in sentence and
-        each valid tag. Initialize path prob to be zero. 
-        '''
-        for word in observation_list:
-            for tag in unique_tags:
-                path_prob_matrix[(word,tag)] = 0.0000
-
-        if debug:
-            print path_prob_matrix
-            print len(path_prob_matrix)
-
-        '''
-        Initialize the path prob for first word in the sentence i.e. leading 
-        '.' as 1. This will be start state for viterbi's algo.
-        '''
-        for tag in unique_tags:
-            path_prob_matrix[(observation_list[0],tag)] = 1.0000
-
-        '''
-        Do the initialization step as given in viterbi's algo for first 
-        non-period word and all tags paired with it. If a unknown word
-        is encountered here, then assign a dummy high obs. likelihood prob
-        as 0.99 to it. This dummy prob value is used just to maintain
-        the flow of viterbi algorithm while switching from each observation
-        to the next. Actual tag written in final output for each unknown
-        word will be the one, decided earlier by rule-based approach.
-        '''    
-        for tag in unique_tags:
-            try: 
-                path_prob_matrix[(observation_list[1],tag)] = \
-                    tag_transition_prob_matrix[('.', tag)] * \
-                    path_prob_matrix[(observation_list[0],tag)]*\
-                    word_tag_obs_lkhd_dict[(observation_list[1],tag)]
-            except KeyError:
-                    word_tag_obs_lkhd_dict[(observation_list[1],tag)] = 0.99
-                    path_prob_matrix[(observation_list[1],tag)] = \
-                    tag_transition_prob_matrix[('.', tag)] * \
-                    path_prob_matrix[(observation_list[0],tag)]*\
-                    word_tag_obs_lkhd_dict[(observation_list[1],tag)]
-        
-        '''
-        Do the recursive step of viterbi's algo for the second
-        non-period word through last word (trailing '.') paired with 
-        all tags.
-        
-        If a unknown word is encountered here, then assign a dummy high obs. 
-        likelihood prob as 0.99 to it. 
-        
-        This dummy prob value is used just to maintain
-        the flow of viterbi algorithm while switching from each observation
-        to the next. Actual tag written in final output for each unknown
-        word will be the one, decided earlier by rule-based approach 
-        '''        
-        
-        for i in range(2, len(observation_list)):
-            for tag1 in unique_tags:
-                previous_viterbi_state_prob_list=[]
-                for tag2 in unique_tags:
-                     previous_viterbi_state_prob_list.append(\
-                     path_prob_matrix[(observation_list[i-1],tag2)] *\
-                     tag_transition_prob_matrix[(tag2, tag1)])
-            
-                try: 
-                    path_prob_matrix[(observation_list[i],tag1)] =\
-                        max(previous_viterbi_state_prob_list) *\
-                        word_tag_obs_lkhd_dict[(observation_list[i],tag1)]
-                except KeyError:
-                        word_tag_obs_lkhd_dict[(observation_list[i],tag1)] =\
-                        0.99
-                        path_prob_matrix[(observation_list[i],tag1)] =\
-                        max(previous_viterbi_state_prob_list) *\
-                        word_tag_obs_lkhd_dict[(observation_list[i],tag1)]
-                
-                if debug:
-                    print observation_list[i]
-                    print tag1
-                    print max(previous_viterbi_state_prob_list) * \
-                      word_tag_obs_lkhd_dict[(observation_list[i],tag1)]
+    report['tags'] = tags
+    report['confusion_matrix'] = confusion_matrix
+    report['tag_metrics'] = collections.OrderedDict()
+
+    for i, tag in enumerate(tags):
+        report['tag_metrics'][tag] = collections.OrderedDict([\
+            ('precision', precisions[i]), ('recall', recalls[i]),\
+            ('f1', f1_scores[i]), ('gold_count', gold_std_counts[i]),\
+            ('tagged_count', tagged_counts[i])])
+
+    '''
+    Get all the tags which appear in incorrect taggings. These tags only
+    will be displayed in rows and columns of "conf_matrix.csv".
+    These tags will be stored in a list tags_list.
+    '''
+    tags_list = [tag for i, tag in enumerate(tags) if\
+                 correct_counts[i] != gold_std_counts[i] or\
+                 correct_counts[i] != tagged_counts[i]]
+
+    '''
+    Iterate over the tags_list and start printing confusion matrix.
+    Calculate the percentage errors for each tag pair in confusion_matrix
+    to display it in output. The output will be stored as a .csv file.
+    Python provides an elegant csv module for creation of csv file. I have
+    found that csv is an easiest way to get table like pretty printing of
+    confusion matrix. The usage of csv module was learnt from an answer
+    to a question on stackoverflow forum. It can be found here:
 
-        if debug:
-            print tag_transition_prob_matrix
-            print path_prob_matrix
+    http://stackoverflow.com/questions/2084069/create-a-csv-file-with-values-
+    from-a-python-list
 
-        '''
-        Perform backtracing by traversing through the path probability matrix
-        and getting max path probability for each word and find corresponding
-        tag, which will be our final tag for that word.
-        
-        Each word and it's tag will be stored in another list called
-        as backtraced_word_tag. The word and it's tag will be separated by
-        a '/'
-        '''
+    I have followed the code in answer by stackoverflow user vy32.
 
-        backtraced_word_tag = [] 
-        
-        for i in range(0,len(observation_list)):
-            viterbi_indiviaul_obs_prob_list = []
-            for tag in unique_tags:
-                viterbi_indiviaul_obs_prob_list.\
-                append(path_prob_matrix[(observation_list[i],tag)])
-                
-            # if word is known, then take the tag decided by viterbi algo.
-            if observation_list[i] not in unknown_word_tags_mapping.keys():
-                backtraced_word_tag.append(observation_list[i] + '/'\
-                                   + unique_tags[\
-                                   viterbi_indiviaul_obs_prob_list.\
-                                   index(max(\
-                                   viterbi_indiviaul_obs_prob_list))])
-            # if the word is unknown, then take tag, got by rule based approach
-            else:
-                backtraced_word_tag.append(observation_list[i] + '/'\
-                                   + unknown_word_tags_mapping[\
-                                   observation_list[i]])
+    Python lists can directly be written into a csv file. So, form the list 
+    that will represent the confusion matrix along with table row and col
+    header.
+    '''
+    csv_file_handle = open("conf_matrix.csv","w")
+    out = csv.writer(csv_file_handle, delimiter=',')
 
+    out.writerow([' '] + tags_list)
 
-        if debug:
-            print observation_list1
-            print observation_list 
-            print backtraced_word_tag
+    # iterate over the tags_list to get table row headers and data
+    for tag2 in tags_list:
+        row_data = [tag2]
+        for tag1 in tags_list:
+            count = confusion_matrix[tag_index[tag2]][tag_index[tag1]]
+            if tag1 != tag2 and count:
+                row_data.append((float(count) /\
+                                 float(incorrect_tags_count)) * float(100))
+            else:
+                row_data.append('-')
 
-        '''
-        Now that we have got the tags for each word. We need to write them in
-        output file "tagging_output". But there are two things remaining:
-        
-        1) We need to put back the square brackets removed earlier at correct 
-        positions in output file.
-        2) And we need to introduce the newline characters again which were
-        removed earlier during preprocessing of test file.
-        
-        For the first thing, to introduce square brackets:
+        out.writerow(row_data) 
 
-        First find out the positions of square brackets in the sentence by 
-        iterating over observation_list1. These positions/indices will be 
-        stored in a separate list called as bracket_indices. The opening and 
-        closing bracket appear in pairs, so the indices present at 
-        even positions in bracket_indices will correspond to opening brackets
-        while indices present at odd positions in bracket_indices will 
-        correspond to closing brackets.
+    csv_file_handle.close()
 
-        e.g. If the original sentence from the test file is :
+    # write the counts of all tag pairs
+    csv_file_handle = open("conf_matrix_counts.csv","w")
+    out = csv.writer(csv_file_handle, delimiter=',')
 
-        No , [ it ] [ was n't Black Monday ] .
-        
-        then the contents of observation_list1 is as follows:
+    out.writerow([' '] + tags)
 
-        ['.', 'No', ',', '[', 'it', ']', '[', 'was', "n't", 'Black', 'Monday', 
-        ']', '.']
+    for tag, row in zip(tags, confusion_matrix):
+        out.writerow([tag] + row)
 
-        The list observation_list1 has opening sq. bracket at positions 3 and 6
-        while it has closing sq. bracket at positions 5 and 11. (Here list 
-        indices start from 0)
+    csv_file_handle.close()
 
-        If we store these positions into list bracket_indices, it will look 
-        like this:
-        
-        [3,5,6,11]
+    # write the metrics of each tag
+    csv_file_handle = open("tag_metrics.csv","w")
+    out = csv.writer(csv_file_handle, delimiter=',')
 
-        In above list, the numbers at even positions are of opening sq. 
-        brackets while numbers at odd positions are of closing sq. brackets.
+    out.writerow(['tag', 'precision', 'recall', 'f1', 'gold_count',\
+                  'tagged_count'])
 
-        So, bracket_indices[0] = 3 and bracket_indices[2] = 6 are for opening 
-        sq. brackets and bracket_indices[1] = 5 and bracket_indices[3] = 11 are
-        for closing brackets. So we can use this new list for inserting opening
-        and closing sq. brackets into the list "backtraced_word_tag" which has 
-        all the tagged words from observation_list1 except sq. brackets.
+    for tag, metrics in report['tag_metrics'].iteritems():
+        out.writerow([tag] + metrics.values())
 
-        e.g. backtraced_word_tag for above sentence looks like this:
+    csv_file_handle.close()
 
-        ['./.', 'No/RB', ',/,', 'it/PRP', 'was/VBD', "n't/RB", 'Black/NNP'
-        , 'Monday/NNP', './.']
+    # write the whole report
+    json_file_handle = open("evaluation.json", "w")
+    json.dump(report, json_file_handle, indent=2)
+    json_file_handle.close()
 
-        After insertion of brackets at position 3, 5, 6 and 11, we will get the
-        backtraced_word_tag list as follows:
-        
-        ['./.', 'No/RB', ',/,', '[', 'it/PRP', ']', '[','was/VBD', 
-        "n't/RB", 'Black/NNP', 'Monday/NNP', ']', './.']
+    return report
 
-        '''
+###############################################################################
+# End of write_evaluation_report function
+###############################################################################
 
-        bracket_indices = []
-        
-        '''
-        Iterate over observation_list1 to get positions of square brackets
-        and add these positions to bracket_indices
-        '''
-        for i in range(0,len(observation_list1)):
-            if observation_list1[i] == '[' or observation_list1[i] == ']':
-                bracket_indices.append(i)
-        
-        if debug:
-            print observation_list1[1:]
-        
-        
-        
-        '''
-        Iterate over the bracket_indices list and insert the square brackets.
-        '''
-        for i in range(0,len(bracket_indices)):
-            if i % 2 == 0:
-                backtraced_word_tag.insert(bracket_indices[i],'[')
-            else:
-                backtraced_word_tag.insert(bracket_indices[i],']')
-      
-        if debug:
-            print backtraced_word_tag[1:]
-
-        '''
-        Now proceed to second remaining thing: adding newlines to the tagged
-        text, which were removed earlier in preprocessing. This task has been
-        a major hurdle in this program. Getting the output from 
-        backtraced_word_tag (which has word/tag pairs from each sentences with
-        newlines removed) to make it look exactly same as original test file, 
-        was really difficult. 
-        
-        First, I thought of finding the rule followed in the original test file
-        for putting newlines into it. I found that there are newlines 
-        before the opening square bracket and after the closing
-        square bracket and a period character. So, inserting the newline 
-        character at these positions while traversing backtraced_word_tag will
-        suffice. I wrote a bunch of code on this assumption about newlines and
-        eventually found out that the rule about newlines had many exceptions.
-        So, I had to leave that approach! 
-
-        Then, I thought I will compare each tagged sentence stored in 
-        backtraced_word_tag list with the corresponding sentence in original 
-        test file and put the tags from backtraced_word_tag just after the
-        word in each sentence of original test file.
-
-        I had each sentence with tagged words in backtraced_word_tag 
-        and I had the copy of original test file test_copy_file_1.
-        And I needed to extract sentences from original sentences, which was
-        a tough task due to irregularity in sentence boundaries in test file.
-        But regex "?<![s\.])[\.][\s]*[\n]" came to my rescue. It is already 
-        mentioned above and in fact all sentences are also already extracted
-        above into the list test_file_1_sentences. These sentences already have
-        newlines, which we wanted in final output file.
-
-        Now my job became a less tougher. I just need to put the tags from 
-        backtraced_word_tag at the correct positions in each sentence of 
-        test_file_1_sentences.
-
-        It will happen as below:
-        
-        Consider that the original sentence in test_file_1_sentences is as 
-        follows :
+###############################################################################
+# Function      : split_train_sentences(train_lines)
+# Description   : This function splits the lines of training file into 
+#                 sentences. A sentence ends at a line whose last word-tag 
+#                 pair is './.'.
+# Arguments     : train_lines - An iterable of cleaned lines of training file
+# Returns       : A list having list of lines of each sentence.
+###############################################################################
+def split_train_sentences(train_lines):
 
-        No ,\n [ it ]\n[ was n't Black Monday ]\n.
+    sentences = []
+    sentence_lines = []
 
-        and the corresponding tagged text in the backtraced_word_tag list is
+    for line in train_lines:
+        sentence_lines.append(line)
 
-        No/DT ,/, [ it/PRP ] [ was/VBD n't/RB Black/NNP Monday/NNP ] ./.
-        
-        Now take each word-tag pair (e.g. No/DT) from backtraced_word_tag 
-        and separate it word (No) and tag (DT), search for first occurrence of
-        word "No" in original sentence in test_file_1_sentences and replace it 
-        with No/DT so that the contents of original sentence in 
-        test_file_1_sentences becomes :
+        if line.split()[-1:] == ['./.']:
+            sentences.append(sentence_lines)
+            sentence_lines = []
 
-        No/DT ,\n [ it ]\n[ was n't Black Monday ]\n.
+    # lines after the last period are taken as the last sentence
+    if sentence_lines:
+        sentences.append(sentence_lines)
 
-        Repeat this until we get tags for each word like this:
+    return sentences
 
-        No/DT ,/,\n [ it/PRP ]\n [ was/VBD n't/RB Black/NNP Monday/NNP ] ./.\n
+###############################################################################
+# End of split_train_sentences function
+###############################################################################
 
-        This sentence with tags and newlines will be then written
-        into final output file tagging-output. This will be the final output
-        of all the mind boggling with newlines :)
+###############################################################################
+# Function      : get_tagged_words(sentence_lines)
+# Description   : This function separates the words of lines of a sentence 
+#                 of training file from their tags, the same way as 
+#                 get_hmm_counts does. The words are kept as they are written
+#                 in training file, the same way as in the test file.
+# Arguments     : sentence_lines - List of cleaned lines of the sentence
+# Returns       : A list of (word, tag) pairs.
+###############################################################################
+def get_tagged_words(sentence_lines):
 
-        
-        The code that was written with the wrong assumption that newlines 
-        appear before and after certain characters in test file is shown below 
-        in commented format.
-
-        ''
-        The test file has a newline before the opening square bracket and 
-        after the closing
-        square bracket and a period character. So, insert the newline 
-        character at these positions while traversing backtraced_word_tag.
-        ''
-        for i in range(0,len(observation_list)):
-            if observation_list[i] == '[':
-                observation_list[i] = '\n['
+    tagged_words = []
 
-            elif observation_list[i] == ']':
-                observation_list[i] = ']\n'
+    for line in sentence_lines:
+        for word_tag_pair in line.split():
+            if word_tag_pair.rfind('/') != -1:
+                tagged_words.append(\
+                    (word_tag_pair[:word_tag_pair.rfind('/')],\
+                     word_tag_pair[word_tag_pair.rfind('/') + 1:]\
+                     .split('|')[0]))
 
-            elif observation_list[i] == '.':
-                observation_list[i] = '. \n'
-        
-        ''
-        Write the contents of backtraced_word_tag into tagging-output file
-        ''
-        #for i in range(1,len(observation_list)):
-            op_file_handle.write(observation_list[i] + ' ')
+    return tagged_words
 
-        
-        
-        # close the final output file
-        op_file_handle.close()
+###############################################################################
+# End of get_tagged_words function
+###############################################################################
 
+###############################################################################
+# Function      : cross_validate_fold(fold_args)
+# Description   : This function trains a tagger on all folds of training 
+#                 file but one, and tags and evaluates the remaining fold.
+#                 It is run in a separate process for each fold by 
+#                 cross_validate function.
+# Arguments     : fold_args - A tuple of:
+#                   1) An untrained Tagger object
+#                   2) Counts of all folds but one, as returned by 
+#                      subtract_hmm_counts
+#                   3) Sentences of the remaining fold, as returned by
+#                      split_train_sentences
+# Returns       : A dict object having number of tokens, unknown tokens 
+#                 and those tagged correctly, and the seconds taken to train
+#                 and to tag.
+###############################################################################
+def cross_validate_fold(fold_args):
 
-        #''
-        After writing contents of backtraced_word_tag to the tagging output
-        file, there is still some more formatting needed to make tagging_output
-        appear like the original test file. There are few extra blank lines in
-        tagging_output file and extra leading spaces in some lines. 
-        Need to remove those by formatting. For this, call format_op_file() 
-        function. 
-    
-        It takes the name of tagging output file as an input to it, formats
-        it and overwrites the original unformatted op file with formatted one.
-        ''  
-    
-        format_op_file("tagging-output")
-         
-        ###################################################################
-        # start of format_op_file() function
-        ###################################################################
-        def format_op_file(tagging_output):
-    
-            # open the tagging output file in read mode
-            tagging_op_file_handle = open(tagging_output, 'r')
-
-        #  read the contents of it to a list
-        op_file_contents =  tagging_op_file_handle.readlines()
-
-        # close the file
-        tagging_op_file_handle.close()
-
-        ''
-        Open the tagging output file again in write mode so as to remove extra 
-        blank lines and extra leading spaces. Opening in write mode will 
-        overwrite
-        the original tagging output file.
-        ''
-        tagging_op_file_handle = open(tagging_output, 'w')
-
-        ''
-        Iterate over the op_file_contents to remove blank lines and leading 
-        spaces 
-        and write the formatted lines back to tagging output file.
-        '' 
-        if debug:
-            print op_file_contents
-    
-        for line in op_file_contents:
-        
-            # skip the lines which are blank
-            if line == " \n":
-                    continue
-        
-            # remove leading spaces
-        
-            ''
-            The extra leading spaces won't be removed for the lines which has
-            '(', '{' , ')', '}' after those spaces. 
-            This is due to the convention followed in test file that 
-            there will be a leading space if a line starts with '(' , '{', ')',
-            '}'.
-        
-            And as we want the tagging output to be in same format as the test
-            file, I am following the same convention here.
-            ''
-        
-            if len(line) > 1:
-                if line[0] == " " and line[1] != "(" and line[1] != "}" and\
-                line[1] != "}" and line[1] != ")":
-                        line = line[1:]
+    tagger, train_counts, test_sentences = fold_args
 
-            tagging_op_file_handle.write(line)
+    start_time = time.time()
+    tagger.train_from_counts(train_counts)
+    train_seconds = time.time() - start_time
 
-    
-        # close the file
-        tagging_op_file_handle.close()
-       
-        ###################################################################
-        # End of format_op_file() function
-        ###################################################################
+    fold_result = {'token_count': 0, 'correct_count': 0,\
+                   'unknown_count': 0, 'unknown_correct_count': 0,\
+                   'train_seconds': train_seconds, 'tag_seconds': 0.0}
 
-        '''
+    for sentence_lines in test_sentences:
 
-        '''
-        Iterate over the backtraced_word_tag to get word-tag pair
-        to put the tags in corresponding sentence in test_file_1_sentences.
-        While doing this iteration, count the number of words being tagged.
-        This number gives us the total tokens present in the test file and
-        it will be later used in calculating overall accuracy of tagger later
-        in the program. This counter is called as token_count here.
-        '''
+        tagged_words = get_tagged_words(sentence_lines)
+        words = [word for word, tag in tagged_words]
 
-        '''
-        Check if the iteration over the backtraced_word_tag list happens
-        only till the all sentences in test_file_1_sentences are processed.
-        '''
-        if sentence_counter <= len (test_file_1_sentences) - 1:
+        start_time = time.time()
+        tags = tagger.tag(words)
+        fold_result['tag_seconds'] += time.time() - start_time
 
-            '''
-            Get the current sentence from test_file_1_sentences corresponding 
-            to sentence in backtraced_word_tag. Append spaces before
-            and after newline char to current sentence. These spaces
-            facilitate word boundaries in string replacement later. These
-            spaces will be removed when final output is written.
-            '''
-            curr_sentence = ' ' + test_file_1_sentences[sentence_counter]
-            
-            curr_sentence = curr_sentence.replace('\n',' \n ')
+        for (word, gold_tag), tag in zip(tagged_words, tags):
+            correct = int(tag == gold_tag)
 
-            for word_tag in backtraced_word_tag[1:]:
-                # separate word from the word/tag pair
-                word_tag_list = word_tag.rsplit("/",1)
-                word = word_tag_list[0]
-                
-                if word != '[' and word != ']':
-                    token_count = token_count + 1
+            fold_result['token_count'] += 1
+            fold_result['correct_count'] += correct
 
-                '''
-                Replace the word separated above by word/tag pair in
-                current statement
-                '''
-                curr_sentence = curr_sentence.replace(' '+ word + ' ', \
-                                                    ' ' + word_tag + ' ') 
-                backtraced_word_tag.remove(word_tag)
-        
-        '''
-        Husshh! Finally write the final tagged sentence into 
-        tagging-output file.
-        '''
-        if sentence_counter < len(test_file_1_sentences):
-            op_file_handle.write(curr_sentence.replace(' \n ','\n')[1:])  
-        
-        sentence_counter =  sentence_counter + 1
-        
-    # close the final output file
-    op_file_handle.close()
+            if word not in tagger.known_words:
+                fold_result['unknown_count'] += 1
+                fold_result['unknown_correct_count'] += correct
 
-    # return token_count
-    return token_count
+    return fold_result
 
 ###############################################################################
-# End of viterbi_decode function
+# End of cross_validate_fold function
 ###############################################################################
 
 ###############################################################################
-# Function      : evaluate_tagging(tagging_op_file_name,  gold_std_file_name,
-#                 token_count)
-# Description   : This function calculates the overall accuracy of the tagging
-#                 done by comparison against manually tagged gold std file.
-#                 It also produces a confusion matrix to show percentage
-#                 of times a tag was wrongly tagged with another tag.
-# Arguments     : tagging_op_file_name - The name of file tagged by this
-#                                         program
-#                 gold_std_file_name - The name of manually tagged file
-#                 token_count - Total number of tokens tagged in test file 
-# Returns       : None.
+# Function      : cross_validate(train_lines, folds, tagger, processes)
+# Description   : This function does k-fold cross validation of a tagger on
+#                 the training file. The sentences of training file are 
+#                 split into k folds, and each fold is tagged by the tagger
+#                 trained on the other folds, in a separate process. It 
+#                 prints accuracy, accuracy of unknown words and tokens 
+#                 tagged per second of each fold and all folds together.
+#
+#                 Training file is counted only once. The counts of each 
+#                 fold are subtracted from the counts of all folds to get the
+#                 counts, which the tagger of that fold is trained on.
+# Arguments     : train_lines - An iterable of cleaned lines of training file
+#                 folds - Number of folds, k
+#                 tagger - An untrained Tagger object, having the options 
+#                          used for all folds
+#                 processes - Number of processes tagging the folds. If it is
+#                             None, it is the number of CPUs.
+# Returns       : A list of dict objects, as returned by cross_validate_fold,
+#                 for each fold.
 ###############################################################################
+def cross_validate(train_lines, folds, tagger, processes=None):
 
-def evaluate_tagging(tagging_op_file_name,  gold_std_file_name, \
-                    token_count):
+    sentences = split_train_sentences(train_lines)
+
+    if folds < 2 or folds > len(sentences):
+        raise ValueError("number of folds should be between 2 and %d" %\
+                         len(sentences))
 
     '''
-    Open tagging output and gold standard file and read lines from them and
-    close them.
+    Split the sentences into k folds of consecutive sentences and count
+    each of them.
     '''
+    fold_sentences_list = [sentences[i * len(sentences) // folds:\
+                           (i + 1) * len(sentences) // folds]\
+                           for i in range(folds)]
 
-    tag_op_file_handle = open(tagging_op_file_name,'r')
-    gold_std_file_handle = open(gold_std_file_name, 'r')
+    fold_counts_list = [get_hmm_counts(itertools.chain.from_iterable(\
+                        fold_sentences)) for fold_sentences in\
+                        fold_sentences_list]
 
-    tagged_lines = tag_op_file_handle.readlines()
-    gold_std_lines = gold_std_file_handle.readlines()
+    total_counts = add_hmm_counts(fold_counts_list)
 
-    tag_op_file_handle.close()
-    gold_std_file_handle.close()
-
-    if debug:
-        print token_count
+    fold_args_list = [(tagger, subtract_hmm_counts(total_counts,\
+                      fold_counts), fold_sentences) for fold_counts,\
+                      fold_sentences in zip(fold_counts_list,\
+                      fold_sentences_list)]
 
     '''
-    Iterate over the tagged_lines and gold_std_line to search for
-    wrongly tagged tags. If a tag is incorrectly tagged, then the correct tag 
-    from gold std. file and wrong tag from tagging output file will be found
-    and put into a pair. This pair will be the keys in a dict object called
-    as confusion_matrix_dict. The values for these keys in the dict will be
-    the number of times the incorrect tagging is observed for the key pair.
+    Tag the folds in separate processes. The results are returned in the
+    sequence of folds.
     '''
-    # initialize the confusion_matrix_dict 
-    confusion_matrix_dict = {}
+    if processes is None:
+        processes = multiprocessing.cpu_count()
 
-    # maintain a counter to store the total number of incorrect tags
-    incorrect_tags_count = 0
+    processes = min(processes, folds)
 
-    for i in range(0, len(tagged_lines)):
-        if debug:
-            print tagged_lines[i]
-            print gold_std_lines[i]
+    start_time = time.time()
 
-        # strip sq. brackets from the contents of tagged_lines & gold_std_lines
-        tag_line = tagged_lines[i].replace('[','').replace(']','')
-        gold_line = gold_std_lines[i].replace('[','').replace(']','') 
-        
-        if debug:
-            print tag_line
-            print gold_line
-        
-        '''
-        Split the tag_line and gold_line by white spaces to get only word-tag
-        pairs
-        '''
-        word_tag_pair_1 = tag_line.split()
-        word_tag_pair_2 = gold_line.split()
-
-        if debug:
-            print word_tag_pair_1
-            print word_tag_pair_2
-        '''
-        Iterate over these word_tag_pairs and split them by last '/' to 
-        separate tags from words. Then compare these tags to find out
-        incorrect tagging.
-        '''
-        for j in range(0,len(word_tag_pair_1)):
-            tag1 = word_tag_pair_1[j].rsplit('/', 1)[1]
-            tag2 = word_tag_pair_2[j].rsplit('/', 1)[1].split('|')[0]
-
-            if debug:
-                if tag1 not in unique_tags or tag2 not in unique_tags:
-                    print word_tag_pair_1
-                    print word_tag_pair_2
-                    print word_tag_pair_1[j].rsplit('/')
-                    print word_tag_pair_2[j].rsplit('/')
-                    print tag1 
-                    print tag2
-   
-            '''
-            If the two tags are not same then insert this occurrence them into
-            the confusion_matrix dict object
-            '''
-            if tag1 != tag2:
-               
-                if (tag1,tag2) not in confusion_matrix_dict.keys():
-                    
-                    confusion_matrix_dict[(tag1, tag2)] = 1
-                
-                else:
-                    confusion_matrix_dict[(tag1, tag2)] =\
-                        confusion_matrix_dict[(tag1, tag2)] + 1
-                
-                incorrect_tags_count = incorrect_tags_count + 1
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        fold_results = pool.map(cross_validate_fold, fold_args_list)
+        pool.close()
+        pool.join()
+    else:
+        fold_results = map(cross_validate_fold, fold_args_list)
 
-    '''
-    Print overall accuracy.
-    '''
-    print float(100) -((float(incorrect_tags_count) / float(token_count)) *100)
-    
+    elapsed_seconds = time.time() - start_time
 
     '''
-    Get all the tags which appear in confusion_matrix dict. These tags only
-    will be displayed in rows and columns of evaluation output. 
-    These tags will be stored in a list tags_list.
+    Print the results of each fold, and then of all folds together. The
+    accuracy is also given as mean and standard deviation of the accuracies
+    of folds.
     '''
-    tags_list = [] 
+    accuracies = []
+
+    for i, fold_result in enumerate(fold_results):
+
+        accuracies.append(100.0 * fold_result['correct_count'] /\
+                          max(fold_result['token_count'], 1))
+
+        print "Fold %d: %.4f%% of %d, unknown words: %.4f%% of %d,"\
+              " %.0f tokens/sec" % (i + 1, accuracies[-1],\
+              fold_result['token_count'],\
+              100.0 * fold_result['unknown_correct_count'] /\
+              max(fold_result['unknown_count'], 1),\
+              fold_result['unknown_count'],\
+              fold_result['token_count'] /\
+              max(fold_result['tag_seconds'], 1e-9))
+
+    total_result = dict((name, sum(fold_result[name] for fold_result in\
+                        fold_results)) for name in fold_results[0])
+
+    mean_accuracy = sum(accuracies) / len(accuracies)
+    accuracy_deviation = math.sqrt(sum((accuracy - mean_accuracy) ** 2\
+                                   for accuracy in accuracies) /\
+                                   len(accuracies))
+
+    print "All folds: %.4f%% of %d (mean %.4f%%, std. dev. %.4f%%),"\
+          " unknown words: %.4f%% of %d" % (100.0 *\
+          total_result['correct_count'] / max(total_result['token_count'],\
+          1), total_result['token_count'], mean_accuracy,\
+          accuracy_deviation, 100.0 * total_result['unknown_correct_count']\
+          / max(total_result['unknown_count'], 1),\
+          total_result['unknown_count'])
+
+    print "%.0f tokens/sec per process, %.0f tokens/sec with %d processes"\
+          % (total_result['token_count'] /\
+          max(total_result['tag_seconds'], 1e-9),\
+          total_result['token_count'] / max(elapsed_seconds, 1e-9),\
+          processes)
+
+    return fold_results
 
-    for tag in confusion_matrix_dict.keys():
-        
-        if tag[0] not in tags_list:
-            tags_list.append(tag[0])
-        
-        if tag[1] not in tags_list:
-            tags_list.append(tag[1])
+###############################################################################
+# End of cross_validate function
+###############################################################################
 
-    if  debug:
-        print tags_list
-        print len(tags_list)
+###############################################################################
+# Function      : report_pruning_curve(hmm_counts, tagger, min_word_counts,
+#                                      test_file_name, gold_std_file_name)
+# Description   : This function shows how the size and accuracy of a tagger
+#                 change with pruning of rare words (see prune_hmm_counts). 
+#                 For each least count of known words, it trains the tagger
+#                 on the counts of training file, tags the test file and
+#                 evaluates it against gold std. file. It prints the size of 
+#                 model and accuracy for each count, and writes them into
+#                 "pruning_curve.csv" file.
+# Arguments     : hmm_counts - Counts of training file, as returned by
+#                              get_hmm_counts
+#                 tagger - A Tagger object, having the options used for all
+#                          counts
+#                 min_word_counts - List of least counts of known words
+#                 test_file_name - Name of test file
+#                 gold_std_file_name - Name of gold std. file
+# Returns       : A list of dict objects, one for each count, having the
+#                 description of model as given by Tagger.get_model_info, 
+#                 number of word-tag pairs in tag dictionary, and accuracy
+#                 of all, known and unknown words.
+###############################################################################
+def report_pruning_curve(hmm_counts, tagger, min_word_counts, test_file_name,\
+                         gold_std_file_name):
 
-    '''
-    Iterate over the tags_list and start printing confusion matrix.
-    Calculate the percentage errors for each tag pair in confusion_matrix dict
-    to display it in output. The output will be stored as a .csv file.
-    Python provides an elegant csv module for creation of csv file. I have
-    found that csv is an easiest way to get table like pretty printing of
-    confusion matrix. The usage of csv module was learnt from an answer
-    to a question on stackoverflow forum. It can be found here:
+    curve = []
 
-    http://stackoverflow.com/questions/2084069/create-a-csv-file-with-values-
-    from-a-python-list
+    for min_word_count in min_word_counts:
 
-    I have followed the code in answer by stackoverflow user vy32.
+        tagger.min_word_count = min_word_count
+        tagger.train_from_counts(hmm_counts)
 
-    Python lists can directly be written into a csv file. So, form the list 
-    that will represent the confusion matrix along with table row and col
-    header.
-    '''
-    csv_list = []
+        viterbi_decode(test_file_name, tagger)
+        report = evaluate_tagging("tagging-output", gold_std_file_name,\
+                                  tagger.known_words)
 
-    col_header = [' ']
+        point = tagger.get_model_info()
+        point['word_tag_pairs'] = len(tagger.hmm_counts['word_tag_freq'])
 
-    # Iterate over tags_list to get the tags as table col headers 
+        for name in ('accuracy', 'known_accuracy', 'unknown_accuracy'):
+            point[name] = report[name]
 
-    for tag in tags_list:
-        col_header.append(tag)
+        curve.append(point)
 
-    # create csv file
-    out = csv.writer(open("conf_matrix.csv","w"), delimiter=',')
-    
-    if debug:
-        print confusion_matrix_dict
-        print col_header
+    print "\n%-15s %12s %15s %15s %10s %10s %10s" % ('min_word_count',\
+          'known_words', 'word_tag_pairs', 'snapshot_bytes', 'accuracy',\
+          'known', 'unknown')
 
-    out.writerow(col_header)
+    for point in curve:
+        print "%-15d %12d %15d %15d %9.4f%% %9.4f%% %9.4f%%" %\
+              (point['min_word_count'], point['known_words'],\
+               point['word_tag_pairs'], point['snapshot_bytes'],\
+               point['accuracy'], point['known_accuracy'],\
+               point['unknown_accuracy'])
 
-    row_data = []
-    # iterate over the tags_list to get table row headers and data
-    for i in range(0,len(tags_list)):
-        row_data = [tags_list[i]]
-        for j in range(0,len(tags_list)):
-            try:
-                row_data.append((float(\
-                          confusion_matrix_dict[(tags_list[j],tags_list[i])])/\
-                            float(incorrect_tags_count))*float(100))
-            except KeyError:
-                row_data.append('-')
+    csv_file_handle = open("pruning_curve.csv", "w")
+    out = csv.writer(csv_file_handle)
+    out.writerow(curve[0].keys())
 
-        out.writerow(row_data) 
-    if debug:
-        print incorrect_tags_count
-        print csv_list
+    for point in curve:
+        out.writerow(point.values())
+
+    csv_file_handle.close()
+
+    return curve
 
 ###############################################################################
-# End of viterbi_decode function
+# End of report_pruning_curve function
 ###############################################################################
 
 ###############################################################################
-# Function      : get_unique_words(file_name, file_ind_flg)
-# Description   : This function finds the unique words / types from the file
-#                 which is passed as param to it. 
-# Arguments     : file_name - Name of the file from which unique words are to 
-#                             be found
-#                 file_ind_flg - A flag indicating whether unique words are 
-#                                to be found from training or test file. It
-#                                has two valid values viz 'tr' for training
-#                                file and 'ts' for test file. 
-# Returns       : A list of unique words from the file
+# Function      : get_unknown_word_tag(word)
+# Description   : This function finds the tag of an unknown word i.e. a word
+#                 which is not there in training file. Unknown words cannot be
+#                 tagged by using training file. So, for tagging them, I am 
+#                 using my own rule based approach, which I have devised by
+#                 segregating unknown words myself and then checking their 
+#                 tags in gold std file manually. The rules, I have used are:
+#
+#                 a) First check if the word is a symbol like =, then assign
+#                    SYM tag to it.
+#
+#                 b) If a word is present in a predefined particles' list, 
+#                    then assign RP tag. This list is taken from Section 5.1
+#                    of the Jurafsky Martin Text "Speech and Language 
+#                    Processing", which is in turn taken from the Quirk et
+#                    al. (1985) paper:
+#
+#                    "A Comprehensive Grammar of the English Language"
+#
+#                 c) If word has at least one numeric character, then check:
+#                    i) If word has at least one alphabetic character, then
+#                       assign JJ tag.
+#                    ii) Else assign CD tag
+#            
+#                 d) Then check if word starts with a capital letter:
+#                    i) If not, then check:
+#                       * If word ends with 'ing' then assign VBG tag.
+#                       * If word ends with 'ed' then assign VBN tag.
+#                       * If word ends with 's' then assign NNP tag.
+#                       * If word ends with 'ly', then assign RB tag. 
+#                    ii) If word starts with a capital letter, then check:
+#                       * If word is a single letter, then check:
+#                         # if word is 'C', then assign CC tag.
+#                         # else assign DT tag. 
+#                       * Else if word ends with 's' then assign NNP tag.
+#            
+#                 e) If word does not satisfy any of above criteria, assign 
+#                    NNP tag. 
+# Arguments     : word - The unknown word
+# Returns       : The tag of the word.
 ###############################################################################
+def get_unknown_word_tag(word):
+
+    particles_list =  ["aboard", "about", "above", "across", "ahead", 
+                       "alongside", "apart", "around", "aside", "astray", 
+                       "away", "back", "before", "behind", "below", 
+                       "beneath", "besides", "between", "beyond", "by", 
+                       "close", "down", "east", "west", "south", "north",
+                       "eastwards", "westwards", "southwards", 
+                       "northwards", "forward", "forwards", "home", "in", 
+                       "inside", "instead", "near", "off", "on", 
+                       "opposite", "out", "outside", "over", "overhead", 
+                       "past", "round", "since", "through", "throughout", 
+                       "together", "under", "underneath", "up", "within", 
+                       "without"] 
+
+    if word == '=':
+        return 'SYM'
+
+    if word in particles_list:
+        return 'RP'
+
+    if re.search(r'[0-9]', word) is not None:
+        
+        if re.search(r'[a-z A-Z]', word) is not None:
+            return 'JJ'
+        else:
+            return 'CD'
 
-def get_unique_words(file_name, file_ind_flg):
-
-    
-    # open the file in read mode
-    file_handle = open(file_name, 'r')
-    
-    # read all lines from the file into a list
-    lines_list = file_handle.readlines()
-
-    # close the file
-    file_handle.close() 
+    if word[0].islower():
+        
+        if word.endswith('ing'):
+            return 'VBG' 
+        
+        if word.endswith('ed'):
+            return 'VBN'
+        
+        if word.endswith('s'):
+            return 'NNP'
+        
+        if word.endswith('ly'):
+            return 'RB'
+    else:
+        
+        if len(word) == 1:
 
-    if debug: 
-        print lines_list    
+            if word == 'C':
+                return 'CC' 
+            else:
+                return 'DT' 
+                            
+        elif word.endswith('s'):
+            return 'NNP' 
 
-    # initialize a list to store unique words
-    unique_words = []
-     
-    # iterate over the lines_list to get the words from file 
-    for line in lines_list:
+    return 'NNP' 
 
-        # convert multi space characters from each line to a single space
-        line = " ".join(line.split())    
-        
-        '''
-        Separate the contents of each line by single space. This will
-        give us word-tag pairs, if the training file is being processed. Else,
-        it will give us just the words, if test file.
-        '''
+###############################################################################
+# End of get_unknown_word_tag function
+###############################################################################
 
-        contents_list = line.split(" ")
+###############################################################################
+# Function      : get_cmd_line_option(option_name, default_value,
+#                                     optional_args)
+# Description   : This function finds the value of an optional command line
+#                 argument. Optional arguments are given after the training,
+#                 test and gold std. file names, or after number of folds and
+#                 training file name for cross validation e.g. -engine trigram
+# Arguments     : option_name - Name of the option, like '-engine'
+#                 default_value - Value to be returned if option is not given.
+#                                 If it is None, the option is treated as a
+#                                 flag and True/False is returned for it.
+#                 optional_args - List of optional arguments, for programs
+#                                 having other inputs than this program. 
+#                                 If it is None, they are found from 
+#                                 sys.argv as described above.
+# Returns       : The value of the option.
+###############################################################################
+def get_cmd_line_option(option_name, default_value, optional_args=None):
 
-        if debug:
-            print contents_list
-        
-        # iterate over the contents list to get words
-        for content in contents_list:
+    # optional arguments start after -tr, -ts and -tk values, or -cv and -tr
+    if optional_args is None:
+        if sys.argv[1:2] == ['-cv']:
+            optional_args = sys.argv[5:]
+        else:
+            optional_args = sys.argv[7:]
 
-            '''
-            Separate words from tags from training file if it is being 
-            processed. The processing of training file 
-            (and not that of test file) can be checked from the file indicator 
-            flag passed as param to this function.
-            '''
-            
-            if file_ind_flg == 'tr':
-                word = content[:content.rfind('/', 1)]
-            else:
-                word = content
+    if option_name not in optional_args:
+        if default_value is None:
+            return False
+        return default_value
 
-            if debug:
-                print word
+    if default_value is None:
+        return True
 
-            # insert the word in unique_words list if it is not already in it
-            if word not in unique_words:
-                unique_words.append(word)
-    
-    if debug:
-        print unique_words
-        print len(unique_words)
-    
-    return unique_words
+    return optional_args[optional_args.index(option_name) + 1]
 
 ###############################################################################
-# End of get_unique_words function
+# End of get_cmd_line_option function
 ###############################################################################
 
 ###############################################################################
@@ -1910,6 +5839,8 @@ def get_unique_words(file_name, file_ind_flg):
 # Returns       : None.
 ###############################################################################
 def main():
+
+    global profile_stages, log_sentence_interval, dump_intermediates
     
     '''
     Check if any command line argument is passed to program. If not 
@@ -1917,291 +5848,235 @@ def main():
     '''
 
     if (len(sys.argv) > 1):
-        if debug:
-            print "At least one parameter passed to program !"
 
         '''
         Get the values for test, training and gold std. file from sys.argv 
         command line arguments and store them into different variables.
         '''
 
-        train_file_name = sys.argv[2]
-        test_file_name = sys.argv[4]
-        gold_std_file_name = sys.argv[6]
-
-        if debug:
-            print train_file_name
-            print test_file_name
-
-                
         '''
-        First make copies of training and test files. These copies will be 
-        used for any processing subsequently. This way original contents of 
-        training and test files will be retained. 
-        
-        We will make three copies of test file. First copy will be used for 
-        application of viterbi algo. to it. Second copy will be used
-        to prepare the final output file. And third copy will be used
-        in finding unknown words.
+        If first argument is -cv, then the program does k-fold cross 
+        validation on the training file, and only its name is given after 
+        the number of folds.
+        '''
+        if sys.argv[1] == '-cv':
+            cross_validation_folds = int(sys.argv[2])
+            train_file_name = sys.argv[4]
+        else:
+            cross_validation_folds = 0
+            train_file_name = sys.argv[2]
+            test_file_name = sys.argv[4]
+            gold_std_file_name = sys.argv[6]
 
-        For copying the files, call create_copy function. The names of 
-        copy files returned from create_copy function will be stored in
-        separate variables.
         '''
-        
-        train_copy_file = create_copy(train_file_name)
-        test_copy_file =  create_copy(test_file_name)
-        test_copy_file_1 =  create_copy(test_copy_file)
-        test_copy_file_2 =  create_copy(test_copy_file_1) 
-        
+        Log the information at the level given by -log-level, which is 
+        WARNING by default. Sentences are logged at DEBUG level every 
+        -log-every sentences.
         '''
-        Start cleaning the training and test files. 
+        logging.basicConfig(level=getattr(logging, get_cmd_line_option(\
+                            '-log-level', 'warning').upper()),\
+                            format='%(asctime)s %(levelname)s %(name)s:'\
+                            ' %(message)s')
+        log_sentence_interval = int(get_cmd_line_option('-log-every', '100'))
 
-        Cleaning process will remove all opening and closing square brackets 
-        from files, which are significant only for identifying phrases 
-        and which not considered here for POS-tagging. 
-        
-        Removing square brackets will facilitate the process of
-        parsing files in subsequent processing. For cleaning, 
-        a function "clean_file" will be called. The name of training and test
-        files will be passed as param to this function. Here, only third copy
-        of test file will be cleaned, as it is used in finding unknown words.
-        Rest two copies of word file are not cleaned.
         '''
-
-        clean_file(train_copy_file)
-        clean_file(test_copy_file_2)
-
+        If -profile flag is given, each stage of the program is also 
+        profiled into files named after the stage, by timed_stage function.
         '''
-        Find out the words from training file which are not there in test file.
-        These are termed as unknown words. Unknown words cannot be tagged by
-        using training file. So, for tagging them, I am using my own rule based
-        approach, which I have devised by segregating unknown words myself and 
-        then checking their tags in gold std file manually. The rules, I have 
-        used are:
+        profile_stages = get_cmd_line_option('-profile', None)
 
-        1) First find out the unique words from both training and test file
-        to decide the unknown words.
+        # -dump-intermediates flag writes intermediate files for debugging
+        dump_intermediates = get_cmd_line_option('-dump-intermediates', None)
 
-        2) Tag the unknown words based upon this logic:
+        '''
+        Serve the metrics of tagging in Prometheus text format on the local
+        port given by -metrics-port, and write them into the file given by
+        -metrics-file every -metrics-interval seconds and at the end.
+        '''
+        metrics_port = int(get_cmd_line_option('-metrics-port', '0'))
 
-            a) First check if the word is a symbol like =, then assign SYM tag
-            to it.
+        if metrics_port:
+            tagger_metrics.start_http_server(metrics_port)
 
-            b) If a word is present in a predefined particles' list, then 
-            assign RP tag. This list is taken from Section 5.1 of the
-            Jurafsky Martin Text "Speech and Language Processing", which
-            is in turn taken from the Quirk et al. (1985) paper:
+        metrics_file_name = get_cmd_line_option('-metrics-file', '')
 
-            "A Comprehensive Grammar of the English Language"
+        if metrics_file_name:
+            tagger_metrics.start_file_dump(metrics_file_name,\
+                float(get_cmd_line_option('-metrics-interval', '10')))
 
-            c) If word has at least one numeric character, then check:
-                i) If word has at least one alphabetic character, then assign
-                   JJ tag.
-                
-                ii) Else assign CD tag
-            
-            d) Then check if word starts with a capital letter:
-                i) If not, then check:
-                    * If word ends with 'ing' then assign VBG tag.
-                    * If word ends with 'ed' then assign VBN tag.
-                    * If word ends with 's' then assign NNP tag.
-                    * If word ends with 'ly', then assign RB tag. 
-
-                ii) If word starts with a capital letter, then check:
-                    * If word is a single letter, then check:
-                       # if word is 'C', then assign CC tag.
-                       # else assign DT tag. 
-                    * Else if word ends with 's' then assign NNP tag.
-                    * Else assign NNS tag
-            
-            e) If word does not satisfy any of above criteria, assign NNP tag. 
         '''
+        The training and test files are only read by this program, never 
+        changed, so no copies of them are made.
 
-        '''
-        Get unique words from the training and test files. For this, call 
-        get_unique_words() function. It takes two parameters:
+        Start cleaning the training file. 
 
-        1) Name of the copy of training or third copy of test file
-        2) A flag indicating whether unique words are to be found in training
-        or test file. This flag is required as training file has different 
-        structure than test file. So, they require a little different kind of
-        parsing while getting unique words from them. Training file differs in
-        structure from the test file because it has both words and tags while
-        test file only has words.
-        This flag will have value as 'tr' for training file while it has value
-        as 'ts' for test file.
+        Cleaning process will remove all opening and closing square brackets 
+        from lines of training file, which are significant only for 
+        identifying phrases and which not considered here for POS-tagging. 
+        
+        Removing square brackets will facilitate the process of
+        parsing files in subsequent processing. For cleaning, 
+        a function "clean_lines" will be called. The training file handle
+        will be passed as param to this function. The viterbi algo. is 
+        applied to the test file as it is.
 
-        This function returns the list of unique words from the passed as param
-        to it.
+        If optional -dump-intermediates flag is given, the cleaned lines are
+        also written into a file with name of training file appended with 
+        '.clean', for debugging.
         '''
 
-        unique_train_words = get_unique_words(train_copy_file, 'tr')
-        unique_test_words = get_unique_words(test_copy_file_2, 'ts')
-        
-        # create a list to store unknown words
+        with timed_stage('clean'):
+            train_file_handle = open_file(train_file_name)
+            train_lines = list(clean_lines(train_file_handle))
+            train_file_handle.close()
 
-        unknown_words =  []
+        dump_intermediate(train_file_name + '.clean', train_lines)
 
         '''
-        Iterate over the unique_train_words and unique_test_words to find 
-        unknown words.
+        Create a Tagger object, which does the actual work of this program.
+        It is given the following optional arguments:
+
+        1) -smoothing and -k: The smoothing for tag transition probabilities
+        2) -engine: The decoder used for tagging:
+           a) bigram - first order viterbi's algorithm (default). For 
+              sentences having more than -max-lattice-cells words x tags, 
+              it keeps path probs of only some words as checkpoints, as
+              many as fit along with backpointers of the words between 
+              two of them.
+           b) trigram - second order viterbi's algorithm over tag pairs, 
+              using tag dictionary and a beam (given by optional -beam 
+              argument) to prune the lattice.
+           c) posterior - forward-backward algorithm, which picks the tag 
+              with highest marginal probability for each word and also 
+              writes that probability as confidence of the tag.
+           d) kbest - k-best bigram viterbi's algorithm, which also writes 
+              the k (given by optional -kbest argument) most probable tag 
+              sequences of each sentence with their log probabilities.
+        3) -no-unknown-constraints: Do not fix the tags of unknown words 
+           before decoding, e.g. to get the confidence of tags of unknown 
+           words from posterior decoder. By default they are fixed, so that
+           the decoder can use them for tagging their neighbours.
+        4) -quantize: Number of bits (8 or 16) of quantized log 
+           probabilities of the tables used by decoders. By default they are
+           not quantized.
+        5) -min-word-count: Words of training file seen less than these 
+           many times are left out of the HMM and tagged as unknown words.
+           By default all words are kept.
         '''
-        
-        for word in unique_test_words:
-            if word not in unique_train_words:
-                unknown_words.append(word)
-                
-        if debug:
-            print unknown_words
-            print len(unknown_words)
-            for word in unknown_words:
-                print word
-    
-        '''
-        Iterate over the unknown words list to apply above mentioned rules to
-        get their tags. The mapping of unknown words to their tags will be 
-        stored in a dict object. Also make a list to store predefined 
-        particles.
-        '''
-        unknown_word_tags_mapping = collections.OrderedDict()
-
-        particles_list =  ["aboard", "about", "above", "across", "ahead", 
-                           "alongside", "apart", "around", "aside", "astray", 
-                           "away", "back", "before", "behind", "below", 
-                           "beneath", "besides", "between", "beyond", "by", 
-                           "close", "down", "east", "west", "south", "north",
-                           "eastwards", "westwards", "southwards", 
-                           "northwards", "forward", "forwards", "home", "in", 
-                           "inside", "instead", "near", "off", "on", 
-                           "opposite", "out", "outside", "over", "overhead", 
-                           "past", "round", "since", "through", "throughout", 
-                           "together", "under", "underneath", "up", "within", 
-                           "without"] 
-
-        # Apply rules to unknown words to find out their tags
-        for word in unknown_words:
-            
-            if word == '=':
-                unknown_word_tags_mapping[word] = 'SYM'
-                continue
-
-            if word in particles_list:
-                unknown_word_tags_mapping[word] = 'RP'
-                continue
+        tagger = Tagger(get_cmd_line_option('-smoothing', 'witten-bell'),\
+                 float(get_cmd_line_option('-k', '1.0')),\
+                 get_cmd_line_option('-engine', 'bigram'),\
+                 int(get_cmd_line_option('-kbest', '5')),\
+                 float(get_cmd_line_option('-beam', '1000')),\
+                 int(get_cmd_line_option('-max-lattice-cells', '1000000')),\
+                 not get_cmd_line_option('-no-unknown-constraints', None),\
+                 int(get_cmd_line_option('-quantize', '0')) or None,\
+                 int(get_cmd_line_option('-min-word-count', '1')))
 
-            if re.search(r'[0-9]', word) is not None:
-                
-                if re.search(r'[a-z A-Z]', word) is not None:
-                    unknown_word_tags_mapping[word] = 'JJ'
-                    continue
-                else:
-                    unknown_word_tags_mapping[word] = 'CD'
-                    continue
-
-            if word[0].islower():
-                
-                if word.endswith('ing'):
-                    unknown_word_tags_mapping[word] = 'VBG' 
-                    continue
-                
-                if word.endswith('ed'):
-                    unknown_word_tags_mapping[word] = 'VBN'
-                    continue
-                
-                if word.endswith('s'):
-                    unknown_word_tags_mapping[word] = 'NNP'
-                    continue
-                
-                if word.endswith('ly'):
-                    unknown_word_tags_mapping[word] = 'RB'
-                    continue
-            else:
-                
-                if len(word) == 1:
-
-                    if word == 'C':
-                        unknown_word_tags_mapping[word] = 'CC' 
-                        continue
-                    else:
-                        unknown_word_tags_mapping[word] = 'DT' 
-                        continue
-                                    
-                elif word.endswith('s'):
-                    unknown_word_tags_mapping[word] = 'NNP' 
-                    continue
-                
+        '''
+        For cross validation, the tagger is trained on the folds of training
+        file in cross_validate function, using given number of -processes.
+        '''
+        if cross_validation_folds:
+            with timed_stage('cross-validation'):
+                cross_validate(train_lines, cross_validation_folds, tagger,\
+                               int(get_cmd_line_option('-processes', '0'))\
+                               or None)
 
-            unknown_word_tags_mapping[word] = 'NNP' 
-            
+            if get_cmd_line_option('-timings', None):
+                print_stage_times()
+            return
 
         '''
         Start building HMM for the given training file. For this, We need to 
         create tag transition probabilities matrix and observation likelihood 
         Probabilities matrix from the words and tags present in the training 
-        file. Call function "form_HMM" for this. The cleaned training copy file
-        will be passed as param to this function.
+        file. Tagger counts the words and tags of training file by calling
+        function "get_hmm_counts", forms the matrices from the counts by 
+        calling "form_HMM", and then builds the tables used by decoders from
+        these matrices.
+
+        Words of test file, which are not there in training file, are termed
+        as unknown words. Unknown words cannot be tagged by using training 
+        file, so Tagger tags them by my own rule based approach, given in 
+        get_unknown_word_tag function.
+        '''
+        tagger.train_from_lines(train_lines)
 
-        This function returns following variables:
+        # if -save option is given, save the trained tagger into the file
+        save_file_name = get_cmd_line_option('-save', '')
 
-        1) A dict object specifying tag transition probabilities for HMM
-        2) A dict object specifying observation likelihood for HMM
-        3) A list of all unique tags 
+        if save_file_name:
+            tagger.save(save_file_name)
 
         '''
-        
-        tag_transition_prob_matrix, word_tag_obs_lkhd_dict, unique_tags\
-                                            = form_HMM(train_copy_file)
-        
-        '''
-        Start POS tagging of test file. For this, viterbi's algorithm will be
-        used. I am going to use the viterbi's algorithm as mentioned in 
-        Section 5.5 of Jurafsky and Martin textbook 
-        "Speech and Language Processing".
+        If -prune-curve flag is given with comma separated least counts of
+        known words, report the size and accuracy of tagger for each of them
+        instead of tagging the test file once.
         '''
-        
+        min_word_counts = get_cmd_line_option('-prune-curve', '')
+
+        if min_word_counts:
+            with timed_stage('prune-curve'):
+                report_pruning_curve(get_hmm_counts(train_lines), tagger,\
+                    [int(count) for count in min_word_counts.split(',')],\
+                    test_file_name, gold_std_file_name)
+
+            if get_cmd_line_option('-timings', None):
+                print_stage_times()
+            return
+
         '''
-        Before actual POS tagging, preprocess the test file. Preprocessing
-        will replace all newline characters from the test copy file with 
-        a space.
-        
-        This way all sentences in the test file will appear in a single line.
-        
-        For preprocessing, call preprocess_file() function. This function
-        takes name of the test file as input and preprocesses it.
+        If -bench flag is given, also print tokens decoded per second by
+        all decoders on the test file.
         '''
-
-        preprocess_file(test_copy_file)
+        if get_cmd_line_option('-bench', None):
+            benchmark_decoders(test_file_name, tagger.get_decoders(),\
+                               tagger.clear_cache)
 
         '''
         Call a function viterbi_decode() to do actual POS-tagging for the
-        preprocessed file. This function applies the viterbi algorithm to
-        get the tags for words in test file. 
+        test file. This function applies the decoder of tagger to get the 
+        tags for words in test file. 
 
         This function takes following argument:
         
-        1) The name of test file (preprocessed test copy here)
-        2) List of unique tags
-        3) Observation likelihood prob matrix for HMM
-        4) Tag transition prob matrix for HMM
-        5) A second copy of original test file, created earlier, which is not
-        preprocessed at all. It will be used to prepare final output file
-        for the program.
-        6) A dict object containing mapping of unknown words with their tags
-        decided by rule based approach above.
+        1) The name of test file. It is read only once, sentence by 
+        sentence, and the words of each sentence are tagged and written into
+        final output file in the same layout as test file.
+        2) The tagger
+        3) Tags fixed for words of test file, read from the file given by
+        optional -constraints argument.
+        4) Number of processes decoding the sentences in parallel, given by
+        optional -processes argument.
+        5) Compression of output files, given by optional -compress-output
+        argument.
 
         This function writes the POS tag for each word in the test file.
         And writes the tagged text into final output file called as 
         "tagging-output".
 
-        It returns the total number of tokens/ words tagged by tagger, which
-        is used in evaluation later.
+        It returns the total number of tokens/ words tagged by tagger.
         '''
-        token_count = viterbi_decode(test_copy_file, unique_tags,\
-                      word_tag_obs_lkhd_dict,\
-                      tag_transition_prob_matrix, test_copy_file_1,\
-                      unknown_word_tags_mapping)        
-       
+        constraints_file_name = get_cmd_line_option('-constraints', '')
+
+        if constraints_file_name:
+            sentence_constraints = read_constraints_file(\
+                                   constraints_file_name, tagger.unique_tags)
+        else:
+            sentence_constraints = None
+
+        output_compression = get_cmd_line_option('-compress-output', '')
+
+        if output_compression and output_compression not in\
+           dict(COMPRESSIONS):
+            raise ValueError("unknown compression: " + output_compression)
+
+        with timed_stage('decode'):
+            viterbi_decode(test_file_name, tagger, sentence_constraints,\
+                           int(get_cmd_line_option('-processes', '1')),\
+                           output_compression)
+
         '''
         Now that we have our tagged file "tagging-output", compare it against
         the gold std file to assess overall accuracy of our POS-tagging.
@@ -2209,18 +6084,39 @@ def main():
         It takes following parameters:
         1) Name of the tagging output file
         2) Name of gold std file
-        3) Total number of tokens in the test file
+        3) Words of training file, to find accuracy of known and unknown
+        words separately
+        4) Description of the model of tagger, e.g. its quantization and 
+        size of its snapshot, to be reported along with the accuracy
+
+        This function reads both files together word by word and calculates
+        overall accuracy of the tagging over the words of gold std. file, 
+        counting the words which could not be aligned as incorrect. It 
+        reports the words which could not be aligned, if any. It
+        also outputs the confusion matrix, which shows the percentage of 
+        times a tag is wrongly tagged with other tag, along with counts of
+        all tag pairs, precision, recall and F1 of each tag and a JSON 
+        report having all of these.
+        '''
 
-        This function calculates overall accuracy of the tagging and also
-        outputs the confusion matrix, which shows the percentage of times
-        a tag is wrongly tagged with other tag.
+        with timed_stage('evaluate'):
+            evaluate_tagging("tagging-output" + ('.' + output_compression\
+                             if output_compression else ''),\
+                             gold_std_file_name, tagger.known_words,\
+                             model_info=tagger.get_model_info())
+
+        '''
+        If -timings flag is given, print the time taken by each stage of
+        the program.
         '''
-        evaluate_tagging("tagging-output",  gold_std_file_name, token_count)
+        if get_cmd_line_option('-timings', None):
+            print_stage_times()
+
+        if metrics_file_name:
+            tagger_metrics.write_file(metrics_file_name)
 
     else:
-        if debug:
-            print "No parameter passed to the program !"
-    
+
         print "\n\tPlease provide proper inputs to the program !"
         print "\tSample usage: "
         print "\tpython Ngram_Modelling.py -tr postr -ts postst -tk poskey\n"
@@ -2234,8 +6130,15 @@ this program.
 '''
 
 if __name__ == '__main__':
- 
-    main()
+
+    '''
+    Run main() of this program imported as pos_tagging module, so that the
+    taggers saved by -save option are of pos_tagging.Tagger class, which 
+    other programs can load, instead of __main__.Tagger class.
+    '''
+    import pos_tagging
+
+    pos_tagging.main()
 
 ##############################################################################
 # End of pos_tagging.py program
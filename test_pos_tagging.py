@@ -0,0 +1,392 @@
+##############################################################################
+# Problem
+# Description       : This program has the regression tests of the POS-tagger
+#                     in pos_tagging.py.
+#
+# Usage             : python -m unittest test_pos_tagging
+#
+# Prog. Language    : Programming Language used for this program is Python
+#                     (Version 2.7.3).
+##############################################################################
+
+'''
+import statements to include Python's in-built module functionalities in the
+program
+'''
+# unittest module is used to write and run the tests
+import unittest
+
+# os, shutil and tempfile modules are used for files written by the tests
+import os
+import shutil
+import tempfile
+
+# mmap module is used to find the smallest part size for memory maps
+import mmap
+
+# pos_tagging module is the tagger being tested
+import pos_tagging
+
+'''
+Tagged sentences for training taggers in memory, and sentences of known and
+unknown words to be tagged by them.
+'''
+TRAIN_SENTENCES = [[('No', 'RB'), (',', ','), ('it', 'PRP'), ('was', 'VBD'),\
+                    ("n't", 'RB'), ('Black', 'NNP'), ('Monday', 'NNP'),\
+                    ('.', '.')],\
+                   [('But', 'CC'), ('the', 'DT'), ('market', 'NN'),\
+                    ('did', 'VBD'), ("n't", 'RB'), ('fall', 'VB'),\
+                    ('.', '.')],\
+                   [('The', 'DT'), ('stock', 'NN'), ('rose', 'VBD'),\
+                    ('on', 'IN'), ('Monday', 'NNP'), ('.', '.')],\
+                   [('It', 'PRP'), ('was', 'VBD'), ('a', 'DT'),\
+                    ('fall', 'NN'), ('.', '.')]]
+
+TEST_SENTENCES = [['No', ',', 'the', 'stock', 'did', "n't", 'fall', '.'],\
+                  ['It', 'was', 'the', 'market', 'on', 'Black', 'Monday',\
+                   '.'],\
+                  ['The', 'Smith', 'stock', 'rose', '12', 'points', '.']]
+
+###############################################################################
+# Class         : TaggerTest
+# Description   : This class tests tagging by Tagger objects trained in
+#                 memory.
+###############################################################################
+class TaggerTest(unittest.TestCase):
+
+    ###########################################################################
+    # Function      : test_unknown_word_with_unseen_rule_tag(self)
+    # Description   : A tagger trained on a few sentences has not seen most
+    #                 tags given to unknown words by rule based approach.
+    #                 Each decoder should still tag such words with them.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_unknown_word_with_unseen_rule_tag(self):
+
+        for engine in pos_tagging.ENGINES:
+            tagger = pos_tagging.Tagger(engine=engine)
+            tagger.train([[('No', 'RB'), (',', ','), ('.', '.')]])
+
+            self.assertEqual(tagger.tag(['No', ',', 'Smith', '12', '.']),\
+                             ['RB', ',', 'NNP', 'CD', '.'])
+
+    ###########################################################################
+    # Function      : test_cache_counts_distinct_unknown_words(self)
+    # Description   : An unknown word repeated in a sentence should be 
+    #                 counted as one hit or miss of the cache of tags of 
+    #                 unknown words, but as an unknown word each time.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_cache_counts_distinct_unknown_words(self):
+
+        tagger = pos_tagging.Tagger()
+        tagger.train(TRAIN_SENTENCES)
+
+        counters = pos_tagging.tagger_metrics.counters
+        names = ('unknown_words_total', 'unknown_word_cache_hits_total',\
+                 'unknown_word_cache_misses_total')
+        start_counts = [counters[name] for name in names]
+
+        tagger.tag(['Smith', 'saw', 'Smith', '.'])
+        tagger.tag(['Smith', 'saw', 'Jones', '.'])
+
+        self.assertEqual([counters[name] - count for name, count in\
+                          zip(names, start_counts)], [6, 2, 3])
+
+    ###########################################################################
+    # Function      : test_kbest_sequences_stay_as_decoded(self)
+    # Description   : The tags decided after decoding, for unknown words and
+    #                 for constraints on tags not seen in training, should 
+    #                 only change the final tags, not the k best sequences 
+    #                 and their log probs.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_kbest_sequences_stay_as_decoded(self):
+
+        tagger = pos_tagging.Tagger(engine='kbest', kbest=2,\
+                                    constrain_unknown_words=False)
+        tagger.train([[('No', 'RB'), (',', ','), ('it', 'PRP'),\
+                       ('was', 'VBD'), ('.', '.')],\
+                      [('it', 'PRP'), ('rose', 'VBD'), ('.', '.')]])
+
+        observation_list = pos_tagging.get_observation_lists(['No', ',',\
+                           'Smith', 'was', '.'])[1]
+        constraints = {4: 'NN'}
+
+        decoded_kbest_list = tagger.run_decoder('kbest', observation_list,\
+                                                constraints)
+        observation_tags, confidences, kbest_list = tagger.decode(\
+            observation_list, constraints)
+
+        self.assertEqual(observation_tags[3:5], ['NNP', 'NN'])
+        self.assertEqual(len(kbest_list), 2)
+        self.assertEqual(kbest_list, decoded_kbest_list)
+
+    ###########################################################################
+    # Function      : test_added_counts_match_whole_file(self)
+    # Description   : Counts of parts of training file added together, and
+    #                 the counts of rest of the file left after subtracting 
+    #                 a part, should be the same as counting the file, except
+    #                 for tag trigrams spanning two parts.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_added_counts_match_whole_file(self):
+
+        train_lines = [' '.join('%s/%s' % pair for pair in sentence)\
+                       for sentence in TRAIN_SENTENCES]
+        counters = [name for name in pos_tagging.HMM_COUNTERS if\
+                    name != 'trigram_freq']
+
+        hmm_counts_list = [pos_tagging.get_hmm_counts([line]) for line in\
+                           train_lines]
+        total_counts = pos_tagging.add_hmm_counts(hmm_counts_list)
+        whole_counts = pos_tagging.get_hmm_counts(train_lines)
+
+        for name in counters:
+            self.assertEqual(total_counts[name], whole_counts[name])
+
+        rest_counts = pos_tagging.subtract_hmm_counts(total_counts,\
+                                                      hmm_counts_list[1])
+        whole_counts = pos_tagging.get_hmm_counts(train_lines[:1] +\
+                                                  train_lines[2:])
+
+        for name in counters:
+            self.assertEqual(rest_counts[name], whole_counts[name])
+
+    ###########################################################################
+    # Function      : test_kbest_first_sequence_is_viterbi(self)
+    # Description   : The best of k sequences found by k-best decoder should
+    #                 be the sequence found by bigram viterbi decoder.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_kbest_first_sequence_is_viterbi(self):
+
+        tagger = pos_tagging.Tagger(engine='kbest', kbest=3)
+        tagger.train(TRAIN_SENTENCES)
+
+        for sentence in TEST_SENTENCES:
+            observation_list = pos_tagging.get_observation_lists(\
+                               sentence)[1]
+            unknown_word_tags_mapping, constraints = \
+                tagger.get_sentence_constraints(observation_list)
+
+            kbest_list = tagger.run_decoder('kbest', observation_list,\
+                                            constraints)
+
+            self.assertEqual(kbest_list[0][1], tagger.run_decoder(\
+                             'bigram', observation_list, constraints))
+
+    ###########################################################################
+    # Function      : test_checkpointed_viterbi_is_viterbi(self)
+    # Description   : Bigram viterbi decoder should find the same tags for a
+    #                 long sentence, when it keeps only as many checkpoints
+    #                 and backpointers as fit in max_lattice_cells, and fail 
+    #                 when they cannot fit.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_checkpointed_viterbi_is_viterbi(self):
+
+        tagger = pos_tagging.Tagger(max_lattice_cells=None)
+        tagger.train(TRAIN_SENTENCES)
+
+        # a long "sentence" of test sentences without their periods
+        observation_list = pos_tagging.get_observation_lists([word for\
+                           sentence in TEST_SENTENCES * 50 for word in\
+                           sentence[:-1]] + ['.'])[1]
+        unknown_word_tags_mapping, constraints = \
+            tagger.get_sentence_constraints(observation_list)
+
+        observation_tags = tagger.run_decoder('bigram', observation_list,\
+                                              constraints)
+
+        tag_count = len(tagger.unique_tags)
+
+        for columns in (len(observation_list) - 1, 100, 64):
+            tagger.max_lattice_cells = columns * tag_count
+
+            self.assertEqual(tagger.run_decoder('bigram', observation_list,\
+                             constraints), observation_tags)
+
+        tagger.max_lattice_cells = 63 * tag_count
+
+        self.assertRaises(ValueError, tagger.run_decoder, 'bigram',\
+                          observation_list, constraints)
+
+    ###########################################################################
+    # Function      : test_marginal_probs_add_up_to_one(self)
+    # Description   : The marginal probabilities of tags of each word, found
+    #                 by forward-backward algorithm, should add up to 1 and
+    #                 the tags of words fixed by constraints should have all
+    #                 of it.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_marginal_probs_add_up_to_one(self):
+
+        tagger = pos_tagging.Tagger(engine='posterior')
+        tagger.train(TRAIN_SENTENCES)
+
+        for sentence in TEST_SENTENCES:
+            observation_list = pos_tagging.get_observation_lists(\
+                               sentence)[1]
+            unknown_word_tags_mapping, constraints = \
+                tagger.get_sentence_constraints(observation_list)
+
+            marginal_probs_list = pos_tagging.get_marginal_probs(\
+                observation_list, tagger.unique_tags,\
+                tagger.tag_trans_prob_table,\
+                tagger.tag_trans_prob_table_by_prev, tagger.tag_dictionary,\
+                constraints)
+
+            self.assertEqual(len(marginal_probs_list), len(observation_list))
+
+            for marginal_probs in marginal_probs_list:
+                self.assertAlmostEqual(sum(marginal_probs), 1.0)
+
+            for position, tag in constraints.iteritems():
+
+                # tags not seen in training are decided after decoding
+                if tag not in tagger.unique_tags:
+                    continue
+
+                self.assertAlmostEqual(marginal_probs_list[position][\
+                                       tagger.unique_tags.index(tag)], 1.0)
+
+    ###########################################################################
+    # Function      : test_mapped_sentences_match_line_sentences(self)
+    # Description   : Sentences read through memory maps should be the same
+    #                 as sentences read line by line, also when the file is 
+    #                 mapped in many small parts.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_mapped_sentences_match_line_sentences(self):
+
+        text = ''.join('[ %s ]\n%s ,\n\n  . \n' % (' '.join(sentence),\
+                       'x' * (i % 7)) for i, sentence in\
+                       enumerate(TEST_SENTENCES * 2000)) + 'last words'
+
+        temp_dir = tempfile.mkdtemp()
+        file_name = os.path.join(temp_dir, 'test.txt')
+        read_map_size = pos_tagging.read_map_size
+
+        try:
+            file_handle = open(file_name, 'wb')
+            file_handle.write(text)
+            file_handle.close()
+
+            file_handle = open(file_name, 'rb')
+            line_sentences = list(pos_tagging.read_line_sentences(\
+                                  file_handle))
+            file_handle.close()
+
+            for map_size in (read_map_size, mmap.ALLOCATIONGRANULARITY):
+                pos_tagging.read_map_size = map_size
+
+                file_handle = open(file_name, 'rb')
+                mapped_sentences = list(pos_tagging.read_mapped_sentences(\
+                                        file_handle))
+                file_handle.close()
+
+                self.assertEqual(mapped_sentences, line_sentences)
+
+            # the words and white space give back the whole file
+            self.assertEqual(''.join(''.join(space + word for space, word in\
+                             zip(spaces, words)) + spaces[-1] for words,\
+                             spaces in line_sentences), text)
+        finally:
+            pos_tagging.read_map_size = read_map_size
+            shutil.rmtree(temp_dir)
+
+    ###########################################################################
+    # Function      : test_misaligned_words_are_incorrect(self)
+    # Description   : Words of gold std. file which are missing in tagging
+    #                 output should be counted as misaligned and as 
+    #                 incorrect in overall accuracy, but not in accuracy of 
+    #                 aligned words.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_misaligned_words_are_incorrect(self):
+
+        temp_dir = tempfile.mkdtemp()
+        current_dir = os.getcwd()
+
+        try:
+            # the evaluation report is written in current directory
+            os.chdir(temp_dir)
+
+            file_handle = open('gold.txt', 'w')
+            file_handle.write('No/RB ,/, \n[ it/PRP ]\nwas/VBD ./. \n'\
+                              '[ The/DT stock/NN ]\nrose/VBD ./. \n')
+            file_handle.close()
+
+            # 'it' is missing and 'rose' is tagged wrongly
+            file_handle = open('output.txt', 'w')
+            file_handle.write('No/RB ,/, \nwas/VBD ./. \n'\
+                              '[ The/DT stock/NN ]\nrose/NN ./. \n')
+            file_handle.close()
+
+            report = pos_tagging.evaluate_tagging('output.txt', 'gold.txt',\
+                     known_words=set(['No', ',', 'was', '.', 'rose']))
+        finally:
+            os.chdir(current_dir)
+            shutil.rmtree(temp_dir)
+
+        self.assertEqual(report['token_count'], 8)
+        self.assertEqual(report['misaligned_gold_std_count'], 1)
+        self.assertAlmostEqual(report['accuracy'], 100.0 * 7 / 9)
+        self.assertAlmostEqual(report['aligned_accuracy'], 100.0 * 7 / 8)
+        self.assertEqual(report['known_count'] + report['unknown_count'], 9)
+        self.assertAlmostEqual(report['known_accuracy'], 100.0 * 5 / 6)
+        self.assertAlmostEqual(report['unknown_accuracy'], 100.0 * 2 / 3)
+
+    ###########################################################################
+    # Function      : test_quantized_tagger_save_and_load(self)
+    # Description   : A tagger with quantized tables should tag the same way
+    #                 after it is saved and loaded, for each decoder.
+    # Arguments     : None.
+    # Returns       : None.
+    ###########################################################################
+    def test_quantized_tagger_save_and_load(self):
+
+        temp_dir = tempfile.mkdtemp()
+        file_name = os.path.join(temp_dir, 'tagger.pkl')
+
+        try:
+            for engine in pos_tagging.ENGINES:
+                tagger = pos_tagging.Tagger(engine=engine,\
+                                            quantization_bits=8)
+                tagger.train(TRAIN_SENTENCES)
+
+                decoded = [tagger.decode(pos_tagging.get_observation_lists(\
+                           sentence)[1], record_metrics=False) for sentence\
+                           in TEST_SENTENCES]
+
+                tagger.save(file_name)
+                loaded_tagger = pos_tagging.load_tagger(file_name)
+
+                self.assertEqual([loaded_tagger.decode(\
+                                  pos_tagging.get_observation_lists(\
+                                  sentence)[1], record_metrics=False) for\
+                                  sentence in TEST_SENTENCES], decoded)
+        finally:
+            shutil.rmtree(temp_dir)
+
+###############################################################################
+# End of TaggerTest class
+###############################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+##############################################################################
+# End of test_pos_tagging.py program
+##############################################################################